@@ -2,11 +2,18 @@ import os
 import time
 import sys
 import asyncio
+import json
 import re
 import streamlit as st
 from dotenv import load_dotenv
-from ddgs import DDGS
-from graph.graph_builder import build_graph
+from graph.checkpoint import new_job_id, job_config, find_failed_node, resume_config
+from graph.instrumentation import metrics_to_json
+from graph.workspace import active_job
+from graph.uploads import store_upload, upload_digest, cached_result
+
+# Streamlit re-executes this script on every interaction. Heavy modules
+# (langgraph and the node dependencies, ddgs, requests) are therefore imported
+# where they are used, and the compiled graph is cached per process.
 
 # Fix for Playwright on Windows
 if sys.platform == 'win32':
@@ -29,6 +36,10 @@ st.set_page_config(
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
 
+# Optional job server (python -m job_server). When set, jobs run there and this
+# script only submits them and renders their progress.
+JOB_SERVER_URL = os.getenv("JOB_SERVER_URL", "").rstrip("/")
+
 # Custom CSS for beautification
 st.markdown("""
 <style>
@@ -127,12 +138,14 @@ for message in st.session_state.messages:
 with st.sidebar:
     uploaded_file = st.file_uploader("📂 上传本地视频", type=["mp4", "mov", "avi", "mkv"])
     if uploaded_file:
-        # Save to temp
-        temp_dir = os.path.join(os.getcwd(), "temp", "uploads")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_path = os.path.join(temp_dir, uploaded_file.name)
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Stream into the content-addressed upload cache once per uploaded
+        # file (this block re-runs on every interaction)
+        stored_uploads = st.session_state.setdefault("stored_uploads", {})
+        upload_key = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+        if upload_key not in stored_uploads:
+            uploaded_file.seek(0)
+            _, stored_uploads[upload_key] = store_upload(uploaded_file, uploaded_file.name)
+        temp_path = stored_uploads[upload_key]
         
         # Inject as a user message if not already added
         if not any(m["content"] == f"已上传文件: {uploaded_file.name}" for m in st.session_state.messages):
@@ -144,19 +157,202 @@ def is_url(text):
     """Simple check if input is a URL"""
     return re.match(r'^https?://', text.strip())
 
+def format_duration(seconds):
+    """Formats seconds as M:SS / H:MM:SS, or None if unknown."""
+    if not seconds:
+        return None
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
 def search_videos(query):
     """Search for videos using DuckDuckGo"""
     with st.chat_message("assistant"):
         with st.status(f"🔍 正在搜索相关视频: {query}...", expanded=True):
             try:
-                results = DDGS().videos(query, max_results=5)
-                return results
+                # Cached, and each candidate probed (duration, availability) up front
+                from graph.search import search_videos as search_and_probe
+                return search_and_probe(query, max_results=5)
             except Exception as e:
                 st.error(f"搜索失败: {e}")
                 return []
 
-def run_workflow(input_source, source_type, api_key):
-    """Executes the LangGraph workflow and updates UI"""
+# Progress bar percentage reached when each node finishes. Within the
+# processor the bar advances with the number of decoded frames; progressive
+# windows advance it through WINDOW_RANGE in proportion to the video time.
+STEPS = {
+    "classifier": 10,
+    "downloader": 40,
+    "processor": 60,
+    "analyzer": 90,
+    "generator": 100
+}
+PROCESSOR_RANGE = (40, 60)
+WINDOW_RANGE = (10, 95)
+
+def window_progress(window, seconds):
+    """Progress bar percentage at `seconds` into a progressive run's video."""
+    low, high = WINDOW_RANGE
+    return int(low + (high - low) * min(seconds / window["duration_s"], 1.0))
+
+def show_progress_event(event, status_container, progress_bar):
+    """Updates the progress bar from a node's streamed progress (frames done/total)."""
+    if not event.get("total"):
+        return
+    fraction = min(event["done"] / event["total"], 1.0)
+    label = f"🖼️ 正在提取关键帧... {event['done']}/{event['total']} 帧"
+    if event.get("node") == "processor":
+        low, high = PROCESSOR_RANGE
+    elif event.get("node") == "window_processor":
+        # Frames are counted from the start of the video, so each window
+        # fills its own share of the range
+        low, high = WINDOW_RANGE
+        if event.get("window"):
+            label = f"🖼️ 片段 {event['window']['index'] + 1}: " + label
+    else:
+        return
+    progress_bar.progress(int(low + (high - low) * fraction))
+    status_container.update(label=label, state="running")
+
+def show_metrics(metrics):
+    """Per-node performance table plus JSON export."""
+    if not metrics:
+        return
+    rows = []
+    for node, values in metrics.items():
+        row = {"节点": node}
+        row.update(values)
+        rows.append(row)
+    with st.expander("⏱️ 性能指标"):
+        st.dataframe(rows, use_container_width=True)
+        st.download_button(
+            label="导出 JSON",
+            data=metrics_to_json(metrics),
+            file_name="metrics.json",
+            mime="application/json"
+        )
+
+def offer_preview(preview_slot, filename, file_data, version):
+    """Shows (or replaces) the download button of the latest preview document."""
+    with preview_slot.container():
+        st.info(f"📄 预览版已就绪 (已分析 {version} 个片段)，后续片段完成后会自动更新。")
+        st.download_button(
+            label="📥 下载当前预览 (.docx)",
+            data=file_data,
+            file_name=filename,
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            key=f"preview_{filename}_{version}",
+            # Downloading must not rerun the script (and stop the running job)
+            on_click="ignore"
+        )
+
+def show_node_event(node_name, state_update, status_container, progress_bar, show_preview=None):
+    """
+    Updates the status panel for one finished node (local or remote run).
+    `show_preview(doc_path, version)` offers progressive preview documents.
+    """
+    state_update = state_update or {}
+
+    # Update progress (progressive previews keep the window's position)
+    if node_name in STEPS and not state_update.get("doc_version"):
+        progress_bar.progress(STEPS[node_name])
+
+    # Updates based on Node
+    if node_name == "classifier":
+        platform = state_update.get("platform", "unknown")
+        status_container.write(f"🕵️ [1/5] 识别到平台: **{platform}** (准备下载...)")
+        status_container.update(label="📥 正在下载视频资源...", state="running")
+        
+    elif node_name == "downloader":
+        title = (state_update.get("metadata") or {}).get("title", "Video")
+        status_container.write(f"📥 [2/5] 视频下载完成: **{title}**")
+        status_container.update(label="🖼️ 正在提取关键帧...", state="running")
+        
+    elif node_name == "processor":
+        count = state_update.get("screenshot_count", len(state_update.get("screenshots") or {}))
+        status_container.write(f"🖼️ [3/5] 关键帧提取: **{count} 张**")
+        status_container.write("🧠 [4/5] 正在进行 AI 多模态深度分析 (这可能需要 1-2 分钟)...")
+        status_container.update(label="🧠 AI 正在思考中...", state="running")
+        
+    elif node_name == "audio" and state_update.get("audio_path"):
+        status_container.write("🎧 音轨提取完成")
+        
+    elif node_name == "analyzer":
+        status_container.write("🧠 [4/5] AI 分析完成！")
+        status_container.update(label="📝 正在生成 Word 文档...", state="running")
+        
+    elif node_name == "window_processor" and state_update.get("window"):
+        window = state_update["window"]
+        count = state_update.get("screenshot_count", len(state_update.get("screenshots") or {}))
+        if window.get("duration_s"):
+            progress_bar.progress(window_progress(window, window["end_s"]))
+        status_container.write(
+            f"🖼️ 片段 {window['index'] + 1} ({format_duration(window['start_s']) or '0:00'} - "
+            f"{format_duration(window['end_s'])}): 关键帧 **{count} 张**"
+        )
+        status_container.update(label="🧠 AI 正在分析当前片段...", state="running")
+        
+    elif node_name == "window_analyzer":
+        status_container.update(label="📝 正在更新预览文档...", state="running")
+        
+    elif node_name == "generator" and state_update.get("doc_version"):
+        status_container.write(f"📄 预览文档已更新 (第 {state_update['doc_version']} 版)")
+        status_container.update(label="🖼️ 正在处理下一个片段...", state="running")
+        if show_preview and state_update.get("doc_path"):
+            show_preview(state_update["doc_path"], state_update["doc_version"])
+        
+    elif node_name == "generator":
+        status_container.write("📝 [5/5] 文档生成完毕")
+        progress_bar.progress(100)
+
+def show_result(status_container, filename, file_data, errors, metrics=None):
+    """Shows the download button, or the errors of a failed job."""
+    status_container.update(label="✅ 任务完成！", state="complete", expanded=False)
+    with status_container:
+        show_metrics(metrics)
+    
+    if file_data is not None:
+        st.success(f"🎉 笔记已生成：**{filename}**")
+        
+        # Show Download Button
+        st.download_button(
+            label="📥 点击下载 Word 笔记 (.docx)",
+            data=file_data,
+            file_name=filename,
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            type="primary"
+        )
+        
+        # Save to history so it persists
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": f"✅ 任务完成！笔记已生成：**{filename}**"
+        })
+        return True
+
+    err_msg = "任务处理中遇到问题，未能生成文档。"
+    if errors:
+        err_msg += f"\n错误信息: {errors}"
+    status_container.update(label="❌ 任务失败", state="error")
+    st.error(err_msg)
+    st.session_state.messages.append({"role": "assistant", "content": err_msg})
+    return False
+
+def show_cached_result(doc_path):
+    """Offers the document generated earlier from the same uploaded file."""
+    with st.chat_message("assistant"):
+        status_container = st.status("⚡ 该视频此前已处理过，直接返回已生成的笔记", state="complete", expanded=False)
+        with open(doc_path, "rb") as f:
+            show_result(status_container, os.path.basename(doc_path), f.read(), None)
+
+def run_workflow(input_source, source_type, api_key, job_id=None, retry_from=None):
+    """
+    Executes the LangGraph workflow and updates UI.
+    With `job_id` + `retry_from`, re-runs a checkpointed job from that node.
+    When JOB_SERVER_URL is set the job runs on the job server instead.
+    """
+    if JOB_SERVER_URL:
+        return run_remote_workflow(input_source, source_type, job_id, retry_from)
     
     if not api_key:
         with st.chat_message("assistant"):
@@ -167,112 +363,184 @@ def run_workflow(input_source, source_type, api_key):
     with st.chat_message("assistant"):
         status_container = st.status("🚀 智能体正在初始化...", expanded=True)
         progress_bar = st.progress(0)
+        preview_slot = st.empty()
+        app_graph = None
+        
+        def show_preview(doc_path, version):
+            with open(doc_path, "rb") as f:
+                offer_preview(preview_slot, os.path.basename(doc_path), f.read(), version)
         
         try:
-            app_graph = build_graph()
-            
-            initial_state = {
-                "input_source": input_source,
-                "source_type": source_type,
-                "errors": [],
-                "metadata": {},
-                "screenshots": {}
-            }
+            from graph.graph_builder import get_graph
+            app_graph = get_graph()
             
-            status_container.write("🔄 正在连接工作流...")
-            events = app_graph.stream(initial_state)
-            final_state = None
-            
-            # Simulated steps for progress bar
-            steps = {
-                "classifier": 10,
-                "downloader": 40,
-                "processor": 60,
-                "analyzer": 90,
-                "generator": 100
-            }
+            if job_id and retry_from:
+                config = resume_config(app_graph, job_id, retry_from)
+                if config is None:
+                    st.error("无法找到可恢复的检查点，请重新提交任务。")
+                    return
+                status_container.write(f"♻️ 从 **{retry_from}** 步骤恢复任务 (复用已完成的步骤)...")
+                events = app_graph.stream(None, config, stream_mode=["updates", "custom"])
+            else:
+                job_id = new_job_id()
+                initial_state = {
+                    "job_id": job_id,
+                    "input_source": input_source,
+                    "source_type": source_type,
+                    "errors": [],
+                    "metadata": {},
+                    "screenshots": {}
+                }
+                status_container.write("🔄 正在连接工作流...")
+                events = app_graph.stream(initial_state, job_config(job_id), stream_mode=["updates", "custom"])
             
             status_container.update(label="🚀 正在全速处理中...", state="running")
 
-            for event in events:
-                node_name = list(event.keys())[0]
-                state_update = event[node_name]
-                
-                # Update progress
-                if node_name in steps:
-                    progress_bar.progress(steps[node_name])
-
-                # Updates based on Node
-                if node_name == "classifier":
-                    platform = state_update.get("platform", "unknown")
-                    status_container.write(f"🕵️ [1/5] 识别到平台: **{platform}** (准备下载...)")
-                    status_container.update(label="📥 正在下载视频资源...", state="running")
-                    
-                elif node_name == "downloader":
-                    title = state_update.get("metadata", {}).get("title", "Video")
-                    status_container.write(f"📥 [2/5] 视频下载完成: **{title}**")
-                    status_container.update(label="🖼️ 正在提取关键帧...", state="running")
-                    
-                elif node_name == "processor":
-                    count = len(state_update.get("screenshots", {}))
-                    status_container.write(f"🖼️ [3/5] 关键帧提取: **{count} 张**")
-                    status_container.write("🧠 [4/5] 正在进行 AI 多模态深度分析 (这可能需要 1-2 分钟)...")
-                    status_container.update(label="🧠 AI 正在思考中...", state="running")
-                    
-                elif node_name == "analyzer":
-                    status_container.write("🧠 [4/5] AI 分析完成！")
-                    status_container.update(label="📝 正在生成 Word 文档...", state="running")
-                    
-                elif node_name == "generator":
-                    final_state = state_update
-                    status_container.write("📝 [5/5] 文档生成完毕")
-                    progress_bar.progress(100)
-
-            # Final Result processing
-            status_container.update(label="✅ 任务完成！", state="complete", expanded=False)
-            
-            if final_state and final_state.get("doc_path"):
-                doc_path = final_state["doc_path"]
-                filename = os.path.basename(doc_path)
-                
+            # Keep the job's workspace safe from garbage collection while it runs
+            with active_job(job_id):
+                for mode, event in events:
+                    if mode == "custom":
+                        show_progress_event(event, status_container, progress_bar)
+                        continue
+                    node_name = list(event.keys())[0]
+                    show_node_event(node_name, event[node_name], status_container, progress_bar, show_preview)
+
+            # Final Result processing (parallel branches only return partial
+            # updates, so read the merged state from the checkpoint)
+            final_state = app_graph.get_state(job_config(job_id)).values
+            doc_path = final_state.get("doc_path")
+            file_data = None
+            if doc_path:
                 # Read file for download
                 with open(doc_path, "rb") as f:
                     file_data = f.read()
-                    
-                st.success(f"🎉 笔记已生成：**{filename}**")
-                
-                # Show Download Button
-                st.download_button(
-                    label="📥 点击下载 Word 笔记 (.docx)",
-                    data=file_data,
-                    file_name=filename,
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    type="primary"
-                )
-                
-                # Save to history so it persists
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": f"✅ 任务完成！笔记已生成：**{filename}**"
-                })
+            
+            filename = os.path.basename(doc_path) if doc_path else None
+            preview_slot.empty()
+            if not show_result(status_container, filename, file_data, final_state.get("errors"), final_state.get("metrics")):
+                offer_retry(job_id, find_failed_node(app_graph, job_id))
+
+        except Exception as e:
+            status_container.update(label="❌ 系统错误", state="error")
+            st.error(f"发生系统错误: {str(e)}")
+            if app_graph is not None and job_id:
+                offer_retry(job_id, find_failed_node(app_graph, job_id))
+
+def read_sse(response):
+    """Parses a Server-Sent Events response into event dicts."""
+    data_lines = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].strip())
+        elif not line and data_lines:
+            yield json.loads("\n".join(data_lines))
+            data_lines = []
+
+def run_remote_workflow(input_source, source_type, job_id=None, retry_from=None):
+    """
+    Thin-client mode: submits the job to the job server (or re-attaches to a
+    running one) and renders its event stream. The job ID is kept in the URL
+    so a reloaded page reconnects to the same job.
+    """
+    import requests
+
+    with st.chat_message("assistant"):
+        status_container = st.status("🚀 正在提交任务到任务服务器...", expanded=True)
+        progress_bar = st.progress(0)
+        preview_slot = st.empty()
+        
+        try:
+            if job_id and retry_from:
+                resp = requests.post(f"{JOB_SERVER_URL}/jobs/{job_id}/retry", json={"node": retry_from}, timeout=10)
+                status_container.write(f"♻️ 从 **{retry_from}** 步骤恢复任务 (复用已完成的步骤)...")
+            elif job_id:
+                resp = requests.get(f"{JOB_SERVER_URL}/jobs/{job_id}", timeout=10)
+                status_container.write(f"🔌 重新连接到任务 `{job_id}`...")
             else:
-                err_msg = "任务处理中遇到问题，未能生成文档。"
-                if final_state and final_state.get("errors"):
-                    err_msg += f"\n错误信息: {final_state['errors']}"
-                status_container.update(label="❌ 任务失败", state="error")
-                st.error(err_msg)
-                st.session_state.messages.append({"role": "assistant", "content": err_msg})
+                resp = requests.post(
+                    f"{JOB_SERVER_URL}/jobs",
+                    json={"input_source": input_source, "source_type": source_type},
+                    timeout=10
+                )
+            resp.raise_for_status()
+            job_info = resp.json()
+            job_id = job_info["job_id"]
+            st.query_params["job"] = job_id
+            
+            # Replay only the current run (a retried job also has the events
+            # of its earlier runs)
+            since = job_info["run_event_id"]
+            job = None
+            
+            def show_preview(doc_path, version):
+                resp = requests.get(f"{JOB_SERVER_URL}/jobs/{job_id}/document", timeout=60)
+                if resp.ok:
+                    offer_preview(preview_slot, os.path.basename(doc_path), resp.content, version)
+            
+            with requests.get(f"{JOB_SERVER_URL}/jobs/{job_id}/events", params={"since": since}, stream=True, timeout=(10, None)) as resp:
+                resp.raise_for_status()
+                for event in read_sse(resp):
+                    if event["type"] == "node":
+                        show_node_event(event["node"], event.get("update"), status_container, progress_bar, show_preview)
+                    elif event["type"] == "progress":
+                        show_progress_event(event, status_container, progress_bar)
+                    elif event["status"] == "queued":
+                        status_container.update(label="⏳ 排队中，等待空闲的处理线程...", state="running")
+                    elif event["status"] == "running":
+                        status_container.update(label="🚀 正在全速处理中...", state="running")
+                    else:
+                        job = event
+            
+            if "job" in st.query_params:
+                del st.query_params["job"]
+            preview_slot.empty()
+            if job is None:
+                raise Exception("任务服务器连接中断")
+            
+            file_data = None
+            filename = None
+            if job["status"] == "succeeded":
+                resp = requests.get(f"{JOB_SERVER_URL}/jobs/{job_id}/document", timeout=60)
+                resp.raise_for_status()
+                file_data = resp.content
+                filename = os.path.basename(job["doc_path"])
+            if not show_result(status_container, filename, file_data, job.get("errors"), job.get("metrics")):
+                offer_retry(job_id, job.get("failed_node"))
 
         except Exception as e:
             status_container.update(label="❌ 系统错误", state="error")
             st.error(f"发生系统错误: {str(e)}")
 
+def offer_retry(job_id, node):
+    """Remembers a failed job so it can be retried from the failed node."""
+    if node:
+        st.session_state.failed_job = {"job_id": job_id, "node": node}
+
+
+# 0. Re-attach to a job still running on the job server (page reload or a
+# rerun that interrupted the event stream)
+if JOB_SERVER_URL and "job" in st.query_params:
+    run_workflow(None, None, api_key, job_id=st.query_params["job"])
+
+# Retry of a failed, checkpointed job
+if "failed_job" in st.session_state:
+    failed = st.session_state.failed_job
+    if st.button(f"♻️ 从失败步骤 ({failed['node']}) 重试", key=f"retry_{failed['job_id']}"):
+        del st.session_state.failed_job
+        st.session_state.messages.append({"role": "user", "content": f"重试任务 (从 {failed['node']} 步骤开始)"})
+        run_workflow(None, None, api_key, job_id=failed["job_id"], retry_from=failed["node"])
 
 # 1. Handle File Upload Trigger
 if "processing_file" in st.session_state:
     file_path = st.session_state.processing_file
     del st.session_state.processing_file # consume it immediately
-    run_workflow(file_path, "local", api_key)
+    cached_doc = cached_result(upload_digest(file_path))
+    if cached_doc:
+        show_cached_result(cached_doc)
+    else:
+        run_workflow(file_path, "local", api_key)
 
 # 2. Handle Chat Input Trigger
 if prompt := st.chat_input("请输入视频链接 或 搜索内容..."):
@@ -299,7 +567,13 @@ if prompt := st.chat_input("请输入视频链接 或 搜索内容..."):
                             st.image(v['images']['small'], width=120)
                     with col2:
                         st.markdown(f"**{v['title']}**")
-                        st.caption(f"来源: {v['publisher']} | 时长: {v['duration']}")
+                        duration = format_duration(v.get("duration_s")) or v.get("duration", "")
+                        caption = f"来源: {v['publisher']} | 平台: {v.get('platform', 'other')} | 时长: {duration}"
+                        if v.get("probe") == "fallback":
+                            caption += " | 需要浏览器下载"
+                        elif v.get("probe") == "unknown":
+                            caption += " | 可用性未知"
+                        st.caption(caption)
                         if st.button("开始分析", key=v['content']):
                             # This button click won't work perfectly in nested loop without rerun logic
                             # Streamlit buttons in loops need callback usually
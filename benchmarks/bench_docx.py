@@ -0,0 +1,68 @@
+"""
+Word rendering benchmark: `generate_docx` over generated Markdown of
+increasing size, with and without embedded figures.
+"""
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from word_mcp_server.renderer import generate_docx
+
+SECTION_COUNTS = [10, 50, 200, 800]
+QUICK_SECTION_COUNTS = [10, 50, 200]
+# One figure every N sections
+FIGURE_EVERY = 5
+
+
+def build_markdown(sections: int, with_images: bool) -> str:
+    lines = ["# 基准测试文档", "", "## 摘要", "这是一个用于性能测试的**合成**文档。" * 8]
+    for i in range(sections):
+        lines.append(f"## {i + 1}. 第 {i + 1} 节")
+        lines.append(f"本节讨论了**要点 {i}**以及相关的分析与推导过程。" * 6)
+        lines.append("- 第一点：**重要**结论")
+        lines.append("- 第二点：补充说明")
+        lines.append("1. 步骤一")
+        lines.append("2. 步骤二")
+        if i % 10 == 0:
+            lines += ["| 指标 | 数值 |", "| --- | --- |", f"| A | {i} |", f"| B | {i * 2} |"]
+        if with_images and i % FIGURE_EVERY == 0:
+            lines.append(f"[INSERT_IMAGE: 00:00:{i // FIGURE_EVERY % 60:02d}]")
+    return "\n".join(lines)
+
+
+def _image_map(workdir, count):
+    image = np.full((720, 1280, 3), 200, np.uint8)
+    cv2.putText(image, "figure", (100, 360), cv2.FONT_HERSHEY_SIMPLEX, 4, (0, 0, 0), 6)
+    image_map = {}
+    for i in range(min(count, 60)):
+        path = os.path.join(workdir, f"figure_{i}.jpg")
+        cv2.imwrite(path, image)
+        image_map[f"00:00:{i:02d}"] = path
+    return image_map
+
+
+def run(quick=False):
+    results = []
+    counts = QUICK_SECTION_COUNTS if quick else SECTION_COUNTS
+    with tempfile.TemporaryDirectory(prefix="v2w-bench-") as workdir:
+        image_map = _image_map(workdir, max(counts) // FIGURE_EVERY + 1)
+        for sections in counts:
+            for with_images in (False, True):
+                content = build_markdown(sections, with_images)
+                output_path = os.path.join(workdir, f"doc_{sections}_{int(with_images)}.docx")
+                start = time.perf_counter()
+                generate_docx(content, output_path, image_map if with_images else None)
+                elapsed = time.perf_counter() - start
+                result = {
+                    "sections": sections,
+                    "images": with_images,
+                    "markdown_bytes": len(content.encode("utf-8")),
+                    "wall_s": round(elapsed, 4),
+                    "docx_bytes": os.path.getsize(output_path),
+                }
+                print(f"  docx {sections:>4} sections images={with_images!s:<5} {elapsed:8.3f} s")
+                results.append(result)
+    return results
@@ -0,0 +1,92 @@
+"""
+Keyframe extraction benchmark: throughput, peak memory and scene-cut
+precision/recall of `extract_keyframes` on synthetic videos.
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synth import make_cuts, synthesize_video
+from graph.instrumentation import peak_rss_bytes
+from graph.nodes.processor import extract_keyframes
+
+# name, width, height, fps, duration (s), mean scene length (s)
+CASES = [
+    ("360p25_60s", 640, 360, 25, 60, 6),
+    ("720p30_120s", 1280, 720, 30, 120, 9),
+    ("1080p30_60s", 1920, 1080, 30, 60, 5),
+    # Slides shorter than the quality gate's look-ahead must still be kept apart
+    ("360p25_40s_short", 640, 360, 25, 40, 1.6),
+]
+QUICK_CASES = [
+    ("360p25_20s", 640, 360, 25, 20, 4),
+    ("720p30_20s", 1280, 720, 30, 20, 5),
+    ("360p25_20s_short", 640, 360, 25, 20, 1.6),
+]
+
+# A cut is sampled at the next whole second, so detections may lag it by up to ~1 s
+TOLERANCE_S = 1.5
+
+
+def _seconds(timestamp: str) -> int:
+    h, m, s = (int(part) for part in timestamp.split(":"))
+    return h * 3600 + m * 60 + s
+
+
+def score_detections(detected, cuts, tolerance=TOLERANCE_S):
+    """
+    Greedily matches detected keyframe times to ground-truth cuts within
+    `tolerance`. The always-saved first frame is not a detection.
+    """
+    detections = sorted(t for t in detected if t > 0)
+    unmatched = list(cuts)
+    hits = 0
+    for t in detections:
+        best = min(unmatched, key=lambda c: abs(c - t), default=None)
+        if best is not None and abs(best - t) <= tolerance:
+            unmatched.remove(best)
+            hits += 1
+    precision = hits / len(detections) if detections else 1.0
+    recall = hits / len(cuts) if cuts else 1.0
+    return {"detections": len(detections), "cuts": len(cuts), "hits": hits,
+            "precision": round(precision, 4), "recall": round(recall, 4)}
+
+
+def run_case(name, width, height, fps, duration, mean_scene, workdir, seed=0):
+    cuts = make_cuts(duration, mean_scene, seed=seed)
+    video_path = os.path.join(workdir, f"{name}.mp4")
+    frames = synthesize_video(video_path, width, height, fps, duration, cuts, seed=seed)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    screenshots = extract_keyframes(video_path, os.path.join(workdir, name))
+    elapsed = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "case": name,
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "duration_s": duration,
+        "frames": frames,
+        "wall_s": round(elapsed, 4),
+        "frames_per_s": round(frames / elapsed, 1) if elapsed else None,
+        "tracemalloc_peak_bytes": traced_peak,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "keyframes": len(screenshots),
+        **score_detections([_seconds(ts) for ts in screenshots], cuts),
+    }
+
+
+def run(quick=False):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="v2w-bench-") as workdir:
+        for case in (QUICK_CASES if quick else CASES):
+            result = run_case(*case, workdir)
+            print(f"  keyframes {result['case']:<18} {result['frames_per_s']:>8} fps  "
+                  f"P={result['precision']:.2f} R={result['recall']:.2f}")
+            results.append(result)
+    return results
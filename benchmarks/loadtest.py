@@ -0,0 +1,220 @@
+"""
+Concurrency load test for sizing a deployment.
+
+Runs batches of full-graph jobs through the job server's JobManager at
+increasing concurrency levels. Video URLs point at a local HTTP server
+serving a synthetic video (the real downloader, processor, analyzer and
+generator run), and the analyzer talks to the local stub LLM with
+configurable latency and error rate. For every level it reports throughput,
+job latency percentiles, CPU use and the peak RSS sampled during the level,
+and stops escalating once memory or the failure rate exceeds its limit.
+
+Usage: python -m benchmarks.loadtest [--levels 1,2,4,8] [--jobs-per-level N]
+                                     [--latency 2.0] [--error-rate 0.05]
+                                     [--video 360p|720p] [--max-rss-mb 4096]
+Stage caps apply as in production (STAGE_LIMITS environment variable).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.run import RESULTS_DIR, environment
+
+# name -> width, height, fps, duration (s), mean scene length (s)
+VIDEOS = {
+    "360p": (640, 360, 25, 60, 5),
+    "720p": (1280, 720, 30, 120, 6),
+}
+RSS_SAMPLE_INTERVAL_S = 0.2
+
+
+def current_rss_bytes():
+    """Resident set size of this process now (not the peak), or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+class RssSampler:
+    """Tracks the highest RSS seen while the context is active."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_bytes()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, q: float):
+    """Linearly interpolated percentile (q in 0..100) of a non-empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return round(ordered[low] + (ordered[high] - ordered[low]) * (rank - low), 3)
+
+
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+async def run_level(concurrency: int, job_count: int, video_urls):
+    from job_server.manager import SUCCEEDED, JobManager
+
+    manager = JobManager(workers=concurrency)
+    await manager.start()
+    try:
+        with RssSampler() as rss:
+            cpu_start = _cpu_seconds()
+            start = time.perf_counter()
+            jobs = [manager.submit(url, "url") for url in video_urls(job_count)]
+            while not all(job.done for job in jobs):
+                await asyncio.sleep(0.2)
+            wall = time.perf_counter() - start
+            cpu = _cpu_seconds() - cpu_start
+    finally:
+        await manager.stop()
+
+    succeeded = [job for job in jobs if job.status == SUCCEEDED]
+    latency = [job.finished_at - job.created_at for job in succeeded]
+    queued = [job.started_at - job.created_at for job in succeeded]
+    nodes = {}
+    for job in succeeded:
+        for node, values in job.metrics.items():
+            nodes.setdefault(node, []).append(values.get("wall_s", 0))
+    return {
+        "concurrency": concurrency,
+        "jobs": job_count,
+        "succeeded": len(succeeded),
+        "failed": job_count - len(succeeded),
+        "errors": sorted({error[:200] for job in jobs for error in job.errors})[:10],
+        "wall_s": round(wall, 3),
+        "throughput_jobs_per_min": round(len(succeeded) / wall * 60, 3),
+        "latency_p50_s": percentile(latency, 50),
+        "latency_p90_s": percentile(latency, 90),
+        "latency_p99_s": percentile(latency, 99),
+        "queue_wait_p50_s": percentile(queued, 50),
+        "node_wall_p50_s": {node: percentile(values, 50) for node, values in nodes.items()},
+        "cpu_utilization": round(cpu / wall / (os.cpu_count() or 1), 3),
+        "peak_rss_bytes": rss.peak,
+    }
+
+
+def print_level(result):
+    rss_mb = (result["peak_rss_bytes"] or 0) / 1024 / 1024
+    print(f"  c={result['concurrency']:<3} ok={result['succeeded']}/{result['jobs']:<3} "
+          f"{result['throughput_jobs_per_min']:7.2f} jobs/min  "
+          f"p50={result['latency_p50_s']} p90={result['latency_p90_s']} p99={result['latency_p99_s']} s  "
+          f"cpu={result['cpu_utilization']:.0%}  rss={rss_mb:.0f} MB", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--jobs-per-level", type=int, default=0, help="Jobs per level (default: 2x concurrency)")
+    parser.add_argument("--latency", type=float, default=2.0, help="Stub LLM latency per request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub LLM requests failing with 500")
+    parser.add_argument("--video", choices=sorted(VIDEOS), default="360p", help="Synthetic video served to jobs")
+    parser.add_argument("--max-rss-mb", type=float, default=4096, help="Stop escalating above this peak RSS")
+    parser.add_argument("--max-failure-rate", type=float, default=0.5, help="Stop escalating above this share of failed jobs")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/loadtest-<timestamp>.json)")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+
+    # Workspace, outputs and checkpoints go to a scratch directory. Set before
+    # any graph module is imported, as they read it at import time.
+    scratch = tempfile.TemporaryDirectory(prefix="v2w-load-")
+    os.environ["WORKSPACE_ROOT"] = os.path.join(scratch.name, "temp")
+    os.environ["OUTPUTS_DIR"] = os.path.join(scratch.name, "outputs")
+    os.environ["CHECKPOINT_DB"] = os.path.join(scratch.name, "checkpoints.sqlite")
+
+    from benchmarks.stub_llm import StubLLMServer
+    from benchmarks.synth import make_cuts, synthesize_video
+    from benchmarks.video_server import VideoServer
+
+    results = []
+    with scratch, StubLLMServer(latency=args.latency, error_rate=args.error_rate) as llm:
+        videos_dir = os.path.join(scratch.name, "videos")
+        os.makedirs(videos_dir)
+        width, height, fps, duration, mean_scene = VIDEOS[args.video]
+        print(f"Synthesizing {args.video} test video ({duration} s)...", flush=True)
+        synthesize_video(os.path.join(videos_dir, f"{args.video}.mp4"), width, height, fps, duration,
+                         make_cuts(duration, mean_scene), seed=1)
+
+        # The analyzer reads its endpoint at import time
+        if "graph.nodes.analyzer" in sys.modules:
+            raise RuntimeError("loadtest must configure the LLM endpoint before graph modules are imported")
+        os.environ["GOOGLE_API_KEY"] = "sk-loadtest"
+        os.environ["GOOGLE_API_BASE"] = llm.base_url
+
+        run_id = uuid.uuid4().hex[:8]
+        with VideoServer(videos_dir) as server:
+            def video_urls(count, level):
+                # Unique URLs, so every job downloads instead of hitting the download cache
+                return [server.url(args.video, f"{run_id}-c{level}-{i}") for i in range(count)]
+
+            print(f"[loadtest] stub LLM latency {args.latency} s, error rate {args.error_rate:.0%}")
+            for level in levels:
+                job_count = args.jobs_per_level or 2 * level
+                requests_before, errors_before = llm.requests, llm.errors
+                result = asyncio.run(run_level(level, job_count, lambda n, level=level: video_urls(n, level)))
+                result["llm_requests"] = llm.requests - requests_before
+                result["llm_errors"] = llm.errors - errors_before
+                results.append(result)
+                print_level(result)
+
+                rss_mb = (result["peak_rss_bytes"] or 0) / 1024 / 1024
+                if rss_mb > args.max_rss_mb:
+                    print(f"Stopping: peak RSS {rss_mb:.0f} MB exceeds {args.max_rss_mb:.0f} MB")
+                    break
+                if result["failed"] / job_count > args.max_failure_rate:
+                    print(f"Stopping: {result['failed']}/{job_count} jobs failed")
+                    break
+
+    from graph.stage_limits import STAGE_LIMITS
+
+    report = {
+        "environment": {**environment(), "stage_limits": STAGE_LIMITS},
+        "settings": {"video": args.video, "llm_latency_s": args.latency, "llm_error_rate": args.error_rate},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, "loadtest-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Offline benchmark suite.
+
+Synthesizes test videos locally, benchmarks keyframe extraction, Word
+rendering and full graph runs (against a local stub LLM), and writes the
+results as JSON to benchmarks/results/. With --baseline the run is compared
+to an earlier result file and exits non-zero on regressions.
+
+Usage: python -m benchmarks.run [--quick] [--only keyframes,docx,e2e]
+                                [--baseline benchmarks/results/<file>.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+SUITES = ["keyframes", "docx", "e2e"]
+
+# suite -> (fields identifying a result row, {metric: True if higher is better})
+COMPARED = {
+    "keyframes": (("case",), {"frames_per_s": True, "precision": True, "recall": True,
+                              "tracemalloc_peak_bytes": False}),
+    "docx": (("sections", "images"), {"wall_s": False, "docx_bytes": False}),
+    "e2e": (("case",), {"wall_s": False}),
+}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    import cv2
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+    }
+
+
+def run_suites(suites, quick):
+    results = {}
+    for suite in suites:
+        print(f"[{suite}]")
+        if suite == "keyframes":
+            from benchmarks import bench_keyframes as bench
+        elif suite == "docx":
+            from benchmarks import bench_docx as bench
+        else:
+            from benchmarks import bench_e2e as bench
+        results[suite] = bench.run(quick=quick)
+    return results
+
+
+def compare(baseline, current, tolerance):
+    """Returns a list of human-readable regressions of `current` against `baseline`."""
+    regressions = []
+    for suite, (key_fields, metrics) in COMPARED.items():
+        old_rows = {tuple(row[f] for f in key_fields): row for row in baseline.get("results", {}).get(suite, [])}
+        for row in current.get("results", {}).get(suite, []):
+            key = tuple(row[f] for f in key_fields)
+            old = old_rows.get(key)
+            if old is None:
+                continue
+            for metric, higher_is_better in metrics.items():
+                before, after = old.get(metric), row.get(metric)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append(f"{suite} {'/'.join(map(str, key))} {metric}: "
+                                       f"{before} -> {after} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Smaller videos and documents")
+    parser.add_argument("--only", default=",".join(SUITES), help="Comma-separated suites to run")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    suites = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    # Keep job workspaces and generated documents out of the project tree.
+    # Set before any graph module is imported, as they read it at import time.
+    scratch = tempfile.TemporaryDirectory(prefix="v2w-bench-")
+    os.environ["WORKSPACE_ROOT"] = os.path.join(scratch.name, "temp")
+    os.environ["OUTPUTS_DIR"] = os.path.join(scratch.name, "outputs")
+    with scratch:
+        report = {"environment": environment(), "quick": args.quick, "results": run_suites(suites, args.quick)}
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+It answers every request with a fixed academic-style Markdown document that
+references the timestamps found in the request, so the analyzer and generator
+run their real code paths without network access or API cost.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Keyframe captions, or the line timestamps of a subtitle transcript
+_TIMESTAMP_RE = re.compile(r"(?:Timestamp: |\[)(\d{2}:\d{2}:\d{2})")
+
+
+def build_markdown(timestamps, sections: int = 4) -> str:
+    lines = ["# 合成视频的学术分析", "", "## 摘要", "本文基于合成视频的关键帧进行分析。" * 5]
+    for i in range(sections):
+        lines.append(f"## {i + 1}. 第 {i + 1} 部分")
+        lines.append("该部分讨论了**核心概念**及其背后的逻辑。" * 6)
+        for ts in timestamps[i::sections][:3]:
+            lines.append(f"[INSERT_IMAGE: {ts}]")
+            lines.append("如上图所示，画面展示了关键内容。")
+    lines.append("## 结论")
+    lines.append("综上所述，视频内容结构清晰。")
+    return "\n".join(lines)
+
+
+class StubLLMServer:
+    """
+    Threaded HTTP server on 127.0.0.1 (random port). `latency` seconds are
+    added to every response and `error_rate` of requests fail with HTTP 500.
+    Use as a context manager; `base_url` is ready to be used as API base.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    fail = stub._rng.random() < stub.error_rate
+                    if fail:
+                        stub.errors += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if fail:
+                    self._reply(500, {"error": {"message": "stub injected failure", "type": "server_error"}})
+                    return
+
+                timestamps = _TIMESTAMP_RE.findall(body.decode("utf-8", "ignore"))
+                content = build_markdown(timestamps)
+                self._reply(200, {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": "stub",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": len(body) // 4,
+                        "completion_tokens": len(content) // 2,
+                        "total_tokens": len(body) // 4 + len(content) // 2,
+                    },
+                })
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,70 @@
+"""
+Deterministic synthetic test videos with known scene cuts.
+
+Each scene is a "slide" (background colour, a few shapes and its number).
+Within a scene only low-amplitude noise and a small moving cursor change,
+which must not be detected as a cut.
+"""
+import random
+
+import cv2
+import numpy as np
+
+
+def make_cuts(duration_s: float, mean_scene_s: float, seed: int = 0):
+    """Returns sorted cut times (seconds) with scene lengths jittered around the mean."""
+    rng = random.Random(seed)
+    cuts = []
+    t = 0.0
+    while True:
+        t += mean_scene_s * rng.uniform(0.6, 1.4)
+        if t >= duration_s - 1:
+            break
+        cuts.append(round(t, 2))
+    return cuts
+
+
+def _slide(width, height, index, rng):
+    img = np.empty((height, width, 3), np.uint8)
+    img[:] = [rng.randrange(256) for _ in range(3)]
+    for _ in range(4):
+        x1, y1 = rng.randrange(width), rng.randrange(height)
+        x2, y2 = rng.randrange(width), rng.randrange(height)
+        color = [rng.randrange(256) for _ in range(3)]
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, -1)
+    scale = height / 180
+    cv2.putText(img, f"Slide {index}", (width // 10, height // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), max(1, int(scale * 2)))
+    return img
+
+
+def synthesize_video(path: str, width: int, height: int, fps: float, duration_s: float,
+                     cuts, noise: float = 3.0, seed: int = 0):
+    """
+    Writes an mp4 to `path` whose scene changes happen exactly at `cuts`
+    (seconds). Returns the number of frames written.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot open video writer for {path}")
+
+    total_frames = int(duration_s * fps)
+    boundaries = [int(c * fps) for c in cuts]
+    scene = 0
+    slide = _slide(width, height, scene, rng)
+    # Reused noise pattern keeps generation fast while still perturbing pixels
+    noise_bank = [np_rng.normal(0, noise, (height, width, 3)).astype(np.int16) for _ in range(8)]
+
+    for i in range(total_frames):
+        if scene < len(boundaries) and i >= boundaries[scene]:
+            scene += 1
+            slide = _slide(width, height, scene, rng)
+        frame = np.clip(slide.astype(np.int16) + noise_bank[i % len(noise_bank)], 0, 255).astype(np.uint8)
+        cursor = (int(width * (0.2 + 0.6 * (i % 100) / 100)), int(height * 0.8))
+        cv2.circle(frame, cursor, max(2, height // 90), (0, 0, 0), -1)
+        writer.write(frame)
+
+    writer.release()
+    return total_frames
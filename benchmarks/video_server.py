@@ -0,0 +1,117 @@
+"""
+Local stand-in for a video platform: a threaded HTTP server that serves the
+mp4 files of one directory, with HEAD and byte-range support as yt-dlp and
+players expect.
+
+Any path of the form /<name>/<anything>.mp4 serves <directory>/<name>.mp4,
+so every job can get its own URL (and thereby its own download) while the
+same synthetic video is reused.
+"""
+import os
+import re
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class VideoServer:
+    """
+    Use as a context manager; `url(name, key)` returns a URL serving
+    <directory>/<name>.mp4 under a unique file name derived from `key`.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def url(self, name: str, key: str) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/{name}/{key}.mp4"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._serve(send_body=False)
+
+            def do_GET(self):
+                self._serve(send_body=True)
+
+            def _serve(self, send_body):
+                parts = self.path.split("?", 1)[0].strip("/").split("/")
+                path = os.path.join(server.directory, os.path.basename(parts[0]) + ".mp4")
+                if len(parts) != 2 or not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                match = _RANGE_RE.fullmatch(self.headers.get("Range", ""))
+                if match and (match.group(1) or match.group(2)):
+                    if match.group(1):
+                        start = int(match.group(1))
+                        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    else:
+                        start = max(0, size - int(match.group(2)))
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                length = end - start + 1
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(length))
+                self.end_headers()
+                with server._lock:
+                    server.requests += 1
+                if not send_body:
+                    return
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    try:
+                        shutil.copyfileobj(_Limited(f, length), self.wfile)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                with server._lock:
+                    server.bytes_sent += length
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Limited:
+    """File wrapper that stops reading after `remaining` bytes."""
+
+    def __init__(self, f, remaining):
+        self._f = f
+        self._remaining = remaining
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
@@ -0,0 +1,390 @@
+"""
+Headless command line for Video2Word.
+
+    python cli.py run <dir-or-files>... [--workers N] [--report run.json]
+    python cli.py watch <dir> [--workers N] [--interval 5] [--stable 10] [--report watch.json]
+
+`run` processes the given videos (directories are scanned) once and exits.
+`watch` polls a directory, e.g. a share that recordings are dropped into,
+and processes each file once it has stopped growing.
+
+Videos are processed on a pool of worker processes, each with its own graph.
+Files whose content hash already produced a document (graph.uploads) are
+skipped, also across runs. A file identical to one being processed waits in
+the parent, not in a worker, and is submitted again once that one is done. A JSON report with per-file timings is rewritten
+after every file, so it can be followed while the CLI runs.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv"}
+CLI_WORKERS = int(os.getenv("CLI_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+# Returned by a worker for a file whose content hash is claimed by another
+# file; not a report status, the parent submits the file again later
+DEFERRED = "deferred"
+# Seconds between checks whether a deferred file's claim has been released
+DEFER_POLL_S = 1.0
+
+_graph = None
+
+
+def _init_worker():
+    """Builds the graph once per worker process."""
+    global _graph
+    from graph.graph_builder import build_graph
+
+    # No checkpointer: several processes writing one SQLite file would
+    # contend for its lock, and a failed file is simply retried next run
+    _graph = build_graph()
+
+
+def _holder_alive(pid: int, lock_path: str) -> bool:
+    if sys.platform == "win32":
+        # os.kill would terminate the process there; trust claims younger
+        # than the workspace's job age limit instead
+        from graph.workspace import JOB_MAX_AGE_S
+
+        return time.time() - os.path.getmtime(lock_path) < JOB_MAX_AGE_S
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _lock_path(digest: str) -> str:
+    from graph.workspace import cache_dir
+
+    return os.path.join(cache_dir("results"), f"{digest}.lock")
+
+
+def _holder(lock_path: str) -> int:
+    try:
+        with open(lock_path, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def is_claimed(digest: str) -> bool:
+    """True while a live process holds the claim on a content hash."""
+    lock_path = _lock_path(digest)
+    holder = _holder(lock_path)
+    return bool(holder) and _holder_alive(holder, lock_path)
+
+
+def claim(digest: str) -> bool:
+    """
+    Claims a content hash for processing, so identical files queued together
+    (or by another CLI on the same workspace) run once. False if a live
+    process holds the claim.
+    """
+    lock_path = _lock_path(digest)
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            holder = _holder(lock_path)
+            if holder and _holder_alive(holder, lock_path):
+                return False
+            # Left behind by a crashed process
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+        return True
+
+
+def release(digest: str):
+    """Removes this process's claim on a content hash; a claim of another process is left alone."""
+    lock_path = _lock_path(digest)
+    try:
+        with open(lock_path, encoding="utf-8") as f:
+            holder = f.read().strip()
+    except OSError:
+        return
+    if holder == str(os.getpid()):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(lock_path)
+
+
+def process_file(path: str, profile: bool = False, digest: str = None) -> dict:
+    """
+    Processes one local video unless its content was done before (in a worker
+    process). `digest` is the file's known content hash, if any. The record is
+    DEFERRED if an identical file is being processed right now.
+    """
+    from graph.uploads import cached_result, file_digest
+
+    record = {"path": path, "started_at": time.time()}
+    start = time.perf_counter()
+    try:
+        if not digest:
+            digest = file_digest(path)
+            record["hash_s"] = round(time.perf_counter() - start, 3)
+        record["sha256"] = digest
+
+        doc_path = cached_result(digest)
+        if not doc_path and not claim(digest):
+            record["status"] = DEFERRED
+            return record
+        if doc_path:
+            record.update({"status": SKIPPED, "doc_path": doc_path})
+            return record
+
+        try:
+            run_workflow(path, digest, record, profile)
+        finally:
+            release(digest)
+    except Exception as e:
+        record.update({"status": FAILED, "errors": record.get("errors", []) + [f"{type(e).__name__}: {e}"]})
+    finally:
+        record["total_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_workflow(path: str, digest: str, record: dict, profile: bool = False):
+    """Runs the graph on a local video and fills in the record."""
+    from graph.checkpoint import job_config, new_job_id
+    from graph.uploads import remember_result
+    from graph.workspace import active_job, job_dir
+
+    job_id = new_job_id()
+    record["job_id"] = job_id
+    initial_state = {
+        "job_id": job_id,
+        "input_source": path,
+        "source_type": "local",
+        "profile": profile,
+        "errors": [],
+        "metadata": {},
+        "screenshots": {}
+    }
+    with active_job(job_id):
+        final_state = _graph.invoke(initial_state, job_config(job_id))
+    if profile:
+        record["profile_dir"] = job_dir(job_id, "profile")
+
+    doc_path = final_state.get("doc_path")
+    record["errors"] = final_state.get("errors") or []
+    record["node_s"] = {node: values.get("wall_s") for node, values in (final_state.get("metrics") or {}).items()}
+    if doc_path and os.path.exists(doc_path):
+        record.update({"status": SUCCEEDED, "doc_path": doc_path})
+        remember_result(digest, doc_path)
+    else:
+        record["status"] = FAILED
+
+
+def is_candidate(path: str) -> bool:
+    """Video files only; hidden and partially copied files are ignored."""
+    name = os.path.basename(path)
+    return not name.startswith((".", "~")) and os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS
+
+
+def scan(paths, recursive=False):
+    """Expands directories into the video files they contain, sorted."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for root, dirs, files in os.walk(path):
+                    dirs[:] = [d for d in dirs if not d.startswith(".")]
+                    found.extend(os.path.join(root, f) for f in files)
+            else:
+                found.extend(os.path.join(path, f) for f in os.listdir(path))
+        else:
+            found.append(path)
+    return sorted(os.path.abspath(p) for p in found if os.path.isfile(p) and is_candidate(p))
+
+
+class Report:
+    """Run report; written atomically after every finished file."""
+
+    def __init__(self, path: str, mode: str, workers: int):
+        self.path = path
+        self.data = {
+            "mode": mode,
+            "workers": workers,
+            "started_at": time.time(),
+            "finished_at": None,
+            "summary": {SUCCEEDED: 0, FAILED: 0, SKIPPED: 0},
+            "files": [],
+        }
+
+    def add(self, record: dict):
+        self.data["files"].append(record)
+        self.data["summary"][record["status"]] += 1
+        status = record["status"]
+        detail = record.get("doc_path") or "; ".join(record.get("errors") or [])
+        print(f"[{status}] {record['path']} ({record.get('total_s', 0):.1f} s) {detail}", flush=True)
+        self.write()
+
+    def write(self, finished=False):
+        if finished:
+            self.data["finished_at"] = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        partial = self.path + ".partial"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(partial, self.path)
+
+
+def _executor(workers: int):
+    # spawn: workers start clean instead of inheriting the parent's threads
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker)
+
+
+def _result(future, path: str) -> dict:
+    """The file's record; a crashed worker process counts as a failed file."""
+    try:
+        return future.result()
+    except Exception as e:
+        return {"path": path, "status": FAILED, "errors": [f"Worker failed: {type(e).__name__}: {e}"]}
+
+
+def _collect(executor, pending: dict, deferred: dict, report: Report, profile=False, timeout=None):
+    """
+    Waits up to `timeout` seconds for submitted files and reports the finished
+    ones. Deferred files wait here (path -> content hash) instead of in a
+    worker, and are submitted again once their hash is no longer claimed; the
+    worker then finds the document, or processes the file if the other run
+    produced none.
+    """
+    if timeout is None and deferred:
+        timeout = DEFER_POLL_S
+    if pending:
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+    else:
+        done = ()
+        time.sleep(timeout)
+    for future in done:
+        path = pending.pop(future)
+        record = _result(future, path)
+        if record["status"] == DEFERRED:
+            deferred[path] = record["sha256"]
+        else:
+            report.add(record)
+    for path, digest in list(deferred.items()):
+        if not is_claimed(digest):
+            del deferred[path]
+            pending[executor.submit(process_file, path, profile, digest)] = path
+
+
+def run_once(paths, workers: int, report: Report, recursive=False, profile=False):
+    files = scan(paths, recursive)
+    print(f"{len(files)} video(s), {workers} worker(s)", flush=True)
+    with _executor(workers) as executor:
+        pending = {executor.submit(process_file, path, profile): path for path in files}
+        deferred = {}
+        while pending or deferred:
+            _collect(executor, pending, deferred, report, profile)
+    report.write(finished=True)
+    return report.data["summary"][FAILED] == 0
+
+
+def watch(directory: str, workers: int, report: Report, interval: float, stable_s: float, recursive=False,
+          profile=False):
+    """
+    Polls `directory` and processes new or changed videos. A file is picked
+    up once its size and mtime have not changed for `stable_s` seconds, so
+    recordings still being copied are left alone.
+    """
+    observed = {}   # path -> (size, mtime, first seen with this signature)
+    submitted = {}  # path -> (size, mtime) when it was queued
+    print(f"Watching {directory} every {interval:g} s with {workers} worker(s); Ctrl+C to stop", flush=True)
+    with _executor(workers) as executor:
+        pending = {}
+        deferred = {}
+        try:
+            while True:
+                now = time.time()
+                for path in scan([directory], recursive):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    signature = (stat.st_size, stat.st_mtime)
+                    if submitted.get(path) == signature or stat.st_size == 0:
+                        continue
+                    previous = observed.get(path)
+                    if previous is None or previous[:2] != signature:
+                        observed[path] = (*signature, now)
+                    elif now - previous[2] >= stable_s and now - stat.st_mtime >= stable_s:
+                        submitted[path] = signature
+                        del observed[path]
+                        pending[executor.submit(process_file, path, profile)] = path
+                for path in [p for p in observed if not os.path.exists(p)]:
+                    del observed[path]
+
+                _collect(executor, pending, deferred, report, profile, timeout=interval)
+        except KeyboardInterrupt:
+            print(f"Stopping; waiting for {len(pending)} running file(s)...", flush=True)
+            for future, path in pending.items():
+                record = _result(future, path)
+                if record["status"] == DEFERRED:
+                    deferred[path] = record["sha256"]
+                else:
+                    report.add(record)
+            for path in deferred:
+                report.add({"path": path, "status": FAILED,
+                            "errors": ["Not processed: stopped while an identical file was being processed"]})
+        finally:
+            report.write(finished=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Video2Word headless batch processing")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    run_parser = sub.add_parser("run", help="process videos once and exit")
+    run_parser.add_argument("paths", nargs="+", help="video files or directories")
+
+    watch_parser = sub.add_parser("watch", help="process videos dropped into a directory")
+    watch_parser.add_argument("directory")
+    watch_parser.add_argument("--interval", type=float, default=5.0, help="seconds between scans")
+    watch_parser.add_argument("--stable", type=float, default=10.0,
+                              help="seconds a file must stay unchanged before it is processed")
+
+    for p in (run_parser, watch_parser):
+        p.add_argument("--workers", type=int, default=CLI_WORKERS, help="worker processes")
+        p.add_argument("--recursive", action="store_true", help="include subdirectories")
+        p.add_argument("--profile", action="store_true",
+                       help="sample node stacks into each job's profile/ directory (graph.profiling)")
+        p.add_argument("--report", help="JSON report path (default: v2w_<mode>_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    report_path = args.report or f"v2w_{args.mode}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    report = Report(report_path, args.mode, workers)
+    print(f"Report: {os.path.abspath(report_path)}", flush=True)
+
+    if args.mode == "run":
+        return 0 if run_once(args.paths, workers, report, args.recursive, args.profile) else 1
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    watch(args.directory, workers, report, args.interval, args.stable, args.recursive, args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import os
+
+from graph.workspace import JOBS_DIR, job_dir
+
+# Bulky text (analysis Markdown, progressive sections, transcripts) is kept in
+# the job's workspace, and the state holds an "artifact://<job_id>/<name>"
+# reference instead. Every checkpoint stores the whole state, so this keeps
+# checkpoints small however long the video is. Values that are not references
+# (e.g. from checkpoints written before) load as themselves.
+PREFIX = "artifact://"
+
+
+class ArtifactMissingError(FileNotFoundError):
+    """The artifact behind a reference is gone, e.g. its job workspace was collected."""
+
+
+def is_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(PREFIX)
+
+
+def _path(ref: str) -> str:
+    job_id, _, name = ref[len(PREFIX):].partition("/")
+    return os.path.join(JOBS_DIR, os.path.basename(job_id), "artifacts", os.path.basename(name))
+
+
+def store(job_id: str, name: str, text: str) -> str:
+    """Writes `text` to the job's artifacts/<name> and returns its reference."""
+    path = os.path.join(job_dir(job_id, "artifacts"), name)
+    # Written next to the target and moved into place: a reader (or a retry
+    # of the node) never sees a half-written artifact
+    with open(path + ".partial", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".partial", path)
+    return f"{PREFIX}{job_id or 'anonymous'}/{name}"
+
+
+def load(value):
+    """The text behind a reference; anything else is returned unchanged."""
+    if not is_ref(value):
+        return value
+    try:
+        with open(_path(value), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise ArtifactMissingError(f"Artifact {value} no longer exists") from None
+
+
+def text_length(value) -> int:
+    """Characters of a text or of the artifact behind a reference (0 if gone)."""
+    try:
+        return len(load(value) or "")
+    except ArtifactMissingError:
+        return 0
@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import threading
+import uuid
+
+# Every workflow run is a LangGraph "thread" keyed by its job ID. Checkpoints
+# are written after each node, so a failed job can be resumed or retried from
+# any node without re-downloading or re-extracting.
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", os.path.join(os.getcwd(), "temp", "checkpoints.sqlite"))
+
+_checkpointer = None
+_lock = threading.Lock()
+
+
+def get_checkpointer():
+    """Returns the process-wide SQLite checkpointer."""
+    global _checkpointer
+    with _lock:
+        if _checkpointer is None:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+
+            os.makedirs(os.path.dirname(os.path.abspath(CHECKPOINT_DB)), exist_ok=True)
+            conn = sqlite3.connect(CHECKPOINT_DB, check_same_thread=False)
+            _checkpointer = SqliteSaver(conn)
+    return _checkpointer
+
+
+async def open_async_checkpointer():
+    """
+    Returns an async SQLite checkpointer on the same database, for graphs run
+    with `astream` (the sync saver does not implement the async API).
+    The caller owns the connection and closes it with `saver.conn.close()`.
+    """
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    os.makedirs(os.path.dirname(os.path.abspath(CHECKPOINT_DB)), exist_ok=True)
+    conn = await aiosqlite.connect(CHECKPOINT_DB)
+    return AsyncSqliteSaver(conn)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+# Progressive runs loop through three nodes per video window, which quickly
+# exceeds LangGraph's default limit of 25 steps
+RECURSION_LIMIT = 500
+
+
+def job_config(job_id: str) -> dict:
+    return {"configurable": {"thread_id": job_id}, "recursion_limit": RECURSION_LIMIT}
+
+
+# Retries fork the thread, so the checkpoints of the latest run are found by
+# following parents instead of listing the whole history.
+
+def _lineage(graph, job_id: str):
+    """Returns the checkpoints of the latest run of a job, newest first."""
+    snapshot = graph.get_state(job_config(job_id))
+    chain = []
+    while snapshot is not None and snapshot.config:
+        chain.append(snapshot)
+        parent = snapshot.parent_config
+        snapshot = graph.get_state(parent) if parent else None
+    return chain
+
+
+async def _alineage(graph, job_id: str):
+    snapshot = await graph.aget_state(job_config(job_id))
+    chain = []
+    while snapshot is not None and snapshot.config:
+        chain.append(snapshot)
+        parent = snapshot.parent_config
+        snapshot = await graph.aget_state(parent) if parent else None
+    return chain
+
+
+def _failed_node(history):
+    """
+    A run that was interrupted (exception, process killed) still has pending
+    nodes in its latest checkpoint. Otherwise the first node that appended to
+    `errors` is considered the failed one.
+    """
+    if not history:
+        return None
+    if history[0].next:
+        return history[0].next[0]
+
+    history = list(reversed(history))  # oldest first
+    seen_errors = 0
+    for before, after in zip(history, history[1:]):
+        errors = len(after.values.get("errors") or [])
+        if errors > seen_errors and before.next:
+            return before.next[0]
+        seen_errors = errors
+    return None
+
+
+def _checkpoint_before(history, node):
+    for snapshot in history:
+        if node in snapshot.next:
+            return {**snapshot.config, "recursion_limit": RECURSION_LIMIT}
+    return None
+
+
+def find_failed_node(graph, job_id: str):
+    """Returns the node a job should be retried from, or None if it succeeded."""
+    return _failed_node(_lineage(graph, job_id))
+
+
+def resume_config(graph, job_id: str, node: str = None):
+    """
+    Returns the config of the checkpoint taken right before `node` last ran,
+    so `graph.stream(None, config)` re-executes from there with the earlier
+    state intact. Without `node`, resumes from the failed node.
+    """
+    history = _lineage(graph, job_id)
+    node = node or _failed_node(history)
+    return _checkpoint_before(history, node) if node else None
+
+
+async def afind_failed_node(graph, job_id: str):
+    return _failed_node(await _alineage(graph, job_id))
+
+
+async def aresume_config(graph, job_id: str, node: str = None):
+    history = await _alineage(graph, job_id)
+    node = node or _failed_node(history)
+    return _checkpoint_before(history, node) if node else None
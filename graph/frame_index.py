@@ -0,0 +1,93 @@
+import json
+import os
+
+# Keyframes whose 64-bit dHashes differ in at most this many bits are treated
+# as the same picture (cursor moves, webcam overlays, compression noise).
+HASH_DISTANCE = int(os.getenv("KEYFRAME_HASH_DISTANCE", "6"))
+
+# The hash is split into BANDS bands. Two hashes within HASH_DISTANCE < BANDS
+# bits must agree exactly on at least one band (pigeonhole), so lookups only
+# compare against entries sharing a band instead of the whole index.
+BANDS = 8
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def dhash(gray) -> int:
+    """64-bit difference hash of a grayscale image."""
+    import cv2
+    import numpy as np
+
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def sharpness(gray) -> float:
+    """Variance of the Laplacian; higher means a sharper, less blurred frame."""
+    import cv2
+
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def _bands(value: int):
+    return [(band, (value >> (band * BAND_BITS)) & BAND_MASK) for band in range(BANDS)]
+
+
+class FrameIndex:
+    """
+    Perceptual-hash index over the saved keyframes of a video. Each entry is
+    one distinct picture: its best-quality image path and every timestamp at
+    which it appeared.
+    """
+
+    def __init__(self, max_distance: int = HASH_DISTANCE):
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance must be below {BANDS}")
+        self.max_distance = max_distance
+        self.entries = []
+        self._buckets = {}
+
+    def lookup(self, value: int):
+        """Returns the closest entry within max_distance bits, or None."""
+        best, best_distance = None, self.max_distance + 1
+        seen = set()
+        for key in _bands(value):
+            for entry_id in self._buckets.get(key, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                distance = (self.entries[entry_id]["hash"] ^ value).bit_count()
+                if distance < best_distance:
+                    best, best_distance = self.entries[entry_id], distance
+        return best
+
+    def add(self, value: int, path: str, quality: float, timestamp: str):
+        entry = {"id": len(self.entries), "hash": value, "path": path, "quality": quality, "timestamps": [timestamp]}
+        self.entries.append(entry)
+        for key in _bands(value):
+            self._buckets.setdefault(key, []).append(entry["id"])
+        return entry
+
+    def aliases(self, entries=None):
+        """Maps every recorded timestamp to the image path of its entry."""
+        return {ts: entry["path"] for entry in (self.entries if entries is None else entries)
+                if entry["path"] for ts in entry["timestamps"]}
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"max_distance": self.max_distance, "entries": self.entries}, f)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads a saved index, or returns an empty one if there is none."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        index = cls(data.get("max_distance", HASH_DISTANCE))
+        for entry in data.get("entries", []):
+            added = index.add(entry["hash"], entry["path"], entry["quality"], entry["timestamps"][0])
+            added["timestamps"] = entry["timestamps"]
+        return index
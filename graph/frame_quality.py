@@ -0,0 +1,85 @@
+import os
+
+# Quality gate for keyframe candidates. After a scene change the next
+# KEYFRAME_LOOKAHEAD_S sampled frames are buffered, frames that are black,
+# washed out or flat are rejected, and the sharpest frame that is stable
+# (not mid-fade or mid-pan) represents the scene.
+LOOKAHEAD_S = float(os.getenv("KEYFRAME_LOOKAHEAD_S", "2"))
+MIN_BRIGHTNESS = float(os.getenv("KEYFRAME_MIN_BRIGHTNESS", "16"))
+MAX_BRIGHTNESS = float(os.getenv("KEYFRAME_MAX_BRIGHTNESS", "250"))
+MIN_CONTRAST = float(os.getenv("KEYFRAME_MIN_CONTRAST", "8"))
+# Laplacian variance on the downscaled frame; only fully smeared frames fall below
+MIN_SHARPNESS = float(os.getenv("KEYFRAME_MIN_SHARPNESS", "5"))
+# Candidates within this share of the best sharpness count as equally sharp;
+# the earliest of them wins, so timestamps stay close to the scene change
+SHARPNESS_TOLERANCE = 0.9
+# A change at most this share of the one before counts as a transition
+# settling down rather than a new cut
+SETTLING_RATIO = 0.5
+# Stats are computed on a copy this wide, which is plenty for global measures
+STATS_WIDTH = 320
+
+
+def frame_stats(gray) -> dict:
+    """Brightness (mean), contrast (std) and sharpness (Laplacian variance) of a grayscale frame."""
+    import cv2
+
+    height, width = gray.shape[:2]
+    if width > STATS_WIDTH:
+        gray = cv2.resize(gray, (STATS_WIDTH, max(1, height * STATS_WIDTH // width)), interpolation=cv2.INTER_AREA)
+    mean, std = cv2.meanStdDev(gray)
+    return {
+        "brightness": float(mean[0][0]),
+        "contrast": float(std[0][0]),
+        "sharpness": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+    }
+
+
+def rejection_reason(stats: dict):
+    """Why a frame is useless as a keyframe ("dark", "bright", "flat", "blurry"), or None."""
+    if stats["brightness"] < MIN_BRIGHTNESS:
+        return "dark"
+    if stats["brightness"] > MAX_BRIGHTNESS:
+        return "bright"
+    if stats["contrast"] < MIN_CONTRAST:
+        return "flat"
+    if stats["sharpness"] < MIN_SHARPNESS:
+        return "blurry"
+    return None
+
+
+def in_transition(scene, candidate) -> bool:
+    """
+    True if a big change from the last candidate of a scene (dicts with
+    "stats" and "delta") is part of a transition - a fade, a blurred pan, an
+    animation settling - rather than a cut to the next scene: either frame
+    fails the quality gate, or the change keeps falling. The first change
+    of a scene is the cut into it, so it does not count as falling.
+    """
+    previous = scene[-1]
+    if rejection_reason(previous["stats"]) or rejection_reason(candidate["stats"]):
+        return True
+    return len(scene) > 1 and candidate["delta"] <= previous["delta"] * SETTLING_RATIO
+
+
+def pick_best(candidates, stable_score: float):
+    """
+    Chooses the frame representing a scene from its buffered candidates
+    (dicts with "stats" and "delta", the change score to the previous
+    sample). A candidate is stable if it barely differs from a neighbour.
+    Returns the chosen candidate, or None if all fail the quality gate.
+    """
+    usable = []
+    for i, candidate in enumerate(candidates):
+        if rejection_reason(candidate["stats"]):
+            continue
+        stable = (i > 0 and candidate["delta"] <= stable_score) or \
+                 (i + 1 < len(candidates) and candidates[i + 1]["delta"] <= stable_score)
+        usable.append((stable, candidate))
+    if not usable:
+        return None
+    # Prefer stable frames; fall back to the others (e.g. a scene shorter
+    # than the look-ahead, or one with continuous motion)
+    pool = [c for stable, c in usable if stable] or [c for _, c in usable]
+    best = max(c["stats"]["sharpness"] for c in pool)
+    return next(c for c in pool if c["stats"]["sharpness"] >= best * SHARPNESS_TOLERANCE)
@@ -0,0 +1,100 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Keyframe image encoding. WebP is smaller at the same visual quality; the
+# Word renderer converts it to JPEG when embedding.
+KEYFRAME_FORMAT = os.getenv("KEYFRAME_FORMAT", "jpg").lower()
+KEYFRAME_QUALITY = int(os.getenv("KEYFRAME_QUALITY", "95"))
+# Encoder threads (OpenCV releases the GIL while encoding) and frames that may
+# wait for them before the decoder blocks
+KEYFRAME_WRITERS = int(os.getenv("KEYFRAME_WRITERS", "2"))
+KEYFRAME_MAX_PENDING = int(os.getenv("KEYFRAME_MAX_PENDING", "8"))
+
+EXTENSIONS = {"jpg": ".jpg", "jpeg": ".jpg", "webp": ".webp"}
+
+
+def encode_params(fmt: str = KEYFRAME_FORMAT, quality: int = KEYFRAME_QUALITY):
+    """Returns (file extension, cv2.imencode params) for a keyframe format."""
+    import cv2
+
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unsupported keyframe format: {fmt}")
+    if fmt == "webp":
+        return EXTENSIONS[fmt], [cv2.IMWRITE_WEBP_QUALITY, quality]
+    return EXTENSIONS[fmt], [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+
+class FrameWriter:
+    """
+    Encodes and writes keyframes on a small thread pool so the decode loop
+    does not stall on every scene change. `write` blocks once
+    `max_pending` frames are queued (backpressure bounds memory). Paths are
+    assigned up front, so callers build their result maps deterministically.
+    Use as a context manager; leaving it waits for all writes.
+    """
+
+    def __init__(self, fmt: str = KEYFRAME_FORMAT, quality: int = KEYFRAME_QUALITY,
+                 workers: int = KEYFRAME_WRITERS, max_pending: int = KEYFRAME_MAX_PENDING):
+        self.extension, self._params = encode_params(fmt, quality)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="keyframe-writer")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.bytes_written = 0
+        self.failed = set()
+
+    def write(self, frame, path: str):
+        """Queues `frame` to be encoded and written to `path`."""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._encode_and_write, frame, path)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending[path] = future
+        future.add_done_callback(lambda _f: self._done(path, future))
+
+    def _done(self, path, future):
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+        self._slots.release()
+
+    def _encode_and_write(self, frame, path):
+        import cv2
+
+        try:
+            # cv2.imwrite does not support unicode paths on Windows, use imencode + write
+            is_success, buffer = cv2.imencode(self.extension, frame, self._params)
+            if not is_success:
+                raise ValueError("encoding failed")
+            with open(path, "wb") as f:
+                f.write(buffer)
+        except (OSError, ValueError, cv2.error) as e:
+            print(f"Keyframe write failed for {path}: {e}")
+            with self._lock:
+                self.failed.add(path)
+            return
+        with self._lock:
+            self.bytes_written += len(buffer)
+
+    def remove(self, path: str):
+        """Deletes a written (or still queued) frame once its write is done."""
+        with self._lock:
+            future = self._pending.pop(path, None)
+        if future is not None:
+            future.result()
+        if os.path.exists(path):
+            os.remove(path)
+
+    def close(self):
+        """Waits for all queued writes; failed paths are left in `failed`."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
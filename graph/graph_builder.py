@@ -1,60 +1,159 @@
+import functools
+import os
 from langgraph.graph import StateGraph, END
 from graph.state import AgentState
+from graph.stage_limits import limit_stage
+from graph.instrumentation import instrument
+from graph.profiling import profile_node
 
 # Import nodes
 from graph.nodes.classifier import classify_input
-from graph.nodes.downloader import download_video
-from graph.nodes.processor import process_video
-from graph.nodes.analyzer import analyze_video
+from graph.nodes.downloader import download_video, fetch_subtitles
+from graph.nodes.processor import process_video, extract_audio, probe_video, process_window, read_video_info, fetch_frames
+from graph.nodes.analyzer import analyze_video, analyze_window, analyze_transcript
 from graph.nodes.generator import generate_document
 
+NODES = {
+    "classifier": classify_input,
+    "downloader": download_video,
+    "processor": process_video,
+    "audio": extract_audio,
+    "probe": probe_video,
+    "analyzer": analyze_video,
+    "generator": generate_document,
+    "window_processor": process_window,
+    "window_analyzer": analyze_window,
+    "subtitles": fetch_subtitles,
+    "transcript_analyzer": analyze_transcript,
+    "frame_fetcher": fetch_frames,
+}
+
+# Stages that only need the local video file. They run concurrently and are
+# joined before the analyzer.
+MEDIA_STAGES = ["processor", "audio", "probe"]
+
+# Videos at least this long are processed progressively: window by window,
+# with a preview document after each one (0 disables the automatic switch)
+PROGRESSIVE_MIN_DURATION_S = float(os.getenv("PROGRESSIVE_MIN_DURATION_MIN", "30")) * 60
+
+# URLs: analyze the subtitle track and fetch only the frames the analysis
+# refers to, instead of downloading the video (per job: "subtitle_first")
+SUBTITLE_FIRST = os.getenv("SUBTITLE_FIRST", "").lower() in ("1", "true", "yes")
+
+def use_subtitles(state: AgentState) -> bool:
+    if state.get("subtitle_first") is not None:
+        return bool(state["subtitle_first"])
+    return SUBTITLE_FIRST
+
+def is_progressive(state: AgentState) -> bool:
+    if state.get("progressive") is not None:
+        return bool(state["progressive"])
+    if not PROGRESSIVE_MIN_DURATION_S:
+        return False
+    duration = (state.get("metadata") or {}).get("duration")
+    if not duration and state.get("video_path"):
+        # Local files: read the duration from the container header
+        info = read_video_info(state["video_path"])
+        if info and info["fps"]:
+            duration = info["frame_count"] / info["fps"]
+    return bool(duration) and duration >= PROGRESSIVE_MIN_DURATION_S
+
+def route_media(state: AgentState):
+    """Once the video file is local: all media stages, or the first progressive window."""
+    if is_progressive(state):
+        return "window_processor"
+    return MEDIA_STAGES
+
 def route_input(state: AgentState):
     """
-    Router determines whether to go to Downloader (URL) or directly to Processor (Local File).
+    Router determines whether to go to Downloader (URL) or directly to the media stages (Local File).
     """
     if state["source_type"] == "url":
+        if use_subtitles(state):
+            return "subtitles"
         return "downloader"
-    return "processor"
+    return route_media(state)
+
+def route_subtitles(state: AgentState):
+    """Subtitle-first: the transcript path, or the full download if there are no subtitles."""
+    if state.get("transcript") and state.get("video_url"):
+        return "transcript_analyzer"
+    return "downloader"
 
-def build_graph():
+def route_window(state: AgentState):
+    """After the generator: the next progressive window, or the end."""
+    window = state.get("window")
+    if window and not window.get("last"):
+        return "window_processor"
+    return END
+
+def build_graph(checkpointer=None):
     """
     Constructs the LangGraph workflow.
+    Pass a checkpointer (see graph.checkpoint) to make runs resumable per job.
     """
     workflow = StateGraph(AgentState)
     
-    # 1. Add Nodes
-    workflow.add_node("classifier", classify_input)
-    workflow.add_node("downloader", download_video)
-    workflow.add_node("processor", process_video)
-    workflow.add_node("analyzer", analyze_video)
-    workflow.add_node("generator", generate_document)
+    # 1. Add Nodes (heavy stages are capped process-wide, see STAGE_LIMITS;
+    # metrics exclude the time spent waiting for a slot). Profiling is off
+    # unless enabled for the job, see graph.profiling.
+    for name, node in NODES.items():
+        workflow.add_node(name, limit_stage(name, instrument(name, profile_node(name, node))))
     
     # 2. Add Edges
     
     # Start -> Classifier
     workflow.set_entry_point("classifier")
     
-    # Classifier -> (Router) -> Downloader OR Processor
+    # Classifier -> (Router) -> Downloader OR media stages
     workflow.add_conditional_edges(
         "classifier",
         route_input,
-        {
-            "downloader": "downloader",
-            "processor": "processor"
-        }
+        ["downloader", "subtitles", *MEDIA_STAGES, "window_processor"]
+    )
+    
+    # Subtitle-first fast path: transcript -> analyzer -> referenced frames -> generator
+    workflow.add_conditional_edges(
+        "subtitles",
+        route_subtitles,
+        ["transcript_analyzer", "downloader"]
     )
+    workflow.add_edge("transcript_analyzer", "frame_fetcher")
+    workflow.add_edge("frame_fetcher", "generator")
     
-    # Downloader -> Processor
-    workflow.add_edge("downloader", "processor")
+    # Downloader -> media stages (fan-out) OR first progressive window
+    workflow.add_conditional_edges(
+        "downloader",
+        route_media,
+        [*MEDIA_STAGES, "window_processor"]
+    )
     
-    # Processor -> Analyzer
-    workflow.add_edge("processor", "analyzer")
+    # Media stages -> Analyzer (join: waits for all branches)
+    workflow.add_edge(MEDIA_STAGES, "analyzer")
     
     # Analyzer -> Generator
     workflow.add_edge("analyzer", "generator")
     
-    # Generator -> End
-    workflow.add_edge("generator", END)
+    # Progressive mode: window processor -> window analyzer -> generator,
+    # looping until the last window has been rendered
+    workflow.add_edge("window_processor", "window_analyzer")
+    workflow.add_edge("window_analyzer", "generator")
+    
+    # Generator -> next window OR End
+    workflow.add_conditional_edges(
+        "generator",
+        route_window,
+        ["window_processor", END]
+    )
     
     # 3. Compile
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
+
+@functools.lru_cache(maxsize=None)
+def get_graph():
+    """
+    Returns the workflow compiled with the SQLite checkpointer, built once per
+    process (Streamlit reruns and jobs reuse it).
+    """
+    from graph.checkpoint import get_checkpointer
+    return build_graph(checkpointer=get_checkpointer())
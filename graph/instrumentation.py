@@ -0,0 +1,127 @@
+import contextvars
+import functools
+import json
+import re
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Domain counters of the node running in the current context. Set by
+# `instrument` around each node call; `count` is a no-op outside of it.
+_counters = contextvars.ContextVar("node_counters", default=None)
+
+
+def count(name: str, value=1):
+    """Adds `value` to a counter of the currently running node (e.g. frames_saved)."""
+    counters = _counters.get()
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + value
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None if unknown."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    except Exception:
+        return None
+
+
+def _accumulate(previous: dict, metrics: dict) -> dict:
+    """Totals over the passes of a node that runs repeatedly (progressive windows)."""
+    total = dict(previous)
+    for key, value in metrics.items():
+        if key == "peak_rss_bytes":
+            total[key] = max(filter(None, (total.get(key), value)), default=value)
+        elif isinstance(value, (int, float)) and isinstance(total.get(key, 0), (int, float)):
+            total[key] = round(total.get(key, 0) + value, 4)
+        else:
+            total[key] = value
+    return total
+
+
+def instrument(name, node):
+    """
+    Wraps a graph node so its update carries `metrics[name]`: wall time, CPU
+    time of the node's thread, process peak RSS, the number of runs and the
+    domain counters the node recorded with `count`. A node that runs again in
+    the same job (e.g. once per progressive window) adds to its totals.
+    """
+    @functools.wraps(node)
+    def instrumented(state):
+        counters = {}
+        token = _counters.set(counters)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            update = node(state)
+        finally:
+            _counters.reset(token)
+        metrics = {
+            "wall_s": round(time.perf_counter() - wall_start, 4),
+            "cpu_s": round(time.thread_time() - cpu_start, 4),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "runs": 1,
+            **counters,
+        }
+        previous = (state.get("metrics") or {}).get(name)
+        if previous:
+            metrics = _accumulate(previous, metrics)
+        update = dict(update or {})
+        update["metrics"] = {name: metrics}
+        return update
+    return instrumented
+
+
+def progress_reporter(node: str, **fields):
+    """
+    Returns `report(done, total)` that streams progress of a long-running
+    node to `stream_mode="custom"` consumers, or None outside of a graph run.
+    `fields` are added to every event (e.g. the progressive window).
+    """
+    try:
+        from langgraph.config import get_stream_writer
+        writer = get_stream_writer()
+    except Exception:
+        return None
+
+    def report(done, total):
+        writer({"type": "progress", "node": node, "done": done, "total": total, **fields})
+    return report
+
+
+def metrics_to_json(metrics: dict) -> str:
+    return json.dumps(metrics, indent=2, ensure_ascii=False)
+
+
+def _metric_name(key: str) -> str:
+    return "v2w_node_" + re.sub(r"[^a-zA-Z0-9_]", "_", key)
+
+
+def metrics_to_prometheus(metrics_by_job: dict) -> str:
+    """
+    Renders {job_id: {node: {metric: value}}} in the Prometheus text format,
+    one gauge per metric labelled with job and node.
+    """
+    samples = {}
+    for job_id, metrics in metrics_by_job.items():
+        for node, values in (metrics or {}).items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    samples.setdefault(_metric_name(key), []).append((job_id, node, value))
+
+    lines = []
+    for name in sorted(samples):
+        lines.append(f"# TYPE {name} gauge")
+        for job_id, node, value in samples[name]:
+            lines.append(f'{name}{{job="{job_id}",node="{node}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -1,9 +1,11 @@
 import os
 import base64
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+import time
 from dotenv import load_dotenv
 from graph.state import AgentState
+from graph.artifacts import load, store
+from graph.instrumentation import count
+from graph.nodes.processor import format_timestamp
 
 # Load environment variables
 load_dotenv()
@@ -13,6 +15,148 @@ API_KEY = os.getenv("GOOGLE_API_KEY")
 API_BASE = os.getenv("GOOGLE_API_BASE", "https://cli.dearmer.xyz")
 LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash-exp")
 
+SYSTEM_PROMPT = """
+    You are an expert academic researcher and technical writer.
+    I will provide you with a series of screenshots from a video, indexed by timestamp.
+    Your task is to transform this video content into a **professional academic paper (论文)** style document in Markdown format.
+    
+    **Requirements:**
+    
+    1.  **Structure**:
+        *   **Title**: Formal academic title.
+        *   **Abstract (摘要)**: Concise summary of the core content (150-200 words).
+        *   **Introduction (引言)**: Background context of the video topic.
+        *   **Core Analysis (正文分析)**: Deep dive into the content. Use academic headings (## 1. / ## 2.).
+        *   **Conclusion (结论)**: Key takeaways and synthesis.
+        
+    2.  **Tone & Style**:
+        *   Use **Academic/Scholarly tone** (objective, analytical, formal).
+        *   Avoid colloquialisms. Use professional terminology.
+        *   "Deep Analysis": Don't just describe what is happening; analyze *why* it is important and the underlying logic.
+        
+    3.  **Visual Evidence**:
+        *   Treat screenshots as "Figures".
+        *   When discussing a specific visual concept, insert the tag `[INSERT_IMAGE: HH:MM:SS]`.
+        *   Refer to images formally, e.g., "As shown in the figure above...".
+        
+    4.  **Language**: Simplified Chinese (简体中文).
+    
+    **CRITICAL CONSTRAINT**:
+    *   Do NOT invent external references or bibliography (citations).
+    *   The "Reference" is ONLY the video content itself.
+    *   Do not hallucinate paper titles that were not explicitly mentioned in the video.
+    """
+
+# Progressive mode: the paper is written window by window; later windows
+# continue the document that earlier ones started.
+WINDOW_SCOPES = {
+    "first": """
+    **Progressive mode**: the screenshots cover only the FIRST part of a longer video ({start} - {end} of {total}).
+    Write the title, abstract, introduction and the analysis sections for this part.
+    Do NOT write a conclusion yet; the analysis of later parts will be appended.
+    """,
+    "middle": """
+    **Progressive mode**: the screenshots cover a LATER part of the video ({start} - {end} of {total}).
+    The document so far has these sections:
+    {headings}
+    Continue the paper: write ONLY the analysis sections for this part, continuing the `## N.` numbering.
+    Do NOT repeat the title, abstract, introduction, and do NOT write a conclusion yet.
+    """,
+    "last": """
+    **Progressive mode**: the screenshots cover the LAST part of the video ({start} - {end} of {total}).
+    The document so far has these sections:
+    {headings}
+    Continue the paper: write the analysis sections for this part, continuing the `## N.` numbering,
+    then finish with the Conclusion (结论) for the whole video.
+    Do NOT repeat the title, abstract or introduction.
+    """,
+}
+
+# Subtitle-first fast path: the transcript replaces the screenshots, which
+# are fetched afterwards for the timestamps the paper refers to.
+TRANSCRIPT_SCOPE = """
+    **Transcript mode**: instead of screenshots you get the video's subtitle transcript,
+    one line per `[HH:MM:SS]` timestamp (automatic captions may contain recognition errors).
+    Screenshots are taken afterwards at the timestamps you reference: insert `[INSERT_IMAGE: HH:MM:SS]`
+    where the video most likely shows something worth seeing (slides, diagrams, code, demonstrations),
+    using timestamps from the transcript. Use at most {max_images} images.
+    """
+
+# Images sent per request
+MAX_IMAGES = 20
+
+def _make_llm():
+    # Imported lazily: langchain is slow to import and only needed here
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        api_key=API_KEY,
+        base_url=f"{API_BASE}/v1" if not API_BASE.endswith("/v1") else API_BASE,
+        temperature=0.3,
+        max_tokens=4096
+    )
+
+def _select_frames(screenshots_map, keys, limit=MAX_IMAGES):
+    """
+    Up to `limit` evenly spaced distinct images as (path, timestamps) pairs.
+    Near-duplicate keyframes share one image path (see graph.frame_index),
+    so each image is sent once with all timestamps it appears at.
+    """
+    frames = {}
+    for ts in sorted(keys):
+        frames.setdefault(screenshots_map[ts], []).append(ts)
+    distinct = sorted(frames.items(), key=lambda item: item[1][0])
+    if len(distinct) > limit:
+        step = len(distinct) // limit
+        return distinct[::step][:limit]
+    return distinct
+
+def _mime_type(path):
+    """Keyframes are JPEG or WebP (see KEYFRAME_FORMAT)."""
+    return "image/webp" if path.lower().endswith(".webp") else "image/jpeg"
+
+def _ask(system_prompt, frames):
+    """Sends the (path, timestamps) frames to the LLM and returns its Markdown."""
+    content_parts = []
+    content_parts.append({"type": "text", "text": "Here are the keyframes from the video:"})
+
+    for img_path, timestamps in frames:
+        with open(img_path, "rb") as image_file:
+            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+        count("images_sent")
+        count("image_bytes_sent", len(base64_image))
+        
+        text = f"Timestamp: {timestamps[0]}"
+        if len(timestamps) > 1:
+            text += f" (shown again at {', '.join(timestamps[1:])})"
+        content_parts.append({
+            "type": "text",
+            "text": text
+        })
+        content_parts.append({
+            "type": "image_url",
+            "image_url": {"url": f"data:{_mime_type(img_path)};base64,{base64_image}"}
+        })
+
+    return _invoke(system_prompt, content_parts)
+
+def _invoke(system_prompt, content_parts):
+    """Sends one request to the LLM and returns its Markdown."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    llm = _make_llm()
+    message = HumanMessage(content=content_parts)
+    
+    print("Sending request to LLM...")
+    llm_start = time.perf_counter()
+    response = llm.invoke([SystemMessage(content=system_prompt), message])
+    count("llm_latency_s", round(time.perf_counter() - llm_start, 3))
+    usage = getattr(response, "usage_metadata", None) or {}
+    count("llm_input_tokens", usage.get("input_tokens", 0))
+    count("llm_output_tokens", usage.get("output_tokens", 0))
+    return response.content
+
 def analyze_video(state: AgentState) -> AgentState:
     """
     Analyzes the video using an OpenAI-compatible API (e.g. OneAPI wrapping Gemini)
@@ -28,101 +172,92 @@ def analyze_video(state: AgentState) -> AgentState:
     """
     screenshots_map = state.get("screenshots", {})
     if not screenshots_map:
-        current_errors = state.get("errors", []) or []
-        current_errors.append("No screenshots extracted for analysis.")
-        return {**state, "errors": current_errors}
+        return {"errors": ["No screenshots extracted for analysis."]}
 
     if not API_KEY:
-        current_errors = state.get("errors", []) or []
-        current_errors.append("API Key not found.")
-        return {**state, "errors": current_errors}
+        return {"errors": ["API Key not found."]}
 
     try:
-        # Initialize ChatOpenAI
-        llm = ChatOpenAI(
-            model=LLM_MODEL,
-            api_key=API_KEY,
-            base_url=f"{API_BASE}/v1" if not API_BASE.endswith("/v1") else API_BASE,
-            temperature=0.3,
-            max_tokens=4096
-        )
-
-        # Prepare System Prompt
-        system_prompt = """
-        You are an expert academic researcher and technical writer.
-        I will provide you with a series of screenshots from a video, indexed by timestamp.
-        Your task is to transform this video content into a **professional academic paper (论文)** style document in Markdown format.
-        
-        **Requirements:**
-        
-        1.  **Structure**:
-            *   **Title**: Formal academic title.
-            *   **Abstract (摘要)**: Concise summary of the core content (150-200 words).
-            *   **Introduction (引言)**: Background context of the video topic.
-            *   **Core Analysis (正文分析)**: Deep dive into the content. Use academic headings (## 1. / ## 2.).
-            *   **Conclusion (结论)**: Key takeaways and synthesis.
-            
-        2.  **Tone & Style**:
-            *   Use **Academic/Scholarly tone** (objective, analytical, formal).
-            *   Avoid colloquialisms. Use professional terminology.
-            *   "Deep Analysis": Don't just describe what is happening; analyze *why* it is important and the underlying logic.
-            
-        3.  **Visual Evidence**:
-            *   Treat screenshots as "Figures".
-            *   When discussing a specific visual concept, insert the tag `[INSERT_IMAGE: HH:MM:SS]`.
-            *   Refer to images formally, e.g., "As shown in the figure above...".
-            
-        4.  **Language**: Simplified Chinese (简体中文).
-        
-        **CRITICAL CONSTRAINT**:
-        *   Do NOT invent external references or bibliography (citations).
-        *   The "Reference" is ONLY the video content itself.
-        *   Do not hallucinate paper titles that were not explicitly mentioned in the video.
-        """
-
-        # Prepare User Message with Images
         # We need to limit the number of images to avoid token limits if the video is huge.
         # Let's take up to 20 evenly spaced frames for this version.
-        
-        sorted_keys = sorted(screenshots_map.keys())
-        # Simple sampling if too many
-        if len(sorted_keys) > 20:
-            step = len(sorted_keys) // 20
-            selected_keys = sorted_keys[::step][:20]
-        else:
-            selected_keys = sorted_keys
-
-        content_parts = []
-        content_parts.append({"type": "text", "text": "Here are the keyframes from the video:"})
-
-        for ts in selected_keys:
-            img_path = screenshots_map[ts]
-            with open(img_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            content_parts.append({
-                "type": "text",
-                "text": f"Timestamp: {ts}"
-            })
-            content_parts.append({
-                "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-            })
-
-        message = HumanMessage(content=content_parts)
-        
-        print("Sending request to LLM...")
-        response = llm.invoke([SystemMessage(content=system_prompt), message])
+        frames = _select_frames(screenshots_map, screenshots_map.keys())
+        return {"analysis_result": store(state.get("job_id"), "analysis.md", _ask(SYSTEM_PROMPT, frames))}
+
+    except Exception as e:
+        return {"errors": [f"Analysis failed: {str(e)}"]}
+
+def analyze_transcript(state: AgentState) -> AgentState:
+    """
+    Subtitle-first fast path: writes the paper from the subtitle transcript
+    alone. The frames its [INSERT_IMAGE] tags refer to are fetched afterwards
+    (see processor.fetch_frames).
+    """
+    if not state.get("transcript"):
+        return {}
+
+    if not API_KEY:
+        return {"errors": ["API Key not found."]}
+
+    metadata = state.get("metadata") or {}
+    system_prompt = SYSTEM_PROMPT + TRANSCRIPT_SCOPE.format(max_images=MAX_IMAGES)
+    header = f"Video: {metadata.get('title', 'Unknown Title')}"
+    if metadata.get("duration"):
+        header += f" ({format_timestamp(metadata['duration'])})"
 
-        return {
-            **state,
-            "analysis_result": response.content
-        }
+    try:
+        transcript = load(state["transcript"])
+        count("transcript_chars", len(transcript))
+        analysis = _invoke(system_prompt, [
+            {"type": "text", "text": f"{header}\nHere is the transcript of the video:"},
+            {"type": "text", "text": transcript},
+        ])
+        return {"analysis_result": store(state.get("job_id"), "analysis.md", analysis)}
+    except Exception as e:
+        return {"errors": [f"Analysis failed: {str(e)}"]}
+
+def _seconds(timestamp):
+    h, m, s = (int(part) for part in timestamp.split(":"))
+    return h * 3600 + m * 60 + s
+
+def analyze_window(state: AgentState) -> AgentState:
+    """
+    Progressive mode: analyzes the screenshots of the current time window and
+    appends the resulting Markdown to `sections`.
+    """
+    window = state.get("window") or {}
+    if window.get("failed"):
+        return {}
+    screenshots_map = state.get("screenshots", {})
+    start_s, end_s = window.get("start_s", 0), window.get("end_s", 0)
+    # Pictures that already appeared in an earlier window were analyzed there
+    earlier = {path for ts, path in screenshots_map.items() if _seconds(ts) < start_s}
+    keys = [ts for ts, path in screenshots_map.items()
+            if path not in earlier
+            and (start_s <= _seconds(ts) < end_s or (window.get("last") and _seconds(ts) >= end_s))]
+    if not keys:
+        return {}
+
+    if not API_KEY:
+        return {"errors": ["API Key not found."]}
+
+    if window.get("index", 0) == 0:
+        scope = "" if window.get("last") else "first"
+    else:
+        scope = "last" if window.get("last") else "middle"
+
+    try:
+        system_prompt = SYSTEM_PROMPT
+        if scope:
+            headings = [line for section in state.get("sections") or [] for line in load(section).splitlines()
+                        if line.startswith(("# ", "## "))]
+            system_prompt += WINDOW_SCOPES[scope].format(
+                start=format_timestamp(start_s),
+                end=format_timestamp(end_s),
+                total=format_timestamp(window.get("duration_s", end_s)),
+                headings="\n    ".join(headings) or "(none)",
+            )
 
+        section = _ask(system_prompt, _select_frames(screenshots_map, keys))
+        return {"sections": [store(state.get("job_id"), f"section_{window.get('index', 0):03d}.md", section)]}
     except Exception as e:
-        current_errors = state.get("errors", []) or []
-        current_errors.append(f"Analysis failed: {str(e)}")
-        return {
-            **state,
-            "errors": current_errors
-        }
\ No newline at end of file
+        return {"errors": [f"Analysis of {format_timestamp(start_s)}-{format_timestamp(end_s)} failed: {str(e)}"]}
@@ -1,7 +1,7 @@
 import os
-import re
-from urllib.parse import urlparse
 from graph.state import AgentState
+from graph.platforms import is_url, resolve
+from graph.workspace import pin
 
 def classify_input(state: AgentState) -> AgentState:
     """
@@ -10,31 +10,21 @@ def classify_input(state: AgentState) -> AgentState:
     """
     input_source = state["input_source"]
     
-    # Check if it's a local file
-    if os.path.exists(input_source):
+    # URLs are recognized by their scheme; only other inputs touch the filesystem
+    if not is_url(input_source) and os.path.exists(input_source):
+        # Uploads live in the shared cache; keep them while the job runs
+        pin(state.get("job_id"), input_source)
         return {
-            **state,
             "source_type": "local",
             "platform": "local",
             "video_path": input_source
         }
     
-    # Assume it's a URL if not a file
-    parsed_url = urlparse(input_source)
-    domain = parsed_url.netloc.lower()
-    
-    platform = "other"
-    if "bilibili" in domain:
-        platform = "bilibili"
-    elif "douyin" in domain:
-        platform = "douyin"
-    elif "xiaohongshu" in domain:
-        platform = "xiaohongshu"
-    elif "youtube" in domain or "youtu.be" in domain:
-        platform = "youtube"
-        
+    # Short links are expanded so platform-specific download paths apply
+    resolved = resolve(input_source)
     return {
-        **state,
         "source_type": "url",
-        "platform": platform
-    }
\ No newline at end of file
+        "platform": resolved["platform"],
+        "canonical_url": resolved["canonical_url"],
+        "video_id": resolved["video_id"]
+    }
@@ -1,13 +1,15 @@
 import os
-import re
 import time
-import requests
 import traceback
-import yt_dlp
 import subprocess
 import json
 import sys
 from graph.state import AgentState
+from graph.artifacts import store
+from graph.instrumentation import count
+from graph.platforms import detect_platform, referer_for, resolve
+from graph.subtitles import format_transcript, parse_subtitles, pick_track
+from graph.workspace import WorkspaceFullError, cache_dir, ensure_space, job_dir, pin
 
 def download_with_playwright(url: str, output_path: str) -> dict:
     """
@@ -15,11 +17,13 @@ def download_with_playwright(url: str, output_path: str) -> dict:
     This avoids asyncio loop conflicts with Streamlit/Tornado on Windows.
     """
     script_path = os.path.join(os.getcwd(), "tools", "universal_downloader.py")
+    # The Referer comes from the platform registry, so the script keeps no table of its own
+    referer = referer_for(url)
     
     # Run the separate script
     try:
         result = subprocess.run(
-            [sys.executable, script_path, url, output_path],
+            [sys.executable, script_path, url, output_path] + ([referer] if referer else []),
             capture_output=True,
             text=True,
             encoding='utf-8',
@@ -42,33 +46,85 @@ def download_with_playwright(url: str, output_path: str) -> dict:
             raise Exception("Douyin Anti-Bot verification triggered.")
         if "VIDEO_NOT_FOUND" in stdout:
             raise Exception("Video source could not be found on page.")
+        if "STREAM_ENCRYPTED" in stdout:
+            raise Exception("Video stream is encrypted (DRM) and cannot be downloaded.")
             
         raise Exception(f"Subprocess failed. Stderr: {stderr}")
         
     except Exception as e:
         raise Exception(f"External downloader failed: {str(e)}")
 
-def clean_douyin_url(url: str) -> str:
+def download_key(platform: str, video_id: str):
     """
-    Cleans Douyin URL to be friendly for yt-dlp.
-    Converts .../jingxuan?modal_id=xxx -> .../video/xxx
+    Cache key of a video: the registry's platform and video ID (e.g.
+    "bilibili_BV1xx411c7mD_p2"), so parts and other platforms' IDs never
+    share an entry. None without a video ID.
     """
-    if "douyin.com" in url and "modal_id=" in url:
-        match = re.search(r'modal_id=(\d+)', url)
-        if match:
-            video_id = match.group(1)
-            return f"https://www.douyin.com/video/{video_id}"
-    return url
+    return f"{platform}_{video_id}" if video_id else None
+
+def _meta_path(key: str) -> str:
+    return os.path.join(cache_dir("downloads"), f"{key}.meta.json")
+
+def cached_download(key: str):
+    """
+    Video path and metadata from an earlier download under this key, so a
+    repeated URL (or a short link to it) skips yt-dlp's extraction round trips.
+    """
+    if not key:
+        return None
+    meta_path = _meta_path(key)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(cached.get("video_path", "")):
+        return None
+    # Mark as recently used for the cache's LRU eviction
+    os.utime(cached["video_path"], None)
+    os.utime(meta_path, None)
+    return cached
+
+def remember_download(key: str, video_path: str, metadata: dict):
+    """Writes the metadata sidecar that cached_download looks up."""
+    with open(_meta_path(key), "w", encoding="utf-8") as f:
+        json.dump({"video_path": video_path, "metadata": metadata}, f, ensure_ascii=False)
+
+# Subtitle-first fast path: frames are seeked from the lowest rendition at
+# least this tall (or the tallest one there is)
+FRAME_FETCH_MIN_HEIGHT = int(os.getenv("FRAME_FETCH_MIN_HEIGHT", "720"))
+
+def pick_stream(info: dict):
+    """
+    The yt-dlp format to seek single frames from, or None. Plain HTTP files
+    (seekable with range requests) and HLS playlists qualify; fragmented
+    DASH and DRM-protected formats do not.
+    """
+    candidates = [f for f in info.get("formats") or []
+                  if f.get("url") and f.get("vcodec") != "none"
+                  and not f.get("fragments") and not f.get("has_drm")
+                  and (f.get("protocol") or "https").split("_")[0] in ("http", "https", "m3u8")]
+    if not candidates:
+        return None
+    # Progressive files first: ffmpeg fetches a few ranges instead of playlist segments
+    progressive = [f for f in candidates if not f.get("protocol", "https").startswith("m3u8")]
+    candidates = progressive or candidates
+    key = lambda f: (f.get("height") or 0, f.get("tbr") or 0)
+    tall_enough = [f for f in candidates if (f.get("height") or 0) >= FRAME_FETCH_MIN_HEIGHT]
+    return min(tall_enough, key=key) if tall_enough else max(candidates, key=key)
+
+def needs_playwright_fallback(url: str, error_msg: str) -> bool:
+    """True if a yt-dlp failure is a cookie/403 issue the Playwright downloader can work around."""
+    return detect_platform(url) in ("douyin", "bilibili") and \
+           any(x in error_msg.lower() for x in ["cookie", "403", "forbidden"])
 
 def get_ydl_opts(url, output_template):
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
     }
-    
-    if "douyin.com" in url:
-        headers['Referer'] = 'https://www.douyin.com/'
-    elif "bilibili.com" in url:
-        headers['Referer'] = 'https://www.bilibili.com/'
+    referer = referer_for(url)
+    if referer:
+        headers['Referer'] = referer
         
     return {
         'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
@@ -78,67 +134,156 @@ def get_ydl_opts(url, output_template):
         'http_headers': headers
     }
 
+def fetch_subtitles(state: AgentState) -> AgentState:
+    """
+    Subtitle-first fast path: fetches metadata and the subtitle track only
+    (kilobytes instead of the whole video), plus the URL of a video stream
+    that the frames the analysis refers to are later seeked from (see
+    processor.fetch_frames). Without usable subtitles `transcript` stays
+    empty and the video is downloaded as usual.
+    """
+    url = state.get("canonical_url") or state.get("input_source")
+    if not url:
+        return {}
+
+    ydl_opts = get_ydl_opts(url, os.path.join(cache_dir("downloads"), '%(extractor)s_%(id)s.%(ext)s'))
+    ydl_opts["skip_download"] = True
+
+    import yt_dlp
+
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            metadata = {
+                "title": info.get("title", "Unknown Title"),
+                "duration": info.get("duration", 0),
+                "uploader": info.get("uploader", "Unknown")
+            }
+            track = pick_track(info)
+            stream = pick_stream(info)
+            if not track or not stream:
+                print(f"Subtitle-first: no {'subtitles' if not track else 'seekable stream'}, downloading the video")
+                count("subtitle_fallbacks")
+                return {"metadata": metadata}
+
+            lang, entry, automatic = track
+            data = entry.get("data")
+            if data is None:
+                data = ydl.urlopen(entry["url"]).read().decode("utf-8", errors="replace")
+    except Exception as e:
+        # The download path has its own fallbacks (cookies, browser)
+        print(f"Subtitle-first: fetching subtitles failed, downloading the video: {e}")
+        count("subtitle_fallbacks")
+        return {}
+
+    count("subtitle_bytes", len(data.encode("utf-8")))
+    try:
+        transcript = format_transcript(parse_subtitles(data, entry["ext"]))
+    except ValueError as e:
+        print(f"Subtitle-first: unreadable {entry['ext']} subtitles, downloading the video: {e}")
+        transcript = ""
+    if not transcript:
+        count("subtitle_fallbacks")
+        return {"metadata": metadata}
+
+    print(f"Subtitle-first: {'automatic' if automatic else 'uploaded'} {lang} subtitles, "
+          f"{len(transcript)} characters; frames from the {stream.get('format_id')} stream")
+    return {
+        "transcript": store(state.get("job_id"), "transcript.txt", transcript),
+        "video_url": stream["url"],
+        "video_headers": {**ydl_opts["http_headers"], **(stream.get("http_headers") or {})},
+        "metadata": metadata,
+    }
+
 def download_video(state: AgentState) -> AgentState:
     """
     Downloads video from the input URL using yt-dlp.
     """
     raw_url = state.get("input_source")
     if not raw_url:
-        return state
+        return {}
 
-    # Preprocess URL for specific platforms
-    url = clean_douyin_url(raw_url)
+    # Canonical URL and video ID from the classifier (short links expanded)
+    if state.get("canonical_url"):
+        url, video_id = state["canonical_url"], state.get("video_id")
+        platform = state.get("platform") or detect_platform(url)
+    else:
+        resolved = resolve(raw_url)
+        url, video_id, platform = resolved["canonical_url"], resolved["video_id"], resolved["platform"]
+    key = download_key(platform, video_id)
 
-    # Ensure temp directory exists
-    temp_dir = os.path.join(os.getcwd(), "temp")
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    # Template for output filename
-    output_template = os.path.join(temp_dir, '%(title)s.%(ext)s')
+    job_id = state.get("job_id")
+    cached = cached_download(key)
+    if cached:
+        print(f"Download cache hit: {key}")
+        count("download_cache_hits")
+        pin(job_id, cached["video_path"])
+        return {"video_path": cached["video_path"], "metadata": cached["metadata"]}
+
+    try:
+        ensure_space(job_id)
+    except WorkspaceFullError as e:
+        return {"errors": [f"Download skipped: {str(e)}"]}
+
+    # Source videos are cached across jobs under their download key (else
+    # yt-dlp's extractor and ID); yt-dlp skips the download when the file is
+    # already there
+    template = f"{key}.%(ext)s" if key else '%(extractor)s_%(id)s.%(ext)s'
+    output_template = os.path.join(cache_dir("downloads"), template)
     
     ydl_opts = get_ydl_opts(url, output_template)
 
+    # Imported lazily: yt-dlp loads all of its extractors on import
+    import yt_dlp
+
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
             filename = ydl.prepare_filename(info)
+            if os.path.exists(filename):
+                # Mark as recently used for the cache's LRU eviction
+                os.utime(filename, None)
+                count("bytes_downloaded", os.path.getsize(filename))
             
+            metadata = {
+                "title": info.get("title", "Unknown Title"),
+                "duration": info.get("duration", 0),
+                "uploader": info.get("uploader", "Unknown")
+            }
+            if os.path.exists(filename):
+                if key:
+                    remember_download(key, filename, metadata)
+                pin(job_id, filename)
             return {
-                **state,
                 "video_path": filename,
-                "metadata": {
-                    "title": info.get("title", "Unknown Title"),
-                    "duration": info.get("duration", 0),
-                    "uploader": info.get("uploader", "Unknown")
-                }
+                "metadata": metadata
             }
     except Exception as e:
         error_msg = str(e)
         # Check if it's a cookie or 403 issue, try Playwright fallback for Douyin and Bilibili
-        is_retryable = any(x in url for x in ["douyin", "bilibili"]) and \
-                       any(x in error_msg.lower() for x in ["cookie", "403", "forbidden"])
-        
-        if is_retryable:
+        if needs_playwright_fallback(url, error_msg):
             try:
-                fallback_filename = os.path.join(temp_dir, f"fallback_{int(time.time())}.mp4")
+                if key:
+                    # Cached like yt-dlp downloads, so the slow path runs once per video
+                    fallback_filename = os.path.join(cache_dir("downloads"), f"browser_{key}.mp4")
+                else:
+                    fallback_filename = os.path.join(job_dir(job_id, "download"), f"fallback_{int(time.time())}.mp4")
                 metadata = download_with_playwright(url, fallback_filename)
+                count("bytes_downloaded", os.path.getsize(fallback_filename))
+                if key:
+                    remember_download(key, fallback_filename, metadata)
+                    pin(job_id, fallback_filename)
                 
                 return {
-                    **state,
                     "video_path": fallback_filename,
                     "metadata": metadata
                 }
             except Exception as e_pw:
-                current_errors = state.get("errors", []) or []
-                current_errors.append(f"Download failed (yt-dlp): {error_msg}")
                 # Log full traceback to debug the 'empty error' issue
                 tb_str = traceback.format_exc()
-                current_errors.append(f"Download failed (Playwright fallback): {str(e_pw)} | Trace: {tb_str}")
-                return {**state, "errors": current_errors}
+                return {"errors": [
+                    f"Download failed (yt-dlp): {error_msg}",
+                    f"Download failed (Playwright fallback): {str(e_pw)} | Trace: {tb_str}"
+                ]}
         
-        current_errors = state.get("errors", []) or []
-        current_errors.append(f"Download failed: {error_msg}")
-        return {
-            **state,
-            "errors": current_errors
-        }
\ No newline at end of file
+        return {"errors": [f"Download failed: {error_msg}"]}
\ No newline at end of file
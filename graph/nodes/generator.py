@@ -2,18 +2,14 @@ import os
 import re
 from datetime import datetime, timedelta
 from graph.state import AgentState
+from graph.artifacts import ArtifactMissingError, load
+from graph.instrumentation import count
+from graph.workspace import OUTPUTS_DIR
+from graph.uploads import remember_result, upload_digest
 
-# Note: In a real agentic runtime, we would use the `use_mcp_tool` capability.
-# However, since we are inside the application logic here, we will simulate the MCP client
-# or directly call the logic if the server is local. 
-# For this implementation, to keep it robust and self-contained, I will import the logic 
-# directly but structure it as if it were a tool call, preparing for the actual MCP integration.
-#
-# If the user wants strictly MCP interaction, we would set up an MCP client here.
-# For simplicity in this codebase, I will reuse the logic from the server file directly 
-# or implement the "Client" side of the logic.
-
-from word_mcp_server.server import generate_docx  # Direct import for simplicity in monolithic app
+# Rendering goes through the Word MCP server when WORD_MCP_SERVER_CMD is set
+# (pooled, persistent stdio sessions), otherwise it runs in-process.
+from word_mcp_server.client import render_document
 
 def parse_timestamp(timestamp_str):
     """Parses HH:MM:SS to total seconds."""
@@ -54,12 +50,21 @@ def generate_document(state: AgentState) -> AgentState:
     """
     Generates the final Word document.
     """
-    markdown_content = state.get("analysis_result")
+    # Progressive mode renders all windows analyzed so far
+    sections = state.get("sections")
+    window = state.get("window")
+    if window and window.get("failed"):
+        # The preview of the windows before stays the latest document
+        return {}
+    try:
+        markdown_content = "\n\n".join(map(load, sections)) if sections else load(state.get("analysis_result"))
+    except ArtifactMissingError as e:
+        return {"errors": [f"Document generation failed: {str(e)}"]}
     screenshots_map = state.get("screenshots", {})
     metadata = state.get("metadata", {})
     
     if not markdown_content:
-        return state
+        return {}
 
     # Pre-process content to match LLM timestamps with actual file keys
     # The LLM might say 00:05:00 but we have frame_00-05-02.jpg
@@ -81,25 +86,32 @@ def generate_document(state: AgentState) -> AgentState:
     processed_content = re.sub(r'\[INSERT_IMAGE:\s*(.*?)\]', replace_tag, markdown_content)
     
     # Define Output Path
-    output_dir = os.path.join(os.getcwd(), "outputs")
+    output_dir = OUTPUTS_DIR
     os.makedirs(output_dir, exist_ok=True)
     
-    safe_title = re.sub(r'[\\/*?:"<>|]', "", metadata.get("title", "document"))
-    filename = f"{safe_title}_{datetime.now().strftime('%Y%m%d%H%M')}.docx"
-    output_path = os.path.join(output_dir, filename)
+    # Later windows of a progressive run update the same document
+    output_path = state.get("doc_path") if window else None
+    if not output_path:
+        safe_title = re.sub(r'[\\/*?:"<>|]', "", metadata.get("title", "document"))
+        # The job ID keeps concurrent jobs on same-titled videos apart
+        suffix = f"_{state['job_id']}" if state.get("job_id") else ""
+        filename = f"{safe_title}_{datetime.now().strftime('%Y%m%d%H%M')}{suffix}.docx"
+        output_path = os.path.join(output_dir, filename)
     
     try:
-        # Call the "Tool" (Function)
-        generate_docx(processed_content, output_path, final_image_map)
+        # Call the "Tool". Rendered next to the target and moved into place,
+        # so a preview being downloaded is never half-written.
+        partial_path = output_path + ".partial"
+        render_document(processed_content, partial_path, final_image_map)
+        os.replace(partial_path, output_path)
+        count("docx_bytes", os.path.getsize(output_path))
+        
+        if window and not window.get("last"):
+            # A preview; the final document carries no version
+            return {"doc_path": output_path, "doc_version": window["index"] + 1}
+        # Uploading the same file again returns this document right away
+        remember_result(upload_digest(state.get("input_source")), output_path)
         
-        return {
-            **state,
-            "doc_path": output_path
-        }
+        return {"doc_path": output_path}
     except Exception as e:
-        current_errors = state.get("errors", []) or []
-        current_errors.append(f"Document generation failed: {str(e)}")
-        return {
-            **state,
-            "errors": current_errors
-        }
\ No newline at end of file
+        return {"errors": [f"Document generation failed: {str(e)}"]}
\ No newline at end of file
@@ -1,97 +1,488 @@
 import os
-import cv2
-import numpy as np
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from graph.state import AgentState
+from graph.artifacts import ArtifactMissingError, load
+from graph.instrumentation import count, progress_reporter
+from graph.workspace import WorkspaceFullError, ensure_space, job_dir
+from graph.frame_index import FrameIndex, dhash, sharpness
+from graph.frame_quality import LOOKAHEAD_S, frame_stats, in_transition, pick_best, rejection_reason
+from graph.frame_writer import FrameWriter
 
-def extract_keyframes(video_path, output_dir, threshold=30):
+# Report progress every N decoded frames
+PROGRESS_EVERY_FRAMES = 250
+
+# A duplicate keyframe replaces the stored image only if this much sharper
+UPGRADE_MARGIN = 1.1
+
+# Progressive mode (see process_window): window sizes in seconds
+PROGRESSIVE_FIRST_WINDOW_S = float(os.getenv("PROGRESSIVE_FIRST_WINDOW_MIN", "3")) * 60
+PROGRESSIVE_MAX_WINDOW_S = float(os.getenv("PROGRESSIVE_MAX_WINDOW_MIN", "30")) * 60
+
+# Subtitle-first fast path (see fetch_frames): frames referenced by the
+# analysis are seeked in the remote stream, this many at a time
+FRAME_FETCH_WORKERS = int(os.getenv("FRAME_FETCH_WORKERS", "4"))
+FRAME_FETCH_MAX = 30
+FRAME_FETCH_TIMEOUT_S = 60
+IMAGE_TAG_RE = re.compile(r'\[INSERT_IMAGE:\s*(.*?)\]')
+
+def extract_keyframes(video_path, output_dir, threshold=30, progress_callback=None, start_s=0, end_s=None,
+                      frame_index=None):
     """
     Extracts keyframes based on scene changes.
     Returns a dictionary mapping timestamp (HH:MM:SS) to image path.
+    `progress_callback(frames_done, frames_total)` is called periodically.
+    With `start_s`/`end_s` only that window of the video is decoded.
+
+    After a scene change the following seconds are looked at as well, and
+    the sharpest stable frame that passes the quality gate represents the
+    scene (see graph.frame_quality); fades, black transitions and motion
+    blur are skipped.
+
+    Scene changes that show a picture seen before anywhere in the video (per
+    `frame_index`, see graph.frame_index) are not saved again: their
+    timestamps map to the existing image, which is replaced if the new
+    frame is sharper.
     """
+    import cv2
+
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         return {}
 
     fps = cap.get(cv2.CAP_PROP_FPS)
-    prev_frame = None
-    screenshots = {}
-    frame_count = 0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    start_frame = int(start_s * fps)
+    end_frame = int(end_s * fps) if end_s is not None else None
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    prev_kept = None    # blurred gray of the last kept keyframe
+    prev_sample = None  # blurred gray of the previous sampled frame
+    scene = []          # quality candidates of the scene being looked at
+    # Candidates buffered after a change, at one sample per second
+    lookahead = max(0, int(round(LOOKAHEAD_S)))
+    stable_score = threshold / 3
+    index = frame_index if frame_index is not None else FrameIndex()
+    touched = {}
+    frame_count = start_frame
+    frames_sampled = 0
     
     # Create screenshots directory
     os.makedirs(output_dir, exist_ok=True)
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        # Process every nth frame (e.g., every 1 second) to speed up
-        if frame_count % int(fps) == 0:
-            timestamp_seconds = frame_count / fps
-            timestamp_str = format_timestamp(timestamp_seconds)
+    # Keyframes are encoded and written in the background while decoding goes on
+    with FrameWriter() as writer:
+        while end_frame is None or frame_count < end_frame:
+            ret, frame = cap.read()
+            if not ret:
+                break
+                
+            # Process every nth frame (e.g., every 1 second) to speed up
+            if frame_count % int(fps) == 0:
+                frames_sampled += 1
+                timestamp_seconds = frame_count / fps
+                timestamp_str = format_timestamp(timestamp_seconds)
+                
+                # Convert to grayscale for comparison
+                raw_gray, gray = grayscale(frame)
+                # Candidates keep only the colour frame (grays are recomputed
+                # for the chosen one); frames failing the gate not even that
+                stats = frame_stats(raw_gray)
+                candidate = {"frame": None if rejection_reason(stats) else frame,
+                             "timestamp": timestamp_str, "stats": stats}
+                
+                candidate["delta"] = change_score(prev_sample, gray) if prev_sample is not None else float("inf")
+                if scene:
+                    settled = any(c["delta"] <= stable_score for c in scene[1:])
+                    if candidate["delta"] > threshold and (settled or not in_transition(scene, candidate)):
+                        # A cut, not part of a transition: close the scene, this frame starts the next
+                        prev_kept = finish_scene(scene, stable_score, output_dir, index, touched, writer, prev_kept)
+                        scene = []
+                    else:
+                        scene.append(candidate)
+                
+                # The first frame and significant changes start a scene
+                if not scene and (prev_kept is None or change_score(prev_kept, gray) > threshold):
+                    scene = [candidate]
+                
+                if len(scene) > lookahead:
+                    prev_kept = finish_scene(scene, stable_score, output_dir, index, touched, writer, prev_kept)
+                    scene = []
+                prev_sample = gray
             
-            # Convert to grayscale for comparison
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (21, 21), 0)
+            frame_count += 1
+            if progress_callback and frame_count % PROGRESS_EVERY_FRAMES == 0:
+                progress_callback(frame_count, total_frames)
             
-            if prev_frame is None:
-                # Always save the first frame
-                save_frame(frame, output_dir, timestamp_str, screenshots)
-                prev_frame = gray
-            else:
-                # Compute difference
-                frame_delta = cv2.absdiff(prev_frame, gray)
-                thresh = cv2.threshold(frame_delta, 25, 255, cv2.THRESH_BINARY)[1]
-                change_score = np.mean(thresh)
-                
-                # If change is significant, save as new keyframe
-                if change_score > threshold:
-                    save_frame(frame, output_dir, timestamp_str, screenshots)
-                    prev_frame = gray
-        
-        frame_count += 1
-        
-    cap.release()
-    return screenshots
+        if scene:
+            finish_scene(scene, stable_score, output_dir, index, touched, writer, prev_kept)
+        cap.release()
+    
+    if progress_callback:
+        progress_callback(frame_count, max(total_frames, frame_count))
+    count("frames_decoded", frame_count - start_frame)
+    count("frames_sampled", frames_sampled)
+    count("image_bytes_written", writer.bytes_written)
+    for entry in touched.values():
+        if entry["path"] in writer.failed:
+            entry["path"] = None
+    # Timestamps of every picture seen in this call, including earlier
+    # appearances whose image may have been replaced by a sharper one
+    return index.aliases(touched.values())
 
-def save_frame(frame, output_dir, timestamp_str, screenshots_map):
-    filename = f"frame_{timestamp_str.replace(':', '-')}.jpg"
+def grayscale(frame):
+    """(grayscale, blurred grayscale) of a frame; the blurred one is used for change detection."""
+    import cv2
+
+    raw_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return raw_gray, cv2.GaussianBlur(raw_gray, (21, 21), 0)
+
+def change_score(prev_gray, gray):
+    """Share of pixels (0-255 scale) that changed noticeably between two blurred frames."""
+    import cv2
+
+    frame_delta = cv2.absdiff(prev_gray, gray)
+    thresh = cv2.threshold(frame_delta, 25, 255, cv2.THRESH_BINARY)[1]
+    return float(cv2.mean(thresh)[0])
+
+def finish_scene(scene, stable_score, output_dir, index, touched, writer, prev_kept):
+    """
+    Keeps the best candidate of a scene if any passes the quality gate and
+    returns its blurred frame, which later frames are compared against. If
+    the whole scene is rejected (a fade, a black or blurred stretch), later
+    frames are still compared against `prev_kept`.
+    """
+    count("frames_rejected", sum(1 for c in scene if c["frame"] is None))
+    best = pick_best(scene, stable_score)
+    if best is None:
+        count("scenes_rejected")
+        return prev_kept
+    raw_gray, gray = grayscale(best["frame"])
+    keep_keyframe(best["frame"], raw_gray, output_dir, best["timestamp"], index, touched, writer)
+    return gray
+
+def keep_keyframe(frame, gray, output_dir, timestamp_str, index, touched, writer):
+    """
+    Saves a keyframe unless the index already holds a near-duplicate; then
+    only its timestamp is recorded, and the image is upgraded if sharper.
+    """
+    value = dhash(gray)
+    quality = sharpness(gray)
+    entry = index.lookup(value)
+    if entry is None:
+        path = save_frame(frame, output_dir, timestamp_str, writer)
+        entry = index.add(value, path, quality, timestamp_str)
+        touched[entry["id"]] = entry
+        count("frames_saved")
+        return
+
+    entry["timestamps"].append(timestamp_str)
+    touched[entry["id"]] = entry
+    count("frames_deduplicated")
+    if quality > entry["quality"] * UPGRADE_MARGIN:
+        path = save_frame(frame, output_dir, timestamp_str, writer)
+        if entry["path"]:
+            writer.remove(entry["path"])
+        entry["path"], entry["quality"] = path, quality
+        count("frames_upgraded")
+
+def save_frame(frame, output_dir, timestamp_str, writer):
+    """Queues a frame on the background writer and returns its future path."""
+    filename = f"frame_{timestamp_str.replace(':', '-')}{writer.extension}"
     path = os.path.join(output_dir, filename)
-    
-    # cv2.imwrite does not support unicode paths on Windows, use imencode + write
-    is_success, buffer = cv2.imencode(".jpg", frame)
-    if is_success:
-        with open(path, "wb") as f:
-            f.write(buffer)
-        screenshots_map[timestamp_str] = path
+    writer.write(frame, path)
+    return path
 
 def format_timestamp(seconds):
     m, s = divmod(seconds, 60)
     h, m = divmod(m, 60)
     return "{:02d}:{:02d}:{:02d}".format(int(h), int(m), int(s))
 
+def parse_timestamp(timestamp):
+    """Seconds of an "HH:MM:SS" or "MM:SS" timestamp, or None."""
+    try:
+        parts = [int(part) for part in timestamp.strip().split(":")]
+    except ValueError:
+        return None
+    if len(parts) not in (2, 3):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+def grab_frame(url, headers, seconds):
+    """
+    One frame at `seconds` of a remote stream, or None. ffmpeg seeks with
+    HTTP range requests (or picks the right HLS segment), so only a few
+    hundred kilobytes are transferred; without ffmpeg, OpenCV's FFmpeg
+    backend is used, which cannot send the headers some platforms require.
+    """
+    import cv2
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        cap = cv2.VideoCapture(url)
+        try:
+            if not cap.isOpened():
+                return None
+            cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+            ret, frame = cap.read()
+            return frame if ret else None
+        finally:
+            cap.release()
+
+    import numpy as np
+
+    command = [ffmpeg, "-loglevel", "error", "-ss", str(seconds)]
+    if headers:
+        command += ["-headers", "".join(f"{name}: {value}\r\n" for name, value in headers.items())]
+    command += ["-i", url, "-frames:v", "1", "-f", "image2pipe", "-c:v", "png", "-"]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=FRAME_FETCH_TIMEOUT_S, check=False)
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return cv2.imdecode(np.frombuffer(result.stdout, np.uint8), cv2.IMREAD_COLOR)
+
+def fetch_frame(url, headers, seconds):
+    """
+    (seconds, frame) of the first frame from `seconds` on that passes the
+    quality gate, looking up to LOOKAHEAD_S further; else the frame at
+    `seconds`. None if the stream cannot be read there. Returned with the
+    number of rejected frames, as this runs on a pool thread where `count`
+    does not reach the node's counters.
+    """
+    first = None
+    rejected = 0
+    for offset in range(max(0, int(round(LOOKAHEAD_S))) + 1):
+        frame = grab_frame(url, headers, seconds + offset)
+        if frame is None:
+            break
+        if not rejection_reason(frame_stats(grayscale(frame)[0])):
+            return (seconds + offset, frame), rejected
+        rejected += 1
+        first = first or (seconds, frame)
+    return first, rejected
+
+def fetch_frames(state: AgentState) -> AgentState:
+    """
+    Subtitle-first fast path: instead of decoding a downloaded video, fetches
+    only the frames the analysis refers to ([INSERT_IMAGE: ...] tags) by
+    seeking in the remote stream. Screenshots are keyed by the referenced
+    timestamps.
+    """
+    video_url = state.get("video_url")
+    if not state.get("analysis_result") or not video_url:
+        return {}
+
+    try:
+        analysis = load(state["analysis_result"])
+    except ArtifactMissingError as e:
+        return {"errors": [f"Frame fetch failed: {str(e)}"]}
+    wanted = sorted({seconds for seconds in map(parse_timestamp, IMAGE_TAG_RE.findall(analysis))
+                     if seconds is not None})[:FRAME_FETCH_MAX]
+    if not wanted:
+        return {}
+
+    job_id = state.get("job_id")
+    try:
+        ensure_space(job_id)
+    except WorkspaceFullError as e:
+        return {"errors": [f"Frame fetch skipped: {str(e)}"]}
+    screenshots_dir = job_dir(job_id, "screenshots")
+    headers = state.get("video_headers") or {}
+
+    screenshots_map = {}
+    with ThreadPoolExecutor(FRAME_FETCH_WORKERS) as pool, FrameWriter() as writer:
+        results = pool.map(lambda seconds: fetch_frame(video_url, headers, seconds), wanted)
+        for seconds, (result, rejected) in zip(wanted, results):
+            count("frames_rejected", rejected)
+            if result is None:
+                count("frames_fetch_failed")
+                continue
+            taken_at, frame = result
+            screenshots_map[format_timestamp(seconds)] = save_frame(
+                frame, screenshots_dir, format_timestamp(taken_at), writer)
+            count("frames_fetched")
+    count("image_bytes_written", writer.bytes_written)
+    screenshots_map = {ts: path for ts, path in screenshots_map.items() if path not in writer.failed}
+
+    if not screenshots_map:
+        return {"errors": [f"Frame fetch failed: none of {len(wanted)} frames could be read from the stream"]}
+    return {"screenshots": screenshots_map}
+
 def process_video(state: AgentState) -> AgentState:
     """
     Processes the video to extract keyframes/screenshots.
     """
     video_path = state.get("video_path")
     if not video_path or not os.path.exists(video_path):
-        return state
+        return {}
         
-    # Define output directory for this specific video processing
-    base_name = os.path.splitext(os.path.basename(video_path))[0]
-    screenshots_dir = os.path.join(os.getcwd(), "temp", "screenshots", base_name)
+    # Screenshots live in the job's own workspace, so concurrent jobs on
+    # same-named videos cannot overwrite each other's frames
+    job_id = state.get("job_id")
+    screenshots_dir = job_dir(job_id, "screenshots")
     
     try:
-        screenshots_map = extract_keyframes(video_path, screenshots_dir)
+        ensure_space(job_id)
+        screenshots_map = extract_keyframes(video_path, screenshots_dir, progress_callback=progress_reporter("processor"))
+        return {"screenshots": screenshots_map}
+    except WorkspaceFullError as e:
+        return {"errors": [f"Processing skipped: {str(e)}"]}
+    except Exception as e:
+        return {"errors": [f"Processing failed: {str(e)}"]}
+
+def extract_audio(state: AgentState) -> AgentState:
+    """
+    Extracts a 16 kHz mono WAV track (for transcription) with ffmpeg.
+    Runs in parallel with keyframe extraction; disabled unless EXTRACT_AUDIO=1
+    since no downstream node consumes audio yet.
+    """
+    video_path = state.get("video_path")
+    if os.getenv("EXTRACT_AUDIO", "0") != "1" or not video_path or not os.path.exists(video_path):
+        return {}
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return {"errors": ["Audio extraction skipped: ffmpeg not found."]}
+
+    job_id = state.get("job_id")
+    try:
+        ensure_space(job_id)
+    except WorkspaceFullError as e:
+        return {"errors": [f"Audio extraction skipped: {str(e)}"]}
+    audio_path = os.path.join(job_dir(job_id, "audio"), "audio.wav")
+
+    result = subprocess.run(
+        [ffmpeg, "-y", "-loglevel", "error", "-i", video_path, "-vn", "-ac", "1", "-ar", "16000", audio_path],
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        check=False
+    )
+    if result.returncode != 0:
+        return {"errors": [f"Audio extraction failed: {result.stderr.strip()}"]}
+    return {"audio_path": audio_path}
+
+def read_video_info(video_path):
+    """Stream properties (fps, frame_count, width, height) from the file header, or None."""
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    try:
         return {
-            **state,
-            "screenshots": screenshots_map
+            "fps": cap.get(cv2.CAP_PROP_FPS) or 0,
+            "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0),
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
         }
+    finally:
+        cap.release()
+
+def probe_video(state: AgentState) -> AgentState:
+    """
+    Reads stream properties (fps, frame count, resolution) into metadata.
+    The duration is only filled in when the downloader did not provide one.
+    """
+    video_path = state.get("video_path")
+    if not video_path or not os.path.exists(video_path):
+        return {}
+
+    info = read_video_info(video_path)
+    if not info:
+        return {}
+
+    if not (state.get("metadata") or {}).get("duration") and info["fps"]:
+        info["duration"] = int(info["frame_count"] / info["fps"])
+    return {"metadata": info}
+
+def next_window(state: AgentState, duration):
+    """
+    The next time window of a progressive run. The first window is short so a
+    preview is ready quickly; later ones double up to the maximum size.
+    """
+    previous = state.get("window") or {}
+    index = previous.get("index", -1) + 1
+    start_s = previous.get("end_s", 0)
+    size = min(PROGRESSIVE_FIRST_WINDOW_S * 2 ** index, PROGRESSIVE_MAX_WINDOW_S)
+    end_s = min(start_s + size, duration)
+    # Fold a tiny trailing remainder into this window
+    last = duration - end_s < PROGRESSIVE_FIRST_WINDOW_S / 2
+    return {
+        "index": index,
+        "start_s": start_s,
+        "end_s": duration if last else end_s,
+        "duration_s": duration,
+        "last": last,
+    }
+
+def failed_window(state: AgentState):
+    """
+    The window after the current one, marked failed and last: processing it
+    went wrong, so the progressive loop ends instead of retrying it forever.
+    """
+    previous = state.get("window") or {}
+    start_s = previous.get("end_s", 0)
+    return {
+        "index": previous.get("index", -1) + 1,
+        "start_s": start_s,
+        "end_s": start_s,
+        "duration_s": previous.get("duration_s", start_s),
+        "last": True,
+        "failed": True,
+    }
+
+def process_window(state: AgentState) -> AgentState:
+    """
+    Progressive mode: extracts the keyframes of the next time window only.
+    The analyzer and generator run after each window, so a preview document
+    is available long before the whole video has been decoded. If a window
+    fails, it is returned marked failed and the loop ends.
+    """
+    video_path = state.get("video_path")
+    if not video_path or not os.path.exists(video_path):
+        if not state.get("window"):
+            return {}
+        return {"errors": ["Processing failed: video file is missing"], "window": failed_window(state)}
+
+    job_id = state.get("job_id")
+    try:
+        ensure_space(job_id)
+        info = read_video_info(video_path)
+        if not info or not info["fps"]:
+            return {"errors": ["Processing failed: cannot read video"], "window": failed_window(state)}
+        duration = info["frame_count"] / info["fps"]
+        window = next_window(state, duration)
+
+        # The hash index persists across windows, so a slide shown again
+        # later in the video is not analyzed twice
+        screenshots_dir = job_dir(job_id, "screenshots")
+        index_path = os.path.join(screenshots_dir, "frame_index.json")
+        frame_index = FrameIndex.load(index_path)
+        screenshots_map = extract_keyframes(
+            video_path,
+            screenshots_dir,
+            progress_callback=progress_reporter("window_processor", window=window),
+            start_s=window["start_s"],
+            end_s=None if window["last"] else window["end_s"],
+            frame_index=frame_index,
+        )
+        frame_index.save(index_path)
+        update = {"screenshots": screenshots_map, "window": window}
+        if window["index"] == 0:
+            metadata = dict(info)
+            if not (state.get("metadata") or {}).get("duration"):
+                metadata["duration"] = int(duration)
+            update["metadata"] = metadata
+        return update
+    except WorkspaceFullError as e:
+        return {"errors": [f"Processing skipped: {str(e)}"], "window": failed_window(state)}
     except Exception as e:
-        current_errors = state.get("errors", []) or []
-        current_errors.append(f"Processing failed: {str(e)}")
-        return {
-            **state,
-            "errors": current_errors
-        }
\ No newline at end of file
+        return {"errors": [f"Processing failed: {str(e)}"], "window": failed_window(state)}
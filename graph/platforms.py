@@ -0,0 +1,191 @@
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+# Short links are resolved with a HEAD request (following redirects) and the
+# result is cached, so a link shared many times costs one round trip
+RESOLVE_CACHE_TTL_S = float(os.getenv("RESOLVE_CACHE_TTL_S", "86400"))
+RESOLVE_CACHE_SIZE = 1024
+RESOLVE_TIMEOUT_S = float(os.getenv("RESOLVE_TIMEOUT_S", "5"))
+RESOLVE_POOL_SIZE = 4
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class Platform:
+    """
+    Rules for one video platform: the domains it serves from, short-link
+    hosts that redirect to it, video ID patterns and the canonical URL
+    built from an ID. Patterns are compiled once when the registry is built.
+    `part_param` names a query parameter selecting one part of a multi-part
+    video; parts after the first get a "_p<n>" ID suffix, as in yt-dlp.
+    """
+
+    def __init__(self, name, domains, short_hosts=(), id_patterns=(), canonical=None, referer=None,
+                 part_param=None):
+        self.name = name
+        self.domains = tuple(domains)
+        self.short_hosts = tuple(short_hosts)
+        self.id_patterns = [re.compile(p) for p in id_patterns]
+        self.canonical = canonical
+        self.referer = referer
+        self.part_pattern = re.compile(rf"[?&]{part_param}=(\d+)") if part_param else None
+
+    def owns(self, host: str) -> bool:
+        return any(host == d or host.endswith("." + d) for d in self.domains + self.short_hosts)
+
+    def is_short(self, host: str) -> bool:
+        return host in self.short_hosts
+
+    def video_id(self, url: str):
+        for pattern in self.id_patterns:
+            match = pattern.search(url)
+            if match:
+                return match.group(1) + self._part_suffix(url)
+        return None
+
+    def _part_suffix(self, url: str) -> str:
+        match = self.part_pattern.search(url) if self.part_pattern else None
+        return f"_p{match.group(1)}" if match and int(match.group(1)) > 1 else ""
+
+    def canonical_url(self, url: str, video_id):
+        """URL to hand to the downloaders. Platforms without a template keep the resolved URL."""
+        if not (video_id and self.canonical):
+            return url
+        base_id, _, part = video_id.partition("_p")
+        canonical = self.canonical.format(id=base_id)
+        return f"{canonical}?p={part}" if part else canonical
+
+
+PLATFORMS = [
+    Platform(
+        "bilibili",
+        domains=["bilibili.com"],
+        short_hosts=["b23.tv", "bili2233.cn"],
+        id_patterns=[r"/video/(BV[0-9A-Za-z]{10})", r"/video/(av\d+)"],
+        canonical="https://www.bilibili.com/video/{id}",
+        referer="https://www.bilibili.com/",
+        part_param="p",
+    ),
+    Platform(
+        "douyin",
+        domains=["douyin.com", "iesdouyin.com"],
+        short_hosts=["v.douyin.com"],
+        id_patterns=[r"/video/(\d+)", r"[?&]modal_id=(\d+)", r"/share/video/(\d+)"],
+        canonical="https://www.douyin.com/video/{id}",
+        referer="https://www.douyin.com/",
+    ),
+    Platform(
+        # Note URLs carry an xsec_token that the site checks, so the resolved
+        # URL is kept as is
+        "xiaohongshu",
+        domains=["xiaohongshu.com"],
+        short_hosts=["xhslink.com"],
+        id_patterns=[r"/(?:explore|discovery/item)/([0-9a-f]{24})"],
+        referer="https://www.xiaohongshu.com/",
+    ),
+    Platform(
+        # youtu.be links carry the ID themselves and need no network round trip
+        "youtube",
+        domains=["youtube.com", "youtu.be"],
+        id_patterns=[r"[?&]v=([\w-]{11})", r"youtu\.be/([\w-]{11})", r"/(?:shorts|embed|live)/([\w-]{11})"],
+        canonical="https://www.youtube.com/watch?v={id}",
+    ),
+]
+
+_cache = {}
+_cache_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+
+def is_url(value: str) -> bool:
+    return urlparse(value).scheme in ("http", "https")
+
+
+def platform_for(url: str):
+    """The registered platform serving `url`, or None."""
+    host = urlparse(url).netloc.lower().split(":")[0]
+    for platform in PLATFORMS:
+        if platform.owns(host):
+            return platform
+    return None
+
+
+def detect_platform(url: str) -> str:
+    """Maps a URL to a known platform name, or 'other'. No network access."""
+    platform = platform_for(url)
+    return platform.name if platform else "other"
+
+
+def referer_for(url: str):
+    platform = platform_for(url)
+    return platform.referer if platform else None
+
+
+def _get_session():
+    """Shared session, so redirect lookups reuse pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=RESOLVE_POOL_SIZE, pool_maxsize=RESOLVE_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def follow_redirects(url: str) -> str:
+    """Final URL after redirects; a few hosts reject HEAD, so GET is the fallback."""
+    session = _get_session()
+    resp = session.head(url, allow_redirects=True, timeout=RESOLVE_TIMEOUT_S)
+    if resp.status_code in (403, 405):
+        resp = session.get(url, allow_redirects=True, stream=True, timeout=RESOLVE_TIMEOUT_S)
+        resp.close()
+    return resp.url
+
+
+def resolve(url: str) -> dict:
+    """
+    Resolves a video URL to {"platform", "canonical_url", "video_id"}.
+    Short links are expanded (cached); if that fails the link is passed on
+    unresolved and yt-dlp gets a chance to follow it itself.
+    """
+    url = url.strip()
+    now = time.time()
+    with _cache_lock:
+        cached = _cache.get(url)
+        if cached and cached[0] > now:
+            return dict(cached[1])
+
+    resolved = url
+    platform = platform_for(url)
+    host = urlparse(url).netloc.lower().split(":")[0]
+    if platform and platform.is_short(host):
+        try:
+            resolved = follow_redirects(url)
+        except Exception as e:
+            print(f"Short link resolution failed for {url}: {e}")
+            return {"platform": platform.name, "canonical_url": url, "video_id": None}
+        platform = platform_for(resolved) or platform
+
+    video_id = platform.video_id(resolved) if platform else None
+    result = {
+        "platform": platform.name if platform else "other",
+        "canonical_url": platform.canonical_url(resolved, video_id) if platform else resolved,
+        "video_id": video_id,
+    }
+
+    with _cache_lock:
+        _cache[url] = (now + RESOLVE_CACHE_TTL_S, result)
+        if len(_cache) > RESOLVE_CACHE_SIZE:
+            # Drop the entry closest to expiry
+            del _cache[min(_cache, key=lambda k: _cache[k][0])]
+    return dict(result)
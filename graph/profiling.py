@@ -0,0 +1,141 @@
+import functools
+import os
+import sys
+import threading
+from collections import Counter
+
+from graph.workspace import JOBS_DIR, job_dir
+
+# Opt-in sampling profiler. Enabled for every job with V2W_PROFILE=1, or per
+# job with `"profile": True` in the initial state. When off, a node call costs
+# one extra dict lookup.
+PROFILE = os.getenv("V2W_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_S = float(os.getenv("V2W_PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_TOP = int(os.getenv("V2W_PROFILE_TOP", "25"))
+# Deeper frames are cut off, so a runaway recursion cannot blow up the stacks
+MAX_DEPTH = 128
+
+
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class Sampler:
+    """
+    Samples the Python stack of one thread from a background thread via
+    sys._current_frames. C extensions (OpenCV, zlib, base64) show up as the
+    Python frame that called them, which is usually what one wants to know.
+    Frames from `root_code` upwards (thread pool, LangGraph) are left out.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_S, root_code=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_code = root_code
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="v2w-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def read_collapsed(path: str) -> Counter:
+    stacks = Counter()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                stack, _, samples = line.rstrip("\n").rpartition(" ")
+                if stack and samples.isdigit():
+                    stacks[stack] += int(samples)
+    except OSError:
+        pass
+    return stacks
+
+
+def top_functions(stacks: Counter, n: int = PROFILE_TOP):
+    """(function, self samples, total samples) of the n hottest functions by self time."""
+    own, total = Counter(), Counter()
+    for stack, samples in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += samples
+        for frame in set(frames):
+            total[frame] += samples
+    return [(name, samples, total[name]) for name, samples in own.most_common(n)]
+
+
+def write_profile(job_id: str, name: str, stacks: Counter, interval: float = PROFILE_INTERVAL_S):
+    """
+    Writes profile/<node>.collapsed (one "frame;frame;frame samples" line per
+    stack, for flamegraph.pl or speedscope) and profile/<node>.txt (top
+    functions). Repeated runs of a node, e.g. progressive windows, accumulate.
+    """
+    profile_dir = job_dir(job_id, "profile")
+    collapsed_path = os.path.join(profile_dir, f"{name}.collapsed")
+    stacks = read_collapsed(collapsed_path) + stacks
+    with open(collapsed_path, "w", encoding="utf-8") as f:
+        for stack, samples in stacks.most_common():
+            f.write(f"{stack} {samples}\n")
+
+    sample_count = sum(stacks.values())
+    with open(os.path.join(profile_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.write(f"{name}: {sample_count} samples every {interval * 1000:g} ms "
+                f"(~{sample_count * interval:.2f} s)\n\n")
+        f.write(f"{'self %':>7} {'total %':>8}  function\n")
+        for function, own, total in top_functions(stacks):
+            f.write(f"{own / sample_count:7.1%} {total / sample_count:8.1%}  {function}\n")
+    return collapsed_path
+
+
+def read_summaries(job_id: str) -> str:
+    """The top-function summaries of all profiled nodes of a job, or "" if there are none."""
+    profile_dir = os.path.join(JOBS_DIR, job_id, "profile")
+    if not os.path.isdir(profile_dir):
+        return ""
+    summaries = []
+    for name in sorted(os.listdir(profile_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(profile_dir, name), encoding="utf-8") as f:
+                summaries.append(f.read())
+    return "\n".join(summaries)
+
+
+def profile_node(name, node):
+    """
+    Wraps a (synchronous) graph node so that, when profiling is enabled for
+    the job, its thread is sampled while it runs and the stacks are written
+    to the job's workspace.
+    """
+    @functools.wraps(node)
+    def profiled(state):
+        if not (PROFILE or state.get("profile")):
+            return node(state)
+        sampler = Sampler(threading.get_ident(), root_code=profiled.__code__)
+        try:
+            with sampler:
+                return node(state)
+        finally:
+            # Also for failing nodes: those are often the interesting ones
+            if sampler.stacks:
+                try:
+                    write_profile(state.get("job_id"), name, sampler.stacks, sampler.interval)
+                except OSError as e:
+                    print(f"Writing the profile of {name} failed: {e}")
+    return profiled
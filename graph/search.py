@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from graph.platforms import detect_platform
+from graph.nodes.downloader import get_ydl_opts, needs_playwright_fallback
+
+# Search results are cached per (query, max_results) for SEARCH_CACHE_TTL_S
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", "600"))
+SEARCH_CACHE_SIZE = 128
+# Candidates are probed concurrently; probes not done by the deadline count as unknown
+PROBE_WORKERS = 5
+PROBE_TIMEOUT_S = float(os.getenv("SEARCH_PROBE_TIMEOUT_S", "8"))
+# Fetch more candidates than shown, since unsupported ones are dropped
+OVERFETCH = 2
+
+# Probe outcomes, in ranking order
+OK = "ok"
+FALLBACK = "fallback"  # yt-dlp refused, but the Playwright downloader can try
+UNKNOWN = "unknown"    # probe timed out or failed for a non-conclusive reason
+UNSUPPORTED = "unsupported"
+_RANK = {OK: 0, FALLBACK: 1, UNKNOWN: 2}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def probe_video(url: str) -> dict:
+    """
+    Cheap metadata probe (no download) with yt-dlp: availability, duration
+    and title, plus the platform according to the classifier rules.
+    """
+    info = {"platform": detect_platform(url), "duration_s": None, "probe": UNKNOWN}
+    import yt_dlp
+
+    opts = get_ydl_opts(url, "%(id)s.%(ext)s")
+    opts.update({"skip_download": True, "socket_timeout": PROBE_TIMEOUT_S})
+    try:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            meta = ydl.extract_info(url, download=False)
+        info.update({
+            "probe": OK,
+            "duration_s": meta.get("duration"),
+            "probed_title": meta.get("title"),
+        })
+    except Exception as e:
+        error_msg = str(e)
+        if needs_playwright_fallback(url, error_msg):
+            info["probe"] = FALLBACK
+        elif any(x in error_msg.lower() for x in ["unsupported url", "unavailable", "private", "removed", "404"]):
+            info["probe"] = UNSUPPORTED
+        info["probe_error"] = error_msg[:200]
+    return info
+
+
+def enrich_results(results):
+    """
+    Probes all candidates concurrently, drops the ones the downloader cannot
+    handle and ranks the rest: downloadable, Playwright fallback, unknown.
+    """
+    executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+    futures = {executor.submit(probe_video, r["content"]): r for r in results if r.get("content")}
+    wait(futures, timeout=PROBE_TIMEOUT_S + 2)
+    # Do not wait for stragglers; they are reported as unknown
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    enriched = []
+    for future, result in futures.items():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            probe = future.result()
+        else:
+            probe = {"platform": detect_platform(result["content"]), "duration_s": None, "probe": UNKNOWN}
+        if probe["probe"] == UNSUPPORTED:
+            print(f"Search: dropped {result['content']} ({probe.get('probe_error')})")
+            continue
+        enriched.append({**result, **probe})
+    # Stable sort keeps the search engine's order within a rank
+    enriched.sort(key=lambda r: _RANK[r["probe"]])
+    return enriched
+
+
+def search_videos(query: str, max_results: int = 5):
+    """Video search (DuckDuckGo) with enriched, ranked and cached results."""
+    key = (query.strip().lower(), max_results)
+    now = time.time()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    from ddgs import DDGS
+    candidates = DDGS().videos(query, max_results=max_results * OVERFETCH)
+    results = enrich_results(candidates)[:max_results]
+
+    with _cache_lock:
+        _cache[key] = (now + SEARCH_CACHE_TTL_S, results)
+        if len(_cache) > SEARCH_CACHE_SIZE:
+            # Drop the entry closest to expiry
+            del _cache[min(_cache, key=lambda k: _cache[k][0])]
+    return results
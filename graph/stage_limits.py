@@ -0,0 +1,66 @@
+import functools
+import os
+import threading
+
+# Process-wide caps on how many jobs may run a given stage at the same time,
+# e.g. STAGE_LIMITS="downloader=2,processor=2,analyzer=4,generator=2".
+# Stages without a limit are unrestricted.
+DEFAULT_STAGE_LIMITS = {
+    "downloader": 2,
+    "processor": max(1, (os.cpu_count() or 2) // 2),
+    # Runs next to the processor in the media fan-out, so it has its own slots
+    "audio": max(1, (os.cpu_count() or 2) // 2),
+    "analyzer": 4,
+    "generator": 2,
+}
+
+# Nodes that do the same kind of work as a capped stage take their slots from
+# that stage's limit, e.g. each progressive window is decoded like a whole video.
+STAGE_GROUPS = {
+    "window_processor": "processor",
+    "window_analyzer": "analyzer",
+    # Subtitle-first path: a yt-dlp extraction, one LLM call, ffmpeg seeks
+    "subtitles": "downloader",
+    "transcript_analyzer": "analyzer",
+    "frame_fetcher": "processor",
+}
+
+
+def parse_stage_limits(spec: str) -> dict:
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            limits[name.strip()] = int(value)
+    return limits
+
+
+STAGE_LIMITS = {**DEFAULT_STAGE_LIMITS, **parse_stage_limits(os.getenv("STAGE_LIMITS", ""))}
+
+_semaphores = {}
+_lock = threading.Lock()
+
+
+def _semaphore(name):
+    with _lock:
+        if name not in _semaphores:
+            _semaphores[name] = threading.BoundedSemaphore(STAGE_LIMITS[name])
+        return _semaphores[name]
+
+
+def limit_stage(name, node):
+    """
+    Wraps a (synchronous) graph node so that at most STAGE_LIMITS[name]
+    instances run at once across all graphs in this process. Nodes listed in
+    STAGE_GROUPS share the slots of their group's stage.
+    """
+    group = STAGE_GROUPS.get(name, name)
+    if not STAGE_LIMITS.get(group):
+        return node
+    semaphore = _semaphore(group)
+
+    @functools.wraps(node)
+    def limited(state):
+        with semaphore:
+            return node(state)
+    return limited
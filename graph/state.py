@@ -1,31 +1,57 @@
-from typing import TypedDict, List, Dict, Optional, Any
+import operator
+from typing import Annotated, TypedDict, List, Dict, Optional, Any
+
+def merge_dicts(left: Optional[Dict], right: Optional[Dict]) -> Dict:
+    """Reducer for dict fields written by parallel branches: keys are merged."""
+    if not left:
+        return dict(right or {})
+    if not right:
+        return left
+    return {**left, **right}
 
 class AgentState(TypedDict):
     """
     Represents the state of the Video2Word processing workflow.
     """
     # Input
+    job_id: str            # Identifies the run; also the checkpoint thread ID
     input_source: str      # The original input (URL or file path)
+    profile: bool          # Sample node stacks into the job's profile/ directory (graph.profiling)
+    subtitle_first: bool   # URLs: analyze the subtitle track and fetch only referenced frames (default: SUBTITLE_FIRST)
     
     # Classification
     source_type: str       # 'url' or 'local'
     platform: str          # 'bilibili', 'douyin', 'xiaohongshu', 'youtube', 'other', 'local'
+    canonical_url: str     # URL after short-link resolution and normalization (graph.platforms)
+    video_id: str          # Platform video ID, if the URL carries one
     
     # Browser / Navigation (MCP)
     page_content: str      # HTML content or extracted metadata text from the page
     video_url: str         # The direct URL to the video stream (if extracted)
+    video_headers: Dict[str, str] # HTTP headers the stream URL must be requested with
     
     # Download / File
     video_path: str        # Local path to the video file (downloaded or existing)
-    metadata: Dict[str, Any] # Title, author, duration, etc.
+    metadata: Annotated[Dict[str, Any], merge_dicts] # Title, author, duration, etc.
     
     # Processing
     audio_path: str        # Path to extracted audio
-    screenshots: Dict[str, str] # Map of timestamp/key to local image path
+    screenshots: Annotated[Dict[str, str], merge_dicts] # Map of timestamp/key to local image path
+    
+    # Subtitle-first fast path
+    transcript: str        # Artifact reference (graph.artifacts): "[HH:MM:SS] text" lines from the subtitle track
     
     # Analysis (LLM)
-    analysis_result: str   # The raw Markdown content generated by the LLM
+    analysis_result: str   # Artifact reference (graph.artifacts) to the raw Markdown generated by the LLM
+    
+    # Progressive mode (long videos): windows are processed, analyzed and
+    # rendered one after another
+    progressive: bool      # Force progressive mode on/off (default: by duration)
+    window: Dict[str, Any] # Current window: index, start_s, end_s, duration_s, last (failed: processing it failed)
+    sections: Annotated[List[str], operator.add] # Artifact references to the Markdown of each analyzed window
     
     # Output
     doc_path: str          # Final path to the generated Word document
-    errors: List[str]      # List of any error messages encountered
\ No newline at end of file
+    doc_version: int       # Progressive mode: windows in the latest preview document
+    errors: Annotated[List[str], operator.add] # Error messages; nodes return only new ones
+    metrics: Annotated[Dict[str, Dict[str, Any]], merge_dicts] # Per-node timings and counters, totalled over repeated runs (graph.instrumentation)
\ No newline at end of file
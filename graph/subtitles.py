@@ -0,0 +1,110 @@
+import html
+import json
+import os
+import re
+
+from graph.nodes.processor import format_timestamp
+
+# Subtitle-first fast path (see graph.nodes.downloader.fetch_subtitles): the
+# transcript comes from the platform's subtitle track instead of the video.
+# Languages are tried in this order (prefix match, e.g. "zh" matches "zh-Hans"),
+# then any other; uploaded subtitles are preferred over automatic captions.
+SUBTITLE_LANGS = [lang.strip() for lang in os.getenv("SUBTITLE_LANGS", "zh-Hans,zh-CN,zh,zh-Hant,en").split(",")
+                  if lang.strip()]
+# Track formats the parser understands, best first
+SUBTITLE_FORMATS = ["json3", "vtt", "srt", "json"]
+# Not subtitles, although yt-dlp lists them as such
+IGNORED_TRACKS = ("danmaku", "live_chat")
+# Cues are merged into transcript lines of about this many seconds
+TRANSCRIPT_LINE_S = 5
+# Longer transcripts are cut off (roughly 2-3 hours of speech)
+TRANSCRIPT_MAX_CHARS = int(os.getenv("TRANSCRIPT_MAX_CHARS", "100000"))
+
+_TIME_RE = re.compile(r"(?:(\d+):)?(\d+):(\d+)[.,](\d+)")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def pick_track(info: dict):
+    """
+    The subtitle track to use from a yt-dlp info dict, as (language, entry,
+    automatic) with entry holding "ext" and "url" (or inline "data"), or None.
+    """
+    for automatic, tracks in ((False, info.get("subtitles")), (True, info.get("automatic_captions"))):
+        tracks = {lang: entries for lang, entries in (tracks or {}).items()
+                  if entries and not lang.startswith(IGNORED_TRACKS)}
+        if automatic:
+            # Automatic captions in other languages are machine translations;
+            # the spoken language is marked "-orig" and transcribes best
+            original = [lang for lang in tracks if lang.endswith("-orig")]
+            if original:
+                tracks = {lang: tracks[lang] for lang in original}
+        for wanted in [*SUBTITLE_LANGS, ""]:
+            for lang, entries in tracks.items():
+                # The empty wildcard takes any remaining language
+                if wanted and lang != wanted and not lang.startswith(wanted + "-"):
+                    continue
+                for ext in SUBTITLE_FORMATS:
+                    entry = next((e for e in entries if e.get("ext") == ext), None)
+                    if entry:
+                        return lang, entry, automatic
+    return None
+
+
+def _seconds(match) -> float:
+    hours, minutes, seconds, fraction = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction) / 10 ** len(fraction)
+
+
+def _parse_text_cues(text: str):
+    """
+    WebVTT and SRT: blocks with a "start --> end" line followed by the cue
+    text. Rolling automatic captions repeat the previous cue's lines in every
+    cue; lines already shown in the previous cue are dropped.
+    """
+    cues = []
+    previous = set()
+    for block in re.split(r"\n\s*\n", text.replace("\r\n", "\n")):
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            if "-->" in line:
+                match = _TIME_RE.search(line.split("-->")[0])
+                if match:
+                    shown = [html.unescape(_TAG_RE.sub("", l)).strip() for l in lines[i + 1:]]
+                    cues.append((_seconds(match), " ".join(l for l in shown if l not in previous)))
+                    previous = set(shown)
+                break
+    return cues
+
+
+def parse_subtitles(data: str, ext: str):
+    """(start seconds, text) cues of a json3 (YouTube), Bilibili JSON, WebVTT or SRT track."""
+    if ext == "json3":
+        cues = []
+        for event in json.loads(data).get("events", []):
+            text = "".join(seg.get("utf8", "") for seg in event.get("segs") or [])
+            cues.append((event.get("tStartMs", 0) / 1000, text))
+    elif ext == "json":
+        cues = [(item.get("from", 0), item.get("content", "")) for item in json.loads(data).get("body", [])]
+    else:
+        cues = _parse_text_cues(data)
+    return [(start, " ".join(text.split())) for start, text in cues if text.strip()]
+
+
+def format_transcript(cues) -> str:
+    """Compact "[HH:MM:SS] text" lines, one per TRANSCRIPT_LINE_S seconds."""
+    lines = []
+    line_start, words = None, []
+    for start, text in cues:
+        if line_start is not None and start - line_start >= TRANSCRIPT_LINE_S:
+            lines.append(f"[{format_timestamp(line_start)}] {' '.join(words)}")
+            line_start, words = None, []
+        if line_start is None:
+            line_start = start
+        words.append(text)
+    if words:
+        lines.append(f"[{format_timestamp(line_start)}] {' '.join(words)}")
+
+    transcript = "\n".join(lines)
+    if len(transcript) > TRANSCRIPT_MAX_CHARS:
+        transcript = transcript[:TRANSCRIPT_MAX_CHARS].rsplit("\n", 1)[0] + "\n[...]"
+    return transcript
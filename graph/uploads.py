@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+from graph.workspace import cache_dir
+
+# Uploads are stored by content address (cache/uploads/<sha256><ext>), so the
+# same video uploaded twice, or by different users under the same name, maps
+# to one file. cache/results/<sha256>.json remembers the document generated
+# from it.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def store_upload(fileobj, filename: str):
+    """
+    Streams a file-like object into the upload cache in chunks, hashing it
+    while writing. Returns (sha256 hex digest, stored path).
+    """
+    upload_dir = cache_dir("uploads")
+    ext = os.path.splitext(filename)[1].lower()
+    partial_path = os.path.join(upload_dir, f".partial-{uuid.uuid4().hex}{ext}")
+    digest = hashlib.sha256()
+
+    try:
+        with open(partial_path, "wb") as f:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+
+        path = os.path.join(upload_dir, digest.hexdigest() + ext)
+        if os.path.exists(path):
+            # Already uploaded before: keep the existing copy, refresh its LRU time
+            os.remove(partial_path)
+            os.utime(path, None)
+        else:
+            os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return digest.hexdigest(), path
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file on disk, read in chunks (same key as store_upload)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_digest(path: str):
+    """Returns the content hash of a path in the upload cache, else None."""
+    if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(cache_dir("uploads")):
+        return None
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem if _DIGEST_RE.match(stem) else None
+
+
+def _result_path(digest: str) -> str:
+    return os.path.join(cache_dir("results"), f"{digest}.json")
+
+
+def cached_result(digest: str):
+    """Returns the document previously generated from this upload, if it still exists."""
+    if not digest:
+        return None
+    try:
+        with open(_result_path(digest), encoding="utf-8") as f:
+            doc_path = json.load(f).get("doc_path")
+    except (OSError, ValueError):
+        return None
+    if doc_path and os.path.exists(doc_path):
+        os.utime(_result_path(digest), None)
+        return doc_path
+    return None
+
+
+def remember_result(digest: str, doc_path: str):
+    if not digest:
+        return
+    with open(_result_path(digest), "w", encoding="utf-8") as f:
+        json.dump({"doc_path": doc_path, "created_at": time.time()}, f)
@@ -0,0 +1,269 @@
+import contextlib
+import os
+import shutil
+import threading
+import time
+
+# On-disk layout below WORKSPACE_ROOT:
+#   jobs/<job_id>/   intermediates of one job (downloads, screenshots, audio);
+#                    isolated so concurrent jobs never share directories
+#   cache/<kind>/    artifacts worth reusing across jobs (e.g. source videos)
+# Generated documents stay in OUTPUTS_DIR. Garbage collection removes idle job
+# directories first (oldest first), then cache entries no running job uses.
+# Documents are deliverables: they are only removed beyond their own opt-in
+# quota (OUTPUTS_QUOTA_MB).
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", os.path.join(os.getcwd(), "temp"))
+JOBS_DIR = os.path.join(WORKSPACE_ROOT, "jobs")
+CACHE_DIR = os.path.join(WORKSPACE_ROOT, "cache")
+OUTPUTS_DIR = os.getenv("OUTPUTS_DIR", os.path.join(os.getcwd(), "outputs"))
+
+MB = 1024 * 1024
+# Total size of jobs + cache
+WORKSPACE_QUOTA_BYTES = int(os.getenv("WORKSPACE_QUOTA_MB", "20480")) * MB
+# Total size of generated documents; 0 keeps all of them
+OUTPUTS_QUOTA_BYTES = int(os.getenv("OUTPUTS_QUOTA_MB", "0")) * MB
+# Size of a single job directory
+JOB_QUOTA_BYTES = int(os.getenv("JOB_QUOTA_MB", "4096")) * MB
+# Free space to keep on the filesystem holding the workspace
+MIN_FREE_BYTES = int(os.getenv("WORKSPACE_MIN_FREE_MB", "2048")) * MB
+# Idle job directories older than this are always removed
+JOB_MAX_AGE_S = float(os.getenv("JOB_MAX_AGE_HOURS", "24")) * 3600
+# Minimum interval between automatic collections in one process
+GC_INTERVAL_S = 300
+
+_LAST_USED = ".last_used"
+_ACTIVE = ".active"
+_PINNED = ".pinned"
+
+_active_jobs = set()
+_lock = threading.Lock()
+_last_gc = 0.0
+
+
+class WorkspaceFullError(Exception):
+    """Raised when a job would exceed its quota or the disk is nearly full."""
+
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _touch(path: str):
+    with open(path, "a"):
+        pass
+    os.utime(path, None)
+
+
+def job_dir(job_id: str, *parts: str) -> str:
+    """
+    Returns (and creates) a directory inside the job's workspace and marks
+    the job as recently used.
+    """
+    root = os.path.join(JOBS_DIR, job_id or "anonymous")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    _touch(os.path.join(root, _LAST_USED))
+    return path
+
+
+def cache_dir(*parts: str) -> str:
+    """Returns (and creates) a directory inside the shared cache."""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def pin(job_id: str, path: str):
+    """
+    Records that a job reads a shared cache entry (e.g. its source video), so
+    garbage collection keeps the entry while the job is active, and marks the
+    entry as recently used.
+    """
+    # Only the shared cache is collected; other files (e.g. a user's local video) are left untouched
+    if not path or not os.path.abspath(path).startswith(os.path.abspath(CACHE_DIR) + os.sep):
+        return
+    with contextlib.suppress(OSError):
+        os.utime(path, None)
+    with open(os.path.join(job_dir(job_id), _PINNED), "a", encoding="utf-8") as f:
+        f.write(os.path.abspath(path) + "\n")
+
+
+def _pinned(job_root: str) -> set:
+    try:
+        with open(os.path.join(job_root, _PINNED), encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+
+def _in_use(path: str) -> bool:
+    """Entries being written (.partial) or claimed by a running process (.lock)."""
+    name = os.path.basename(path)
+    return name.startswith(".") or name.endswith((".lock", ".partial"))
+
+
+def _last_used(path: str) -> float:
+    try:
+        return os.path.getmtime(os.path.join(path, _LAST_USED))
+    except OSError:
+        return os.path.getmtime(path)
+
+
+def _is_active(job_id: str, path: str) -> bool:
+    if job_id in _active_jobs:
+        return True
+    try:
+        with open(os.path.join(path, _ACTIVE), encoding="utf-8") as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return False
+    if pid == os.getpid():
+        # Our own marker, but the job is not in _active_jobs: left over
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+@contextlib.contextmanager
+def active_job(job_id: str):
+    """
+    Protects a job's workspace from garbage collection while the job runs
+    (also across processes sharing the workspace) and runs a collection if
+    one is due.
+    """
+    root = job_dir(job_id)
+    with _lock:
+        _active_jobs.add(job_id)
+    marker = os.path.join(root, _ACTIVE)
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(str(os.getpid()))
+    try:
+        collect_garbage_if_due()
+        yield root
+    finally:
+        with _lock:
+            _active_jobs.discard(job_id)
+        with contextlib.suppress(OSError):
+            os.remove(marker)
+
+
+def _entries(parent: str):
+    if not os.path.isdir(parent):
+        return []
+    return [os.path.join(parent, name) for name in os.listdir(parent)]
+
+
+def usage() -> dict:
+    """Bytes used by jobs, cache and outputs, plus free bytes on the disk ("total" excludes outputs)."""
+    jobs = dir_size(JOBS_DIR)
+    cache = dir_size(CACHE_DIR)
+    outputs = dir_size(OUTPUTS_DIR)
+    os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+    return {
+        "jobs": jobs,
+        "cache": cache,
+        "outputs": outputs,
+        "total": jobs + cache,
+        "free": shutil.disk_usage(WORKSPACE_ROOT).free,
+    }
+
+
+def _remove(path: str) -> int:
+    size = dir_size(path) if os.path.isdir(path) else os.path.getsize(path)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+    print(f"Workspace GC: removed {path} ({size // 1024} KB)")
+    return size
+
+
+def collect_garbage(need_bytes: int = 0) -> int:
+    """
+    Removes idle job directories older than JOB_MAX_AGE_S, then evicts the
+    least recently used idle jobs and cache entries (in that order) until the
+    workspace fits its quota and `need_bytes` more fit on disk. Cache entries
+    pinned by active jobs are kept. Documents are only evicted beyond
+    OUTPUTS_QUOTA_BYTES. Returns the number of bytes freed.
+    """
+    global _last_gc
+    with _lock:
+        _last_gc = time.time()
+
+    freed = 0
+    now = time.time()
+    idle_jobs = []
+    pinned = set()
+    for path in _entries(JOBS_DIR):
+        if _is_active(os.path.basename(path), path):
+            pinned |= _pinned(path)
+            continue
+        if now - _last_used(path) > JOB_MAX_AGE_S:
+            freed += _remove(path)
+        else:
+            idle_jobs.append(path)
+
+    current = usage()
+    if OUTPUTS_QUOTA_BYTES and current["outputs"] > OUTPUTS_QUOTA_BYTES:
+        over = current["outputs"] - OUTPUTS_QUOTA_BYTES
+        for path in sorted((p for p in _entries(OUTPUTS_DIR) if not _in_use(p)), key=os.path.getmtime):
+            if over <= 0:
+                break
+            removed = _remove(path)
+            freed += removed
+            over -= removed
+
+    over_quota = current["total"] + need_bytes - WORKSPACE_QUOTA_BYTES
+    short_on_disk = MIN_FREE_BYTES + need_bytes - current["free"]
+    to_free = max(over_quota, short_on_disk)
+    if to_free <= 0:
+        return freed
+
+    # Least recently used first within each tier. Cache kinds are
+    # directories of entries; entries are evicted, not whole kinds.
+    cache_entries = [entry for kind in _entries(CACHE_DIR) if os.path.isdir(kind) for entry in _entries(kind)
+                     if not _in_use(entry) and os.path.abspath(entry) not in pinned]
+    candidates = sorted(idle_jobs, key=_last_used) + sorted(cache_entries, key=os.path.getmtime)
+    for path in candidates:
+        if to_free <= 0:
+            break
+        removed = _remove(path)
+        freed += removed
+        to_free -= removed
+    return freed
+
+
+def collect_garbage_if_due():
+    if time.time() - _last_gc >= GC_INTERVAL_S:
+        collect_garbage()
+
+
+def ensure_space(job_id: str, need_bytes: int = 0):
+    """
+    Raises WorkspaceFullError if the job's directory is over its quota or
+    `need_bytes` cannot be made available, after collecting garbage.
+    """
+    used = dir_size(os.path.join(JOBS_DIR, job_id or "anonymous"))
+    if used + need_bytes > JOB_QUOTA_BYTES:
+        raise WorkspaceFullError(
+            f"Job workspace quota exceeded ({(used + need_bytes) // MB} MB > {JOB_QUOTA_BYTES // MB} MB)"
+        )
+
+    os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+    free = shutil.disk_usage(WORKSPACE_ROOT).free
+    if free - need_bytes < MIN_FREE_BYTES:
+        collect_garbage(need_bytes)
+        free = shutil.disk_usage(WORKSPACE_ROOT).free
+        if free - need_bytes < MIN_FREE_BYTES:
+            raise WorkspaceFullError(f"Not enough disk space ({free // MB} MB free)")
@@ -0,0 +1,9 @@
+import os
+import uvicorn
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "job_server.api:app",
+        host=os.getenv("JOB_SERVER_HOST", "127.0.0.1"),
+        port=int(os.getenv("JOB_SERVER_PORT", "8600")),
+    )
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from graph.instrumentation import metrics_to_prometheus
+from graph.profiling import read_summaries
+from graph.workspace import usage
+from job_server.manager import JobManager
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+manager = JobManager()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await manager.start()
+    yield
+    await manager.stop()
+
+
+app = FastAPI(title="Video2Word Job Server", lifespan=lifespan)
+
+
+class JobRequest(BaseModel):
+    input_source: str
+    source_type: str = "url"  # 'url' or 'local'
+    profile: bool = False  # sample node stacks into the job's workspace
+    subtitle_first: Optional[bool] = None  # URLs: subtitle-first fast path (default: SUBTITLE_FIRST)
+
+
+class RetryRequest(BaseModel):
+    node: Optional[str] = None
+
+
+def _get_job(job_id: str):
+    job = manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs")
+async def submit_job(request: JobRequest):
+    job = manager.submit(request.input_source, request.source_type, request.profile,
+                         request.subtitle_first)
+    return job.to_dict()
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return [job.to_dict() for job in manager.jobs.values()]
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str, request: RetryRequest):
+    job = _get_job(job_id)
+    if not job.done:
+        raise HTTPException(status_code=409, detail="Job is still running")
+    if not (request.node or job.failed_node):
+        raise HTTPException(status_code=400, detail="No node to retry from")
+    return manager.retry(job, request.node).to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, since: int = 0):
+    """
+    Server-Sent Events stream of a job: all past events from `since` (or the
+    Last-Event-ID header when a client reconnects), then live ones.
+    """
+    job = _get_job(job_id)
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id is not None:
+        since = int(last_event_id) + 1
+
+    async def stream():
+        async for event in job.subscribe(since):
+            if await request.is_disconnected():
+                return
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/jobs/{job_id}/document")
+async def job_document(job_id: str):
+    job = _get_job(job_id)
+    if not job.doc_path or not os.path.exists(job.doc_path):
+        raise HTTPException(status_code=404, detail="Document not available")
+    return FileResponse(job.doc_path, media_type=DOCX_MIME, filename=os.path.basename(job.doc_path))
+
+
+@app.get("/jobs/{job_id}/metrics")
+async def job_metrics(job_id: str):
+    """Per-node metrics of a finished job as JSON."""
+    return _get_job(job_id).metrics
+
+
+@app.get("/jobs/{job_id}/profile", response_class=PlainTextResponse)
+async def job_profile(job_id: str):
+    """Hot-function summaries of a job submitted with `profile: true`."""
+    summaries = await asyncio.to_thread(read_summaries, _get_job(job_id).id)
+    if not summaries:
+        raise HTTPException(status_code=404, detail="No profile recorded for this job")
+    return summaries
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-node metrics of all finished jobs in the Prometheus text format."""
+    return metrics_to_prometheus({job.id: job.metrics for job in manager.jobs.values() if job.metrics})
+
+
+@app.get("/workspace")
+async def workspace_usage():
+    """Disk usage of job workspaces, cache and outputs in bytes."""
+    return await asyncio.to_thread(usage)
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from graph.graph_builder import build_graph
+from graph.checkpoint import open_async_checkpointer, new_job_id, job_config, afind_failed_node, aresume_config
+from graph.artifacts import text_length
+from graph.workspace import active_job, collect_garbage_if_due
+
+# Number of jobs that run at the same time; further submissions wait in the
+# queue. Individual heavy stages are additionally capped by STAGE_LIMITS.
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "4"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def summarize_update(update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Makes a node update small and JSON-safe for streaming to clients:
+    screenshot maps are reduced to a count and the analysis text (an artifact
+    reference, see graph.artifacts) to its length.
+    """
+    summary = {}
+    for key, value in (update or {}).items():
+        if key == "screenshots":
+            summary["screenshot_count"] = len(value or {})
+        elif key == "analysis_result":
+            summary["analysis_length"] = text_length(value)
+        elif key == "sections":
+            summary["analysis_length"] = sum(text_length(section) for section in value or [])
+        elif key == "metrics":
+            continue
+        else:
+            summary[key] = value
+    return summary
+
+
+class Job:
+    def __init__(self, job_id: str, input_source: str, source_type: str, profile: bool = False,
+                 subtitle_first: Optional[bool] = None):
+        self.id = job_id
+        self.input_source = input_source
+        self.source_type = source_type
+        self.profile = profile
+        self.subtitle_first = subtitle_first
+        self.status = QUEUED
+        self.retry_from = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.doc_path = None
+        self.errors: List[str] = []
+        self.failed_node = None
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.run_event_id = 0  # first event of the current (re)run
+        self._changed = asyncio.Event()
+
+    def add_event(self, event: Dict[str, Any]):
+        event["id"] = len(self.events)
+        self.events.append(event)
+        # Wake up every waiting subscriber, then re-arm for the next event.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    async def subscribe(self, since: int = 0):
+        """Yields past events from `since`, then live ones until the job ends."""
+        idx = since
+        while True:
+            while idx < len(self.events):
+                yield self.events[idx]
+                idx += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "input_source": self.input_source,
+            "source_type": self.source_type,
+            "profile": self.profile,
+            "subtitle_first": self.subtitle_first,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "doc_path": self.doc_path,
+            "errors": self.errors,
+            "failed_node": self.failed_node,
+            "metrics": self.metrics,
+            "event_count": len(self.events),
+            "run_event_id": self.run_event_id,
+        }
+
+
+class JobManager:
+    """
+    Queues workflow jobs and runs them on a fixed pool of asyncio workers,
+    each driving `build_graph().astream` with a checkpointer keyed by job ID.
+    """
+
+    def __init__(self, workers: int = MAX_CONCURRENT_JOBS):
+        self.workers = workers
+        self.jobs: Dict[str, Job] = {}
+        self._queue: asyncio.Queue = None
+        self._tasks = []
+        self._checkpointer = None
+        self._graph = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._checkpointer = await open_async_checkpointer()
+        self._graph = build_graph(checkpointer=self._checkpointer)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._checkpointer is not None:
+            await self._checkpointer.conn.close()
+
+    def submit(self, input_source: str, source_type: str, profile: bool = False,
+               subtitle_first: Optional[bool] = None) -> Job:
+        job = Job(new_job_id(), input_source, source_type, profile, subtitle_first)
+        self.jobs[job.id] = job
+        job.add_event({"type": "status", "status": QUEUED})
+        self._queue.put_nowait(job)
+        return job
+
+    def retry(self, job: Job, node: str = None) -> Job:
+        """Re-queues a finished job from `node` (default: the failed node)."""
+        job.status = QUEUED
+        job.retry_from = node or job.failed_node
+        job.doc_path = None
+        job.errors = []
+        job.failed_node = None
+        job.finished_at = None
+        job.run_event_id = len(job.events)
+        job.add_event({"type": "status", "status": QUEUED, "retry_from": job.retry_from})
+        self._queue.put_nowait(job)
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        graph = self._graph
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.add_event({"type": "status", "status": RUNNING})
+
+        try:
+            if job.retry_from:
+                config = await aresume_config(graph, job.id, job.retry_from)
+                if config is None:
+                    raise Exception(f"No checkpoint found before node '{job.retry_from}'")
+                stream = graph.astream(None, config, stream_mode=["updates", "custom"])
+            else:
+                initial_state = {
+                    "job_id": job.id,
+                    "input_source": job.input_source,
+                    "source_type": job.source_type,
+                    "profile": job.profile,
+                    "subtitle_first": job.subtitle_first,
+                    "errors": [],
+                    "metadata": {},
+                    "screenshots": {}
+                }
+                stream = graph.astream(initial_state, job_config(job.id), stream_mode=["updates", "custom"])
+
+            # Collect off the event loop; active_job then finds nothing due
+            await asyncio.to_thread(collect_garbage_if_due)
+            with active_job(job.id):
+                async for mode, chunk in stream:
+                    if mode == "custom":
+                        job.add_event(dict(chunk))
+                        continue
+                    for node_name, update in chunk.items():
+                        # Progressive previews are downloadable while the job runs
+                        if (update or {}).get("doc_path"):
+                            job.doc_path = update["doc_path"]
+                        job.add_event({"type": "node", "node": node_name, "update": summarize_update(update)})
+
+            final_state = (await graph.aget_state(job_config(job.id))).values
+            job.metrics = final_state.get("metrics") or {}
+            job.doc_path = final_state.get("doc_path")
+            job.errors = final_state.get("errors") or []
+        except Exception as e:
+            traceback.print_exc()
+            job.errors = job.errors + [f"Job failed: {str(e)}"]
+            # A progressive preview may exist, but the job did not finish
+            job.doc_path = None
+
+        if not job.doc_path:
+            try:
+                job.failed_node = await afind_failed_node(graph, job.id)
+            except Exception:
+                job.failed_node = None
+        job.status = SUCCEEDED if job.doc_path else FAILED
+        job.finished_at = time.time()
+        job.add_event({
+            "type": "status",
+            "status": job.status,
+            "doc_path": job.doc_path,
+            "errors": job.errors,
+            "failed_node": job.failed_node,
+            "metrics": job.metrics,
+        })
@@ -0,0 +1,89 @@
+"""
+Import-time budget check.
+
+Streamlit re-executes app.py on every interaction, so the modules it (and the
+graph) import must stay cheap. Each module below is imported in a fresh
+interpreter with `-X importtime`; the check fails if its cumulative import
+time exceeds the budget or if it drags in one of the heavy dependencies that
+nodes are supposed to import lazily.
+
+Usage: python tools/check_import_budget.py [--scale 1.5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported inside the functions that need them
+HEAVY_MODULES = ["cv2", "numpy", "yt_dlp", "langchain_openai", "docx", "mcp", "playwright", "ddgs"]
+
+# module -> budget in milliseconds (cumulative, cold import)
+BUDGETS = {
+    "graph.checkpoint": 100,
+    "graph.workspace": 100,
+    "graph.uploads": 100,
+    "graph.platforms": 100,
+    "graph.profiling": 100,
+    "graph.artifacts": 100,
+    "graph.nodes.classifier": 150,
+    "graph.nodes.downloader": 150,
+    "graph.nodes.processor": 150,
+    "graph.nodes.analyzer": 250,
+    "graph.nodes.generator": 150,
+    "word_mcp_server.client": 150,
+    # langgraph itself (and langchain_core) accounts for most of this
+    "graph.graph_builder": 2500,
+}
+
+_PROBE = (
+    "import sys, {module}; "
+    "print('HEAVY:' + ','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def measure(module):
+    """Returns (cumulative import time in ms, heavy modules loaded)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_ROOT,
+        check=True
+    )
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    heavy = result.stdout.strip().split("HEAVY:", 1)[1]
+    return cumulative_us / 1000, [m for m in heavy.split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply all budgets (slow machines / CI)")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in BUDGETS.items():
+        elapsed, heavy = measure(module)
+        limit = budget * args.scale
+        status = "ok"
+        if heavy:
+            status = f"FAIL (imports {', '.join(heavy)})"
+        elif elapsed > limit:
+            status = "FAIL (over budget)"
+        if status != "ok":
+            failures.append(module)
+        print(f"{module:<28} {elapsed:8.1f} ms / {limit:6.0f} ms  {status}")
+
+    if failures:
+        print(f"\n{len(failures)} module(s) over the import budget.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
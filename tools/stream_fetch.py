@@ -0,0 +1,345 @@
+"""
+Adaptive-stream helpers for universal_downloader.py: HLS/DASH manifest
+parsing, rendition choice, concurrent segment download and remuxing.
+
+A "segment" is (url, byte_range) where byte_range is (start, end) inclusive
+or None for the whole resource.
+"""
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Lowest rendition height that is still adequate for keyframe analysis
+MIN_HEIGHT = int(os.getenv("STREAM_MIN_HEIGHT", "480"))
+# Parallel segment requests
+SEGMENT_WORKERS = int(os.getenv("STREAM_SEGMENT_WORKERS", "8"))
+# Single-file streams are fetched as byte ranges of this size
+RANGE_CHUNK = 4 * 1024 * 1024
+
+
+class StreamError(Exception):
+    pass
+
+
+def make_session(headers, cookies=None, workers=SEGMENT_WORKERS):
+    """A requests session with a connection pool sized for `workers` and retries."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=workers,
+        pool_maxsize=workers,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers)
+    for cookie in cookies or []:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+    return session
+
+
+def pick_rendition(renditions, min_height=MIN_HEIGHT):
+    """
+    The lowest rendition at least `min_height` tall, else the tallest one.
+    Renditions without a known height are ordered by bandwidth.
+    """
+    if not renditions:
+        return None
+    adequate = [r for r in renditions if (r.get("height") or 0) >= min_height]
+    if adequate:
+        return min(adequate, key=lambda r: (r["height"], r.get("bandwidth") or 0))
+    return max(renditions, key=lambda r: (r.get("height") or 0, r.get("bandwidth") or 0))
+
+
+# --- HLS ---------------------------------------------------------------------
+
+_ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def _attributes(line):
+    return {k: v.strip('"') for k, v in _ATTR_RE.findall(line.split(":", 1)[1])}
+
+
+def parse_hls_master(text, base_url):
+    """
+    Variant streams of a master playlist ([] for a media playlist). A variant
+    whose audio is a separate rendition (#EXT-X-MEDIA:TYPE=AUDIO) carries
+    that rendition's playlist as "audio_url": the group's default, else its
+    first rendition with a playlist.
+    """
+    variants = []
+    audio = {}
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for i, line in enumerate(lines):
+        if line.startswith("#EXT-X-MEDIA"):
+            attrs = _attributes(line)
+            if attrs.get("TYPE") == "AUDIO" and attrs.get("URI"):
+                group = audio.setdefault(attrs.get("GROUP-ID"), [])
+                rendition = urljoin(base_url, attrs["URI"])
+                if attrs.get("DEFAULT") == "YES":
+                    group.insert(0, rendition)
+                else:
+                    group.append(rendition)
+        elif line.startswith("#EXT-X-STREAM-INF") and i + 1 < len(lines):
+            attrs = _attributes(line)
+            resolution = attrs.get("RESOLUTION", "")
+            height = int(resolution.split("x")[1]) if "x" in resolution else None
+            variants.append({
+                "url": urljoin(base_url, lines[i + 1]),
+                "height": height,
+                "bandwidth": int(attrs.get("BANDWIDTH", 0) or 0),
+                "audio_group": attrs.get("AUDIO"),
+            })
+    for variant in variants:
+        renditions = audio.get(variant.pop("audio_group")) or [None]
+        variant["audio_url"] = renditions[0]
+    return variants
+
+
+def _byte_range(value, next_offset):
+    """(start, end) of an HLS "length[@offset]" byte range; without an offset it follows the previous one."""
+    length, _, offset = value.partition("@")
+    start = int(offset) if offset else next_offset
+    return start, start + int(length) - 1
+
+
+def parse_hls_media(text, base_url):
+    """
+    Segments of a media playlist, including the fMP4 init segment if any.
+    Byte-range playlists (#EXT-X-BYTERANGE, several segments in one file)
+    yield one range per segment.
+    """
+    segments = []
+    byte_range = None
+    next_offset = 0
+    for line in (line.strip() for line in text.splitlines()):
+        if not line:
+            continue
+        if line.startswith("#EXT-X-KEY"):
+            if _attributes(line).get("METHOD", "NONE") != "NONE":
+                raise StreamError("STREAM_ENCRYPTED")
+        elif line.startswith("#EXT-X-MAP"):
+            attrs = _attributes(line)
+            # The init section's range has an explicit offset (0 if omitted)
+            init_range = _byte_range(attrs["BYTERANGE"], 0) if attrs.get("BYTERANGE") else None
+            segments.append((urljoin(base_url, attrs["URI"]), init_range))
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            byte_range = _byte_range(line.split(":", 1)[1], next_offset)
+            next_offset = byte_range[1] + 1
+        elif not line.startswith("#"):
+            segments.append((urljoin(base_url, line), byte_range))
+            byte_range = None
+    return segments
+
+
+def _get_playlist(session, url):
+    resp = session.get(url, timeout=20)
+    resp.raise_for_status()
+    return resp.text
+
+
+def hls_segments(session, manifest_url, min_height=MIN_HEIGHT):
+    """
+    (video segments, audio segments) of an HLS stream. Audio segments are
+    None unless the chosen variant's audio is a separate rendition.
+    """
+    text = _get_playlist(session, manifest_url)
+    variants = parse_hls_master(text, manifest_url)
+    if not variants:
+        return parse_hls_media(text, manifest_url), None
+
+    chosen = pick_rendition(variants, min_height)
+    print(f"HLS rendition: {chosen.get('height')}p ({len(variants)} available)", flush=True)
+    video = parse_hls_media(_get_playlist(session, chosen["url"]), chosen["url"])
+    audio = None
+    if chosen["audio_url"]:
+        audio = parse_hls_media(_get_playlist(session, chosen["audio_url"]), chosen["audio_url"])
+    return video, audio
+
+
+# --- DASH --------------------------------------------------------------------
+
+_DURATION_RE = re.compile(r"PT(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?")
+
+
+def _iso_duration(value):
+    match = _DURATION_RE.match(value or "")
+    if not match:
+        return 0.0
+    h, m, s = (float(x) if x else 0.0 for x in match.groups())
+    return h * 3600 + m * 60 + s
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(element, name):
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _fill_template(template, rep_id, bandwidth, number=None, time=None):
+    def replace(match):
+        name, fmt = match.group(1), match.group(2)
+        value = {"RepresentationID": rep_id, "Bandwidth": bandwidth, "Number": number, "Time": time}.get(name)
+        if value is None:
+            return match.group(0)
+        if fmt:
+            return ("%" + fmt[1:]) % int(value)
+        return str(value)
+    return re.sub(r"\$(RepresentationID|Bandwidth|Number|Time)(%0\d+d)?\$", replace, template)
+
+
+def _template_segments(template, base_url, rep_id, bandwidth, total_duration):
+    segments = []
+    init = template.get("initialization")
+    if init:
+        segments.append((urljoin(base_url, _fill_template(init, rep_id, bandwidth)), None))
+    media = template.get("media")
+    number = int(template.get("startNumber", 1))
+    timescale = int(template.get("timescale", 1))
+    timeline = _child(template, "SegmentTimeline")
+    if timeline is not None:
+        t = 0
+        for s in timeline:
+            t = int(s.get("t", t))
+            d = int(s.get("d"))
+            for _ in range(int(s.get("r", 0)) + 1):
+                segments.append((urljoin(base_url, _fill_template(media, rep_id, bandwidth, number, t)), None))
+                t += d
+                number += 1
+    elif template.get("duration"):
+        count = math.ceil(total_duration / (int(template.get("duration")) / timescale))
+        for i in range(count):
+            segments.append((urljoin(base_url, _fill_template(media, rep_id, bandwidth, number + i)), None))
+    return segments
+
+
+def parse_mpd(text, manifest_url):
+    """
+    Video and audio representations of the first period, each with its
+    segment list: {"video": [...], "audio": [...]}.
+    Supports SegmentTemplate (timeline or fixed duration) and single-file
+    BaseURL representations.
+    """
+    root = ET.fromstring(text)
+    total_duration = _iso_duration(root.get("mediaPresentationDuration"))
+    base_url = manifest_url
+    base = _child(root, "BaseURL")
+    if base is not None and base.text:
+        base_url = urljoin(manifest_url, base.text.strip())
+    period = _child(root, "Period")
+    if period is None:
+        raise StreamError("MPD without a Period")
+    base = _child(period, "BaseURL")
+    if base is not None and base.text:
+        base_url = urljoin(base_url, base.text.strip())
+
+    streams = {"video": [], "audio": []}
+    for adaptation in period:
+        if _local(adaptation.tag) != "AdaptationSet":
+            continue
+        if _child(adaptation, "ContentProtection") is not None:
+            continue
+        kind = adaptation.get("contentType") or (adaptation.get("mimeType") or "").split("/")[0]
+        set_template = _child(adaptation, "SegmentTemplate")
+        for rep in adaptation:
+            if _local(rep.tag) != "Representation":
+                continue
+            rep_kind = kind or (rep.get("mimeType") or "").split("/")[0]
+            if rep_kind not in streams:
+                continue
+            rep_base = base_url
+            rep_base_el = _child(rep, "BaseURL")
+            if rep_base_el is not None and rep_base_el.text:
+                rep_base = urljoin(base_url, rep_base_el.text.strip())
+            template = _child(rep, "SegmentTemplate")
+            template = template if template is not None else set_template
+            rep_id, bandwidth = rep.get("id"), rep.get("bandwidth")
+            if template is not None:
+                segments = _template_segments(template, rep_base, rep_id, bandwidth, total_duration)
+            elif rep_base_el is not None:
+                segments = [(rep_base, None)]
+            else:
+                continue
+            streams[rep_kind].append({
+                "height": int(rep.get("height") or adaptation.get("height") or 0) or None,
+                "bandwidth": int(bandwidth or 0),
+                "segments": segments,
+            })
+    return streams
+
+
+# --- Download ----------------------------------------------------------------
+
+def range_segments(session, url, chunk=RANGE_CHUNK):
+    """Splits a single-file stream into byte ranges (one segment if ranges are unsupported)."""
+    resp = session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=20)
+    resp.close()
+    match = re.search(r"/(\d+)$", resp.headers.get("Content-Range", ""))
+    if resp.status_code != 206 or not match:
+        return [(url, None)]
+    size = int(match.group(1))
+    return [(url, (start, min(start + chunk, size) - 1)) for start in range(0, size, chunk)]
+
+
+def _fetch(session, segment, path):
+    url, byte_range = segment
+    headers = {"Range": f"bytes={byte_range[0]}-{byte_range[1]}"} if byte_range else None
+    with session.get(url, headers=headers, stream=True, timeout=30) as resp:
+        resp.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=256 * 1024):
+                f.write(chunk)
+    return os.path.getsize(path)
+
+
+def fetch_segments(session, segments, output_path, workers=SEGMENT_WORKERS):
+    """
+    Downloads segments with at most `workers` requests in flight and
+    concatenates them in order. Returns the number of bytes written.
+    """
+    parts_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        paths = [os.path.join(parts_dir, f"{i:06d}") for i in range(len(segments))]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            total = sum(executor.map(lambda args: _fetch(session, *args), zip(segments, paths)))
+        with open(output_path, "wb") as out:
+            for path in paths:
+                with open(path, "rb") as part:
+                    shutil.copyfileobj(part, out)
+        return total
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def remux(video_path, audio_path, output_path):
+    """
+    Muxes separate video/audio streams (or rewraps a TS stream) into MP4
+    without re-encoding. Without ffmpeg the video stream is used as is,
+    which is enough for keyframe analysis.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        print("ffmpeg not found, keeping the video stream without remuxing", flush=True)
+        shutil.move(video_path, output_path)
+        return
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-i", video_path]
+    if audio_path:
+        cmd += ["-i", audio_path]
+    cmd += ["-c", "copy", output_path]
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", check=False)
+    if result.returncode != 0:
+        raise StreamError(f"REMUX_FAILED:{result.stderr.strip()[:200]}")
@@ -4,31 +4,113 @@ import json
 import requests
 from playwright.sync_api import sync_playwright
 
+from stream_fetch import (
+    StreamError, fetch_segments, hls_segments, make_session, parse_mpd,
+    pick_rendition, range_segments, remux,
+)
+
 # Ensure stdout is utf-8
 sys.stdout.reconfigure(encoding='utf-8')
 
-def get_referer(url):
-    if "douyin.com" in url:
-        return "https://www.douyin.com/"
-    if "bilibili.com" in url:
-        return "https://www.bilibili.com/"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+def is_manifest(response):
+    """HLS playlists and DASH manifests requested while the page loads."""
+    path = response.url.split("?", 1)[0].lower()
+    content_type = (response.headers.get("content-type") or "").lower()
+    if path.endswith(".m3u8") or "mpegurl" in content_type:
+        return "hls"
+    if path.endswith(".mpd") or "dash+xml" in content_type:
+        return "dash"
     return None
 
-def download_video(url, output_path):
+def bilibili_streams(page):
+    """Bilibili embeds its DASH renditions in window.__playinfo__ instead of an MPD."""
+    playinfo = page.evaluate("() => window.__playinfo__ || null")
+    dash = ((playinfo or {}).get("data") or {}).get("dash")
+    if not dash:
+        return None
+    def rendition(item):
+        return {
+            "height": item.get("height"),
+            "bandwidth": item.get("bandwidth") or 0,
+            "url": item.get("baseUrl") or item.get("base_url"),
+        }
+    return {
+        "video": [rendition(v) for v in dash.get("video") or []],
+        "audio": [rendition(a) for a in dash.get("audio") or []],
+    }
+
+def download_stream(session, manifests, bili, output_path):
+    """
+    Downloads the lowest adequate rendition of an adaptive stream captured
+    from the page: Bilibili playinfo first, then DASH, then HLS manifests.
+    Returns the number of bytes downloaded, or None if nothing usable was captured.
+    """
+    video_segments = audio_segments = None
+    if bili and bili["video"]:
+        video = pick_rendition(bili["video"])
+        print(f"Bilibili rendition: {video.get('height')}p ({len(bili['video'])} available)", flush=True)
+        video_segments = range_segments(session, video["url"])
+        if bili["audio"]:
+            audio = min(bili["audio"], key=lambda a: a["bandwidth"])
+            audio_segments = range_segments(session, audio["url"])
+    elif manifests.get("dash"):
+        resp = session.get(manifests["dash"][0], timeout=20)
+        resp.raise_for_status()
+        streams = parse_mpd(resp.text, manifests["dash"][0])
+        if not streams["video"]:
+            raise StreamError("STREAM_ENCRYPTED_OR_EMPTY")
+        video = pick_rendition(streams["video"])
+        print(f"DASH rendition: {video.get('height')}p ({len(streams['video'])} available)", flush=True)
+        video_segments = video["segments"]
+        if len(video_segments) == 1:
+            video_segments = range_segments(session, video_segments[0][0])
+        if streams["audio"]:
+            audio_segments = min(streams["audio"], key=lambda a: a["bandwidth"])["segments"]
+            if len(audio_segments) == 1:
+                audio_segments = range_segments(session, audio_segments[0][0])
+    elif manifests.get("hls"):
+        # The first playlist is normally the master; media playlists also work
+        video_segments, audio_segments = hls_segments(session, manifests["hls"][0])
+    if not video_segments:
+        return None
+
+    video_path = output_path + ".video.part"
+    audio_path = output_path + ".audio.part" if audio_segments else None
+    try:
+        print(f"Fetching {len(video_segments)} video segments...", flush=True)
+        total = fetch_segments(session, video_segments, video_path)
+        if audio_segments:
+            print(f"Fetching {len(audio_segments)} audio segments...", flush=True)
+            total += fetch_segments(session, audio_segments, audio_path)
+        remux(video_path, audio_path, output_path)
+        return total
+    finally:
+        for path in (video_path, audio_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+def download_video(url, output_path, referer=None):
+    """`referer` is the platform's Referer header (graph.platforms.referer_for), passed in by the caller."""
     print(f"Starting separate process download (SYNC) for: {url}", flush=True)
     metadata = {"title": "Web_Video", "duration": 0, "uploader": "Unknown"}
     
-    referer = get_referer(url)
-    
     with sync_playwright() as p:
         print("Launching browser...", flush=True)
         browser = p.chromium.launch(headless=True)
         print("Browser launched. Creating context...", flush=True)
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
+        context = browser.new_context(user_agent=USER_AGENT)
         page = context.new_page()
-        
+
+        # Capture stream manifests while the page loads; blob: players are fed from these
+        manifests = {"hls": [], "dash": []}
+        def on_response(response):
+            kind = is_manifest(response)
+            if kind and response.ok and response.url not in manifests[kind]:
+                manifests[kind].append(response.url)
+        page.on("response", on_response)
+
         try:
             print(f"Navigating to {url}...", flush=True)
             page.goto(url, timeout=45000)
@@ -66,20 +148,11 @@ def download_video(url, output_path):
                     if (video && video.src && !video.src.startsWith('blob:')) return video.src;
                     const sources = document.querySelectorAll('source');
                     for (const s of sources) {
-                        if (s.src && s.src.includes('http') && !s.src.startswith('blob:')) return s.src;
+                        if (s.src && s.src.includes('http') && !s.src.startsWith('blob:')) return s.src;
                     }
                     return null;
                 }""")
 
-            if not video_src:
-                print("VIDEO_NOT_FOUND_OR_BLOB")
-                # If it's Bilibili or similar, it might be using DASH/HLS which shows as blob.
-                # In such cases, we might need a more specialized extractor or just rely on yt-dlp 
-                # but with better headers/cookies.
-                return
-
-            print(f"Video Source Found: {video_src[:50]}...", flush=True)
-            
             # Get Title
             try:
                 title_el = page.query_selector('h1') or page.query_selector('.video-info-title') or page.query_selector('.video-title')
@@ -88,13 +161,35 @@ def download_video(url, output_path):
             except:
                 pass
 
-            # Download
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
+            headers = {"User-Agent": USER_AGENT}
             if referer:
                 headers["Referer"] = referer
-            
+
+            if not video_src:
+                # Adaptive stream (HLS/DASH) behind a blob: URL
+                session = make_session(headers, context.cookies())
+                try:
+                    downloaded = download_stream(session, manifests, bilibili_streams(page), output_path)
+                except StreamError as e:
+                    print(str(e), flush=True)
+                    return
+                finally:
+                    session.close()
+                if downloaded is None:
+                    print("VIDEO_NOT_FOUND_OR_BLOB")
+                    return
+                print(f"Stream downloaded: {downloaded / 1024 / 1024:.1f} MB", flush=True)
+                result = {
+                    "status": "success",
+                    "path": output_path,
+                    "metadata": metadata
+                }
+                print("JSON_RESULT:" + json.dumps(result), flush=True)
+                return
+
+            print(f"Video Source Found: {video_src[:50]}...", flush=True)
+
+            # Download
             r = requests.get(video_src, headers=headers, stream=True)
             if r.status_code == 200:
                 with open(output_path, 'wb') as f:
@@ -118,8 +213,9 @@ def download_video(url, output_path):
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python universal_downloader.py <url> <output_path>")
+        print("Usage: python universal_downloader.py <url> <output_path> [referer]")
         sys.exit(1)
     url = sys.argv[1]
     output_path = sys.argv[2]
-    download_video(url, output_path)
+    referer = sys.argv[3] if len(sys.argv) > 3 else None
+    download_video(url, output_path, referer)
@@ -0,0 +1,198 @@
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import shlex
+import sys
+import threading
+from datetime import timedelta
+
+# Command used to start a Word MCP server over stdio, e.g.
+#   WORD_MCP_SERVER_CMD="python -m word_mcp_server.server"
+# When unset, documents are rendered in-process.
+SERVER_CMD = os.getenv("WORD_MCP_SERVER_CMD", "")
+POOL_SIZE = int(os.getenv("WORD_MCP_POOL_SIZE", "2"))
+CALL_TIMEOUT = float(os.getenv("WORD_MCP_TIMEOUT", "300"))
+MAX_ATTEMPTS = 2
+RESTART_DELAY = 1.0
+# Servers that fail this many times in a row before becoming ready (wrong
+# command, crash on start) make the pool unavailable until one starts again
+MAX_START_FAILURES = 3
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WordMCPUnavailableError(Exception):
+    """Raised when no Word MCP server of the pool manages to start."""
+
+
+class WordMCPPool:
+    """
+    Keeps `size` warm stdio Word MCP server processes, each with one
+    initialized ClientSession, and hands tool calls to whichever is free.
+
+    The sessions live on a private event loop in a daemon thread so that the
+    (synchronous) graph nodes can use the pool from any thread. A worker whose
+    server crashes is restarted and the interrupted call is retried once.
+    When servers keep failing to start, pending and new calls fail with
+    WordMCPUnavailableError instead of waiting for a server.
+    """
+
+    def __init__(self, command: str, args: list, size: int = POOL_SIZE, cwd: str = PROJECT_ROOT):
+        from mcp import StdioServerParameters
+
+        self.params = StdioServerParameters(command=command, args=args, cwd=cwd, env=dict(os.environ))
+        self.size = size
+        self._closed = False
+        self._start_failures = 0
+        self._unavailable = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="word-mcp-pool", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    async def _start(self):
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.size)]
+
+    async def _worker(self, idx: int):
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        while not self._closed:
+            job = None
+            ready = False
+            try:
+                async with stdio_client(self.params) as (read_stream, write_stream):
+                    async with ClientSession(read_stream, write_stream) as session:
+                        await session.initialize()
+                        ready = True
+                        self._start_failures = 0
+                        self._unavailable = None
+                        print(f"Word MCP server #{idx} ready.")
+                        while True:
+                            job = await self._queue.get()
+                            name, arguments, future, attempt = job
+                            if future.done():
+                                job = None
+                                continue
+                            # A server that died while idle is only noticed on
+                            # the next request; check first so the job is
+                            # re-queued without using up a retry.
+                            try:
+                                await session.send_ping()
+                            except Exception:
+                                self._queue.put_nowait(job)
+                                job = None
+                                raise
+                            result = await session.call_tool(
+                                name, arguments, read_timeout_seconds=timedelta(seconds=CALL_TIMEOUT)
+                            )
+                            if not future.done():
+                                future.set_result(result)
+                            job = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Word MCP server #{idx} failed: {e}. Restarting...")
+                if job is not None:
+                    name, arguments, future, attempt = job
+                    if attempt + 1 < MAX_ATTEMPTS:
+                        self._queue.put_nowait((name, arguments, future, attempt + 1))
+                    elif not future.done():
+                        future.set_exception(e)
+                if not ready:
+                    self._start_failures += 1
+                    if self._start_failures >= MAX_START_FAILURES:
+                        self._fail_pending(e)
+                # Back off while servers keep failing to start
+                await asyncio.sleep(RESTART_DELAY * min(self._start_failures + 1, 30))
+
+    def _fail_pending(self, error: Exception):
+        self._unavailable = WordMCPUnavailableError(f"Word MCP server failed to start: {error}")
+        while not self._queue.empty():
+            future = self._queue.get_nowait()[2]
+            if not future.done():
+                future.set_exception(self._unavailable)
+
+    async def _submit(self, name: str, arguments: dict):
+        if self._unavailable is not None:
+            raise self._unavailable
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((name, arguments, future, 0))
+        return await future
+
+    def call_tool(self, name: str, arguments: dict, timeout: float = CALL_TIMEOUT * MAX_ATTEMPTS):
+        """Calls a tool on a pooled session and blocks until it returns."""
+        if self._closed:
+            raise RuntimeError("Word MCP pool is closed")
+        future = asyncio.run_coroutine_threadsafe(self._submit(name, arguments), self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Cancels the queued or running call, so no worker picks it up later
+            future.cancel()
+            raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        async def _stop():
+            for task in self._workers:
+                task.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_stop(), self._loop).result(10)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide pool, starting it on first use, or None when no
+    server command is configured.
+    """
+    global _pool
+    if not SERVER_CMD:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            parts = shlex.split(SERVER_CMD)
+            command = sys.executable if parts[0] in ("python", "python3") else parts[0]
+            _pool = WordMCPPool(command, parts[1:])
+            atexit.register(_pool.close)
+    return _pool
+
+
+def render_document(content: str, output_path: str, image_map: dict = None) -> str:
+    """
+    Renders a document through the `generate_word_doc` MCP tool, falling back
+    to the in-process renderer when no server is configured or none starts.
+    """
+    pool = get_pool()
+    if pool is not None:
+        try:
+            result = pool.call_tool("generate_word_doc", {
+                "content": content,
+                "output_path": os.path.abspath(output_path),
+                "image_map": image_map or {},
+            })
+        except WordMCPUnavailableError as e:
+            print(f"{e}. Rendering in-process instead.")
+            pool = None
+    if pool is None:
+        # python-docx is only imported when rendering in-process
+        from word_mcp_server.renderer import generate_docx
+        return generate_docx(content, output_path, image_map)
+
+    text = result.content[0].text if result.content else ""
+    if result.isError or not text.startswith("Successfully"):
+        raise Exception(text or "Word MCP server returned no content")
+    return output_path
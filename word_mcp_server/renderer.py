@@ -0,0 +1,221 @@
+import base64
+import io
+import os
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.shared import Inches, Pt
+
+from word_mcp_server.tokenizer import (
+    HEADING, IMAGE, BULLET, NUMBERED, TABLE, tokenize, split_inline
+)
+
+# Academic formatting: (style name, East Asian font, size in pt)
+# ASCII text always uses Times New Roman.
+HEADING_STYLES = [
+    ("Title", "SimHei", 16),      # '# '
+    ("Heading 1", "SimHei", 14),  # '## '
+    ("Heading 2", "SimHei", 13),  # '### '
+]
+BODY_FONT = ("SimSun", 12)
+CAPTION_FONT = ("Times New Roman", 10)
+
+# How many blocks are rendered between two progress callbacks
+PROGRESS_EVERY = 50
+
+BULLET_STYLES = ["List Bullet", "List Bullet 2", "List Bullet 3"]
+# Numbered items carry their typed number, so these indent without numbering
+NUMBERED_STYLES = ["List", "List 2", "List 3"]
+
+_THEME_FONT_ATTRS = ("w:asciiTheme", "w:hAnsiTheme", "w:eastAsiaTheme", "w:cstheme")
+
+
+def set_style_font(style, east_asia_font, size):
+    """
+    Sets the fonts of a style once, so paragraphs referencing it need no
+    run-level overrides. Theme fonts are removed because they take precedence
+    over explicit font names.
+    """
+    style.font.name = 'Times New Roman'
+    style.font.size = Pt(size)
+    rFonts = style.element.get_or_add_rPr().get_or_add_rFonts()
+    for attr in _THEME_FONT_ATTRS:
+        key = qn(attr)
+        if key in rFonts.attrib:
+            del rFonts.attrib[key]
+    rFonts.set(qn('w:eastAsia'), east_asia_font)
+
+
+def _get_or_add_paragraph_style(doc, name):
+    if name in doc.styles:
+        return doc.styles[name]
+    style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = doc.styles['Normal']
+    return style
+
+
+def setup_styles(doc):
+    """
+    Defines every style the renderer uses and returns them keyed by role.
+    """
+    normal = doc.styles['Normal']
+    set_style_font(normal, *BODY_FONT)
+    normal.paragraph_format.line_spacing = 1.5
+
+    headings = []
+    for name, font, size in HEADING_STYLES:
+        style = doc.styles[name]
+        set_style_font(style, font, size)
+        headings.append(style)
+    headings[0].paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    figure = _get_or_add_paragraph_style(doc, 'Figure')
+    figure.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    caption = _get_or_add_paragraph_style(doc, 'Figure Caption')
+    caption.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    set_style_font(caption, *CAPTION_FONT)
+
+    # Paragraphs reference styles by id. Resolving the id through python-docx
+    # scans every style in the document, so it is done once here.
+    return {
+        "headings": [s.style_id for s in headings],
+        "figure": figure.style_id,
+        "caption": caption.style_id,
+        "bullets": [doc.styles[n].style_id for n in BULLET_STYLES],
+        "numbered": [doc.styles[n].style_id for n in NUMBERED_STYLES],
+        "table": doc.styles["Table Grid"].style_id,
+    }
+
+
+def add_styled_paragraph(doc, style_id=None, text=None):
+    """Adds a paragraph referencing a pre-resolved style id (None = Normal)."""
+    p = doc.add_paragraph(text)
+    if style_id:
+        p._p.style = style_id
+    return p
+
+
+def add_inline_runs(paragraph, text, bold=False):
+    """Adds the runs of a line, honouring **bold** markers."""
+    for span, is_bold in split_inline(text):
+        run = paragraph.add_run(span)
+        if is_bold or bold:
+            run.bold = True
+
+
+def _is_webp(head: bytes) -> bool:
+    return head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+
+
+def _webp_to_jpeg(data: bytes):
+    """python-docx cannot embed WebP, so WebP keyframes are converted to JPEG."""
+    import cv2
+    import numpy as np
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    is_success, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    return io.BytesIO(buffer.tobytes()) if is_success else None
+
+
+def _open_image(value):
+    """
+    Image map values are file paths, or `data:` URIs when the caller does not
+    share a filesystem with the renderer.
+    """
+    if value.startswith('data:'):
+        data = base64.b64decode(value.split(',', 1)[1])
+        return _webp_to_jpeg(data) if _is_webp(data[:12]) else io.BytesIO(data)
+    if os.path.exists(value):
+        with open(value, "rb") as f:
+            if _is_webp(f.read(12)):
+                f.seek(0)
+                return _webp_to_jpeg(f.read())
+        return value
+    return None
+
+
+def _add_image(doc, styles, key, image_map):
+    if not image_map or key not in image_map:
+        return
+    try:
+        # Broken data URIs and undecodable images are skipped like missing ones
+        image = _open_image(image_map[key])
+        if image is None:
+            return
+        p = add_styled_paragraph(doc, styles["figure"])
+        p.add_run().add_picture(image, width=Inches(6.0))
+        add_styled_paragraph(doc, styles["caption"], f"Figure: {key}")
+    except Exception as e:
+        print(f"Skipping image {key}: {e!r}")
+
+
+def _add_table(doc, styles, rows):
+    cols = max(len(r) for r in rows)
+    table = doc.add_table(rows=len(rows), cols=cols)
+    table._tbl.tblStyle_val = styles["table"]
+    for row_idx, (row, cells) in enumerate(zip(table.rows, rows)):
+        row_cells = row.cells
+        for col_idx, text in enumerate(cells):
+            add_inline_runs(row_cells[col_idx].paragraphs[0], text, bold=row_idx == 0)
+
+
+def render_markdown(doc, content, image_map=None, progress_callback=None):
+    """
+    Renders Markdown into an existing document whose styles were set up by
+    `setup_styles`.
+    `progress_callback(done, total)` is called every PROGRESS_EVERY blocks.
+    """
+    styles = setup_styles(doc)
+    headings = styles["headings"]
+    tokens = list(tokenize(content))
+    total = len(tokens)
+
+    for idx, token in enumerate(tokens):
+        if progress_callback and idx % PROGRESS_EVERY == 0:
+            progress_callback(idx, total)
+        kind = token.kind
+        if kind == HEADING:
+            add_styled_paragraph(doc, headings[token.level], token.text)
+        elif kind == IMAGE:
+            _add_image(doc, styles, token.text, image_map)
+        elif kind == BULLET:
+            add_inline_runs(add_styled_paragraph(doc, styles["bullets"][token.level]), token.text)
+        elif kind == NUMBERED:
+            add_inline_runs(add_styled_paragraph(doc, styles["numbered"][token.level]), token.text)
+        elif kind == TABLE:
+            _add_table(doc, styles, token.rows)
+        else:
+            add_inline_runs(add_styled_paragraph(doc), token.text)
+
+    if progress_callback:
+        progress_callback(total, total)
+    return doc
+
+
+def generate_docx(content: str, output_path: str, image_map: dict = None, progress_callback=None):
+    """
+    Generates a Word document with strict academic formatting.
+    """
+    doc = Document()
+    render_markdown(doc, content, image_map, progress_callback)
+
+    # Ensure directory exists
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    doc.save(output_path)
+    return output_path
+
+
+def render_docx_bytes(content: str, image_map: dict = None, progress_callback=None) -> bytes:
+    """
+    Same as `generate_docx` but returns the .docx file content instead of
+    writing it to disk.
+    """
+    doc = Document()
+    render_markdown(doc, content, image_map, progress_callback)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
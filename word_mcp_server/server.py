@@ -1,116 +1,54 @@
 import asyncio
+import base64
 import os
-import re
-import sys
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
+from concurrent.futures import ThreadPoolExecutor
 from mcp.server.models import InitializationOptions
 import mcp.types as types
-from mcp.server import Server
+from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
 
+from word_mcp_server.renderer import generate_docx, render_docx_bytes
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Rendering is synchronous (python-docx), so it runs in a bounded pool and the
+# event loop stays free to serve other requests. Requests beyond
+# MAX_IN_FLIGHT wait on the semaphore instead of piling up in the pool queue.
+MAX_WORKERS = int(os.getenv("WORD_MCP_MAX_WORKERS", "4"))
+MAX_IN_FLIGHT = int(os.getenv("WORD_MCP_MAX_IN_FLIGHT", "32"))
+
+_render_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="docx-render")
+_in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+
 # Initialize the server
 app = Server("word-mcp-server")
 
-def set_run_font(run, font_name='SimSun', size=12):
-    """Sets the font for a run, handling complex scripts (Chinese)."""
-    run.font.name = 'Times New Roman'  # For ASCII
-    run.font.size = Pt(size)
-    r = run._element
-    rPr = r.get_or_add_rPr()
-    # Set East Asia font (Chinese)
-    rFonts = rPr.get_or_add_rFonts()
-    rFonts.set(qn('w:eastAsia'), font_name)
-
-def add_formatted_paragraph(doc, text, bold_title=False):
-    """
-    Parses simple markdown bold (**text**) and applies strict formatting.
+def _progress_reporter():
     """
-    p = doc.add_paragraph()
-    p.paragraph_format.line_spacing = 1.5
-    
-    # Split by bold markers
-    parts = re.split(r'(\*\*.*?\*\*)', text)
-    
-    for part in parts:
-        if not part: continue
-        
-        is_bold = part.startswith('**') and part.endswith('**')
-        clean_text = part.strip('*') if is_bold else part
-        
-        run = p.add_run(clean_text)
-        run.bold = is_bold
-        
-        # Apply Strict Font Settings to EVERY run
-        set_run_font(run, font_name='SimSun', size=12)
-
-def generate_docx(content: str, output_path: str, image_map: dict = None):
+    Returns a thread-safe `progress_callback(done, total)` that forwards
+    renderer progress as MCP progress notifications, or None if the client
+    did not ask for progress.
     """
-    Generates a Word document with strict academic formatting.
-    """
-    doc = Document()
-    
-    # Configure Normal Style defaults
-    style = doc.styles['Normal']
-    style.font.name = 'Times New Roman'
-    style.font.size = Pt(12)
-    style.paragraph_format.line_spacing = 1.5
-    
-    lines = content.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            # Title
-            p = doc.add_heading(line[2:], level=0)
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            for run in p.runs:
-                set_run_font(run, font_name='SimHei', size=16) # Title often SimHei
-                
-        elif line.startswith('## '):
-            # Heading 1
-            p = doc.add_heading(line[3:], level=1)
-            for run in p.runs:
-                set_run_font(run, font_name='SimHei', size=14)
-                
-        elif line.startswith('### '):
-            # Heading 2
-            p = doc.add_heading(line[4:], level=2)
-            for run in p.runs:
-                set_run_font(run, font_name='SimHei', size=13)
-                
-        elif '[INSERT_IMAGE:' in line:
-            # Image handling remains the same...
-            match = re.search(r'\[INSERT_IMAGE:\s*(.*?)\]', line)
-            if match:
-                img_key = match.group(1)
-                if image_map and img_key in image_map:
-                    img_path = image_map[img_key]
-                    if os.path.exists(img_path):
-                        try:
-                            p = doc.add_paragraph()
-                            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            run = p.add_run()
-                            run.add_picture(img_path, width=Inches(6.0))
-                            
-                            caption = doc.add_paragraph(f"Figure: {img_key}")
-                            caption.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            for run in caption.runs:
-                                set_run_font(run, font_name='Times New Roman', size=10)
-                        except:
-                            pass
-        else:
-            # Standard paragraph with strict font parsing
-            add_formatted_paragraph(doc, line)
-            
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-    doc.save(output_path)
-    return output_path
+    ctx = app.request_context
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    session = ctx.session
+
+    def report(done, total):
+        asyncio.run_coroutine_threadsafe(
+            session.send_progress_notification(token, done, total), loop
+        )
+    return report
+
+async def _render(func, *args):
+    """Runs a renderer function in the pool, reporting progress if requested."""
+    progress = _progress_reporter()
+    async with _in_flight:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_render_pool, func, *args, progress)
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
@@ -118,16 +56,37 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent | type
         content = arguments.get("content")
         output_path = arguments.get("output_path")
         image_map = arguments.get("image_map", {})
-        
+
         if not content or not output_path:
             raise ValueError("Missing required arguments: content, output_path")
-            
+
         try:
-            saved_path = generate_docx(content, output_path, image_map)
+            saved_path = await _render(generate_docx, content, output_path, image_map)
             return [types.TextContent(type="text", text=f"Successfully generated Word document at: {saved_path}")]
         except Exception as e:
             return [types.TextContent(type="text", text=f"Error generating document: {str(e)}")]
-            
+
+    if name == "generate_word_doc_bytes":
+        content = arguments.get("content")
+        filename = arguments.get("filename") or "document.docx"
+        image_map = arguments.get("image_map", {})
+
+        if not content:
+            raise ValueError("Missing required arguments: content")
+
+        try:
+            data = await _render(render_docx_bytes, content, image_map)
+            return [types.EmbeddedResource(
+                type="resource",
+                resource=types.BlobResourceContents(
+                    uri=f"docx://word-mcp-server/{os.path.basename(filename)}",
+                    mimeType=DOCX_MIME,
+                    blob=base64.b64encode(data).decode('ascii')
+                )
+            )]
+        except Exception as e:
+            return [types.TextContent(type="text", text=f"Error generating document: {str(e)}")]
+
     raise ValueError(f"Tool not found: {name}")
 
 @app.list_tools()
@@ -140,20 +99,42 @@ async def list_tools() -> list[types.Tool]:
                 "type": "object",
                 "properties": {
                     "content": {
-                        "type": "string", 
+                        "type": "string",
                         "description": "Markdown content. Supports headers (#) and [INSERT_IMAGE: key] placeholders."
                     },
                     "output_path": {
-                        "type": "string", 
+                        "type": "string",
                         "description": "Absolute path to save the generated .docx file"
                     },
                     "image_map": {
-                        "type": "object", 
+                        "type": "object",
                         "description": "Dictionary mapping image keys (used in content placeholders) to file paths"
                     }
                 },
                 "required": ["content", "output_path"]
             }
+        ),
+        types.Tool(
+            name="generate_word_doc_bytes",
+            description="Generate a Word document (.docx) from Markdown text and images and return it as an embedded resource",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "content": {
+                        "type": "string",
+                        "description": "Markdown content. Supports headers (#) and [INSERT_IMAGE: key] placeholders."
+                    },
+                    "filename": {
+                        "type": "string",
+                        "description": "File name used in the returned resource URI"
+                    },
+                    "image_map": {
+                        "type": "object",
+                        "description": "Dictionary mapping image keys to file paths or base64 data: URIs"
+                    }
+                },
+                "required": ["content"]
+            }
         )
     ]
 
@@ -166,11 +147,11 @@ async def main():
                 server_name="word-mcp-server",
                 server_version="0.1.0",
                 capabilities=app.get_capabilities(
-                    notification_options=types.NotificationOptions(),
+                    notification_options=NotificationOptions(),
                     experimental_capabilities={},
                 ),
             ),
         )
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# All patterns are compiled once at import time; the tokenizer walks the
+# document a single time and never re-splits a line.
+_HEADING_RE = re.compile(r'^(#{1,3}) (.*)$')
+_IMAGE_RE = re.compile(r'\[INSERT_IMAGE:\s*(.*?)\]')
+_BULLET_RE = re.compile(r'^[-*+]\s+(.*)$')
+_NUMBERED_RE = re.compile(r'^(\d+[.)])\s+(.*)$')
+_TABLE_SEPARATOR_RE = re.compile(r'^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$')
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+
+# Block token kinds
+HEADING = "heading"
+PARAGRAPH = "paragraph"
+IMAGE = "image"
+BULLET = "bullet"
+NUMBERED = "numbered"
+TABLE = "table"
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str = ""
+    level: int = 0
+    rows: Optional[List[List[str]]] = None
+
+
+def split_inline(text: str) -> List[Tuple[str, bool]]:
+    """
+    Splits a line into (text, is_bold) spans using the **bold** markers.
+    """
+    spans = []
+    pos = 0
+    for match in _BOLD_RE.finditer(text):
+        if match.start() > pos:
+            spans.append((text[pos:match.start()], False))
+        if match.group(1):
+            spans.append((match.group(1), True))
+        pos = match.end()
+    if pos < len(text):
+        spans.append((text[pos:], False))
+    return spans
+
+
+def _split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+
+def _flush_table(lines: List[str]) -> Iterator[Token]:
+    # A pipe block is only a table if its second line is a separator row,
+    # otherwise the lines are rendered as plain paragraphs.
+    if len(lines) >= 2 and _TABLE_SEPARATOR_RE.match(lines[1]):
+        rows = [_split_row(lines[0])] + [_split_row(l) for l in lines[2:]]
+        yield Token(TABLE, rows=rows)
+    else:
+        for line in lines:
+            yield Token(PARAGRAPH, text=line)
+
+
+def tokenize(content: str) -> Iterator[Token]:
+    """
+    Converts the LLM Markdown into a flat stream of block tokens in one pass.
+
+    Supported blocks: `#`/`##`/`###` headings, `[INSERT_IMAGE: key]` lines,
+    bullet (`-`, `*`, `+`) and numbered (`1.`) lists with indentation based
+    nesting, GitHub style pipe tables and plain paragraphs.
+    """
+    table_lines: List[str] = []
+
+    for raw_line in content.split('\n'):
+        line = raw_line.strip()
+
+        if line.startswith('|'):
+            table_lines.append(line)
+            continue
+        if table_lines:
+            yield from _flush_table(table_lines)
+            table_lines = []
+
+        if not line:
+            continue
+
+        match = _HEADING_RE.match(line)
+        if match:
+            yield Token(HEADING, text=match.group(2), level=len(match.group(1)) - 1)
+            continue
+
+        if '[INSERT_IMAGE:' in line:
+            match = _IMAGE_RE.search(line)
+            if match:
+                yield Token(IMAGE, text=match.group(1))
+            continue
+
+        indent = len(raw_line) - len(raw_line.lstrip())
+        level = min(indent // 2, 2)
+
+        match = _BULLET_RE.match(line)
+        if match:
+            yield Token(BULLET, text=match.group(1), level=level)
+            continue
+
+        match = _NUMBERED_RE.match(line)
+        if match:
+            # The typed number is kept: Word's auto-numbering would continue
+            # across separate lists instead of restarting at each "1."
+            yield Token(NUMBERED, text=f"{match.group(1)} {match.group(2)}", level=level)
+            continue
+
+        yield Token(PARAGRAPH, text=line)
+
+    if table_lines:
+        yield from _flush_table(table_lines)